@@ -0,0 +1,53 @@
+"""Prompt size and latency versus reading-history length.
+
+Builds the history-based recommendation prompt for growing histories, with
+and without the token budget, and reports estimated prompt tokens and build
+time. With --live the prompt is also sent to Gemini (needs an API key) so
+end-to-end latency can be compared.
+
+    python -m benchmarks.history_prompt
+    python -m benchmarks.history_prompt --live --sizes 10 500 2000
+"""
+import argparse
+import time
+
+from models.book import BookRecommendation
+from services.book_service import BookService
+from services.prompt_builder import estimate_tokens
+from services.response_cache import ResponseCache
+
+
+def history(size):
+    return [BookRecommendation(f"Book number {i}", f"Author {i % 300}") for i in range(size)]
+
+
+def measure(service, read_books, live):
+    start = time.perf_counter()
+    prompt = service._history_prompt(read_books, 5, None, None)
+    built = time.perf_counter()
+    if live:
+        service.gemini._generate_content(prompt)
+    done = time.perf_counter()
+    return estimate_tokens(prompt), (built - start) * 1000, (done - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500, 2000, 10000])
+    parser.add_argument("--live", action="store_true", help="also call Gemini with each prompt")
+    args = parser.parse_args()
+
+    budgeted = BookService(cache=ResponseCache())
+    unbounded = BookService(cache=ResponseCache(), gemini=budgeted.gemini)
+    unbounded.HISTORY_TOKEN_BUDGET = 10 ** 9
+
+    print(f"{'books':>7} | {'tokens':>8} {'build ms':>9} {'total ms':>9} | {'budgeted tokens':>15} {'build ms':>9} {'total ms':>9}")
+    for size in args.sizes:
+        read_books = history(size)
+        full = measure(unbounded, read_books, args.live)
+        bounded = measure(budgeted, read_books, args.live)
+        print(f"{size:>7} | {full[0]:>8} {full[1]:>9.2f} {full[2]:>9.2f} | {bounded[0]:>15} {bounded[1]:>9.2f} {bounded[2]:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Micro-benchmark: regex-based vs brace-balanced JSON extraction.
+
+    python -m benchmarks.json_extractor
+"""
+import json
+import re
+import timeit
+
+from services.json_extractor import extract_json
+
+
+def regex_extract(text, key):
+    """The extractor GeminiService used before services.json_extractor"""
+    match = re.search(rf'\{{.*?"{key}"\s*:\s*.*?\}}', text, re.DOTALL)
+    if match:
+        try:
+            return json.loads(match.group(0))
+        except json.JSONDecodeError:
+            return None
+    return None
+
+
+def cases():
+    books = [f"Book number {i} by Author {i}" for i in range(20_000)]
+    large = "Here are your books:\n```json\n" + json.dumps({"recommendations": books}, indent=2) + "\n```"
+    nested = json.dumps({"profile": {"genre": "fantasy", "tags": [{"name": f"t{i}"} for i in range(2_000)]},
+                         "recommendations": books[:50]})
+    # Many openings and no closing brace: quadratic for a lazy DOTALL regex
+    adversarial = '{"recommendations": "x" ' * 200
+    truncated = json.dumps({"recommendations": books[:5_000]})[:-40]
+    return {
+        "large (20k items)": (large, "recommendations"),
+        "nested": (nested, "recommendations"),
+        "adversarial unclosed": (adversarial, "recommendations"),
+        "truncated": (truncated, "recommendations"),
+    }
+
+
+def main():
+    print(f"{'case':24} {'size':>10} {'regex ms':>10} {'ok':>4} {'balanced ms':>12} {'ok':>4}")
+    for name, (text, key) in cases().items():
+        row = [f"{name:24}", f"{len(text):>10}"]
+        for extractor in (regex_extract, extract_json):
+            runs = 3
+            elapsed = timeit.timeit(lambda: extractor(text, key), number=runs) / runs
+            ok = extractor(text, key) is not None
+            row.append(f"{elapsed * 1000:>10.2f}" if extractor is regex_extract else f"{elapsed * 1000:>12.2f}")
+            row.append(f"{'yes' if ok else 'no':>4}")
+        print(" ".join(row))
+
+
+if __name__ == "__main__":
+    main()
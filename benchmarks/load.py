@@ -0,0 +1,468 @@
+"""Load test: throughput, latency percentiles and worker memory per route.
+
+Every route of the book, recommendation and analysis blueprints is driven
+at a fixed concurrency through real HTTP against worker processes running
+the full WSGI stack (werkzeug's threaded server, hooks, BookService, cache,
+scheduler). Gemini is replaced by FakeGemini, whose latency distribution,
+error rate and canned responses are configurable, so the numbers cover our
+own overhead and how it behaves under the given backend latency.
+
+The number of distinct books requested (--distinct) sets how often the
+response cache can answer; run with a large value to measure the LLM path.
+
+    python -m benchmarks.load --concurrency 16 --duration 20
+    python -m benchmarks.load --latency-ms 50 --error-rate 0.02 --routes history
+    python -m benchmarks.load --save benchmarks/load_baseline.json
+    python -m benchmarks.load --compare benchmarks/load_baseline.json
+"""
+import argparse
+import http.client
+import json
+import logging
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+from services.gemini_service import GeminiService
+from services.resilience import RetryPolicy
+from services.scheduler import GeminiScheduler
+from services.single_flight import SingleFlight
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BLUEPRINTS = ("book", "recommendation", "analysis")
+
+_ADJECTIVES = ["Silent", "Crimson", "Hidden", "Last", "Broken", "Golden", "Winter", "Burning",
+               "Hollow", "Distant", "Wild", "Glass", "Iron", "Secret", "Drowned", "Endless"]
+_NOUNS = ["River", "Crown", "Garden", "Empire", "Witch", "Harbor", "Orchard", "Lantern",
+          "Library", "Serpent", "Mountain", "Tide", "Oracle", "Citadel", "Voyage", "Forest"]
+_SURNAMES = ["Nowak", "Okafor", "Lindqvist", "Moreau", "Tanaka", "Alvarez", "Kowalski", "Brennan"]
+
+
+def book(index: int) -> Dict[str, str]:
+    words = len(_ADJECTIVES)
+    title = f"The {_ADJECTIVES[index % words]} {_NOUNS[index // words % len(_NOUNS)]}"
+    if index >= words * len(_NOUNS):
+        title += f" {index // (words * len(_NOUNS)) + 1}"
+    return {"title": title, "author": f"{chr(65 + index % 26)}. {_SURNAMES[index % len(_SURNAMES)]}"}
+
+
+_RECOMMENDATIONS = [f"{b['title']} by {b['author']}" for b in map(book, range(1000, 1010))]
+
+# Checked in order against the prompt: the first marker found picks the response
+CANNED_RESPONSES = [
+    ('"results"', json.dumps({"results": [
+        {"index": i, "genre": "fantasy", "spice_level": 2, "content_warnings": ["violence"],
+         "tags": ["found family", "quest", "magic"]}
+        for i in range(1, 51)
+    ]})),
+    ('"similar_books"', json.dumps({
+        "genre": "fantasy", "spice_level": 2, "content_warnings": ["violence"],
+        "tags": ["found family", "quest", "magic"], "similar_books": _RECOMMENDATIONS[:3],
+    })),
+    ('"favorite_genres"', json.dumps({
+        "favorite_genres": ["fantasy", "science fiction", "romance"],
+        "frequent_tropes": ["found family", "chosen one", "enemies to lovers"],
+        "spice_tolerance": "2",
+    })),
+    ('"spice_level"', json.dumps({"spice_level": 2, "content_warnings": ["violence"]})),
+    ('"tags"', json.dumps({"tags": ["found family", "quest", "magic", "dragons", "slow burn"]})),
+    ('"genre"', json.dumps({"genre": "fantasy"})),
+    ('"recommendations"', json.dumps({"recommendations": _RECOMMENDATIONS})),
+]
+
+
+class FakeBackendError(Exception):
+    """Transient upstream failure, retryable like a real 503"""
+    code = 503
+
+
+class FakeGemini(GeminiService):
+    """GeminiService whose model calls sleep for a sampled latency and return canned JSON.
+
+    Latency is log-normal around latency_ms (sigma 0 makes it fixed);
+    error_rate of the calls raise FakeBackendError. Everything above
+    _call_model (coalescing, scheduling, retries, breaker) is the real code.
+    """
+
+    STREAM_CHUNKS = 4
+
+    def __init__(self,
+                 latency_ms: float = 800.0,
+                 sigma: float = 0.4,
+                 error_rate: float = 0.0,
+                 responses: Optional[List[Tuple[str, str]]] = None,
+                 seed: Optional[int] = None,
+                 **kwargs):
+        kwargs.setdefault("client", object())
+        super().__init__(**kwargs)
+        self.latency_ms = latency_ms
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.responses = responses if responses is not None else CANNED_RESPONSES
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+
+    def _sample(self) -> Tuple[float, bool]:
+        """(latency in seconds, whether the call fails)"""
+        with self._rng_lock:
+            latency = self.latency_ms / 1000
+            if self.sigma > 0 and latency > 0:
+                latency = self._rng.lognormvariate(math.log(latency), self.sigma)
+            return latency, self._rng.random() < self.error_rate
+
+    def _response(self, prompt: str) -> str:
+        for marker, response in self.responses:
+            if marker in prompt:
+                return response
+        return self.responses[-1][1]
+
+    def _call_model(self, prompt: str) -> Optional[str]:
+        latency, fails = self._sample()
+        time.sleep(latency)
+        if fails:
+            raise FakeBackendError("fake backend error")
+        return self._response(prompt)
+
+    def _call_model_stream(self, prompt: str) -> Iterator[str]:
+        latency, fails = self._sample()
+        text = self._response(prompt)
+        size = math.ceil(len(text) / self.STREAM_CHUNKS)
+        # Half the latency before the first chunk, the rest spread over the others
+        time.sleep(latency / 2)
+        for start in range(0, len(text), size):
+            if fails and start:
+                raise FakeBackendError("fake backend error")
+            yield text[start:start + size]
+            time.sleep(latency / 2 / self.STREAM_CHUNKS)
+
+
+def _books(start: int, count: int, distinct: int) -> List[Dict[str, str]]:
+    return [book((start + i) % distinct) for i in range(count)]
+
+
+def _path(template: str, **values) -> str:
+    return template.format(**{name: quote(str(value), safe="") for name, value in values.items()})
+
+
+# name -> (HTTP method, route rule, request builder(i, distinct) -> (path, JSON body))
+Scenario = Tuple[str, str, Callable[[int, int], Tuple[str, Optional[dict]]]]
+SCENARIOS: Dict[str, Scenario] = {
+    "genre": ("POST", "/api/book/genre",
+              lambda i, d: ("/api/book/genre", book(i % d))),
+    "genre_url": ("GET", "/api/book/genre/<title>/<author>",
+                  lambda i, d: (_path("/api/book/genre/{title}/{author}", **book(i % d)), None)),
+    "similar": ("POST", "/api/book/similar",
+                lambda i, d: ("/api/book/similar", {**book(i % d), "k": 3})),
+    "similar_url": ("GET", "/api/book/similar/<title>/<author>",
+                    lambda i, d: (_path("/api/book/similar/{title}/{author}", **book(i % d)) + "?k=5", None)),
+    "spice": ("POST", "/api/book/spice-level",
+              lambda i, d: ("/api/book/spice-level", book(i % d))),
+    "spice_url": ("GET", "/api/book/spice-level/<title>/<author>",
+                  lambda i, d: (_path("/api/book/spice-level/{title}/{author}", **book(i % d)), None)),
+    "tags": ("POST", "/api/book/tags",
+             lambda i, d: ("/api/book/tags", {**book(i % d), "count": 5})),
+    "tags_url": ("GET", "/api/book/tags/<title>/<author>",
+                 lambda i, d: (_path("/api/book/tags/{title}/{author}", **book(i % d)), None)),
+    "tags_url_count": ("GET", "/api/book/tags/<title>/<author>/<int:count>",
+                       lambda i, d: (_path("/api/book/tags/{title}/{author}/5", **book(i % d)), None)),
+    "profile": ("POST", "/api/book/profile",
+                lambda i, d: ("/api/book/profile", book(i % d))),
+    "profile_url": ("GET", "/api/book/profile/<title>/<author>",
+                    lambda i, d: (_path("/api/book/profile/{title}/{author}", **book(i % d)), None)),
+    "batch_genre": ("POST", "/api/books/batch/genre",
+                    lambda i, d: ("/api/books/batch/genre", {"books": _books(i, 20, d)})),
+    "batch_spice": ("POST", "/api/books/batch/spice-level",
+                    lambda i, d: ("/api/books/batch/spice-level", {"books": _books(i, 20, d)})),
+    "batch_tags": ("POST", "/api/books/batch/tags",
+                   lambda i, d: ("/api/books/batch/tags", {"books": _books(i, 20, d), "count": 5})),
+    "trope": ("POST", "/api/books/by-trope",
+              lambda i, d: ("/api/books/by-trope", {"trope": "found family", "count": 5, "genre": "fantasy"})),
+    "trope_url": ("GET", "/api/books/by-trope/<trope>",
+                  lambda i, d: ("/api/books/by-trope/enemies-to-lovers", None)),
+    "trope_url_count": ("GET", "/api/books/by-trope/<trope>/<int:count>",
+                        lambda i, d: (f"/api/books/by-trope/vampire/{3 + i % 3}", None)),
+    "trope_url_genre": ("GET", "/api/books/by-trope/<trope>/<int:count>/<genre>",
+                        lambda i, d: ("/api/books/by-trope/vampire/3/Romance", None)),
+    "trope_stream": ("POST", "/api/books/by-trope",
+                     lambda i, d: ("/api/books/by-trope?stream=ndjson", {"trope": "heist", "count": 5})),
+    "mood": ("POST", "/api/books/by-mood",
+             lambda i, d: ("/api/books/by-mood", {"mood": "cozy", "read_books": _books(i, 3, d), "count": 5})),
+    "mood_url": ("GET", "/api/books/by-mood/<mood>",
+                 lambda i, d: ("/api/books/by-mood/melancholic", None)),
+    "mood_url_count": ("GET", "/api/books/by-mood/<mood>/<int:count>",
+                       lambda i, d: ("/api/books/by-mood/adventurous/5", None)),
+    "mood_stream": ("POST", "/api/books/by-mood",
+                    lambda i, d: ("/api/books/by-mood?stream=sse", {"mood": "dark", "count": 5})),
+    "history": ("POST", "/api/recommendations/history",
+                lambda i, d: ("/api/recommendations/history", {"read_books": _books(i, 12, d), "count": 5})),
+    "history_stream": ("POST", "/api/recommendations/history",
+                       lambda i, d: ("/api/recommendations/history?stream=ndjson",
+                                     {"read_books": _books(i, 12, d), "count": 5})),
+    "reading_patterns": ("POST", "/api/analyze/reading-patterns",
+                         lambda i, d: ("/api/analyze/reading-patterns", {"read_books": _books(i, 12, d)})),
+    "reading_patterns_local": ("POST", "/api/analyze/reading-patterns",
+                               lambda i, d: ("/api/analyze/reading-patterns",
+                                             {"read_books": _books(i, 12, d), "mode": "local"})),
+}
+
+
+def uncovered_routes(app) -> List[str]:
+    """Routes of the benchmarked blueprints that no scenario exercises"""
+    covered = {(method, rule) for method, rule, _ in SCENARIOS.values()}
+    missing = []
+    for rule in app.url_map.iter_rules():
+        if rule.endpoint.split(".")[0] not in BLUEPRINTS:
+            continue
+        for method in sorted(rule.methods - {"HEAD", "OPTIONS"}):
+            if (method, rule.rule) not in covered:
+                missing.append(f"{method} {rule.rule}")
+    return missing
+
+
+def serve(args) -> None:
+    """Worker process: the real app around FakeGemini, on an ephemeral port"""
+    from werkzeug.serving import make_server
+    from main import create_app
+    from services.book_service import BookService
+    from services.response_cache import ResponseCache
+
+    responses = CANNED_RESPONSES
+    if args.responses:
+        with open(args.responses) as f:
+            responses = [tuple(pair) for pair in json.load(f)]
+    gemini = FakeGemini(
+        latency_ms=args.latency_ms, sigma=args.latency_sigma, error_rate=args.error_rate,
+        responses=responses, seed=args.seed,
+        single_flight=SingleFlight(),
+        # Rate limits are lifted unless given: the benchmark measures this service, not the quota
+        scheduler=GeminiScheduler(requests_per_minute=args.rpm, tokens_per_minute=args.rpm * 10_000,
+                                  max_concurrency=args.max_concurrency),
+        retry=RetryPolicy.from_env(),
+    )
+    app = create_app(BookService(cache=ResponseCache(), gemini=gemini))
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    print(server.server_port, flush=True)
+    # Nobody reads the pipe after the port: per-request logs and error prints would fill it and block
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    with open(os.devnull, "w") as devnull:
+        os.dup2(devnull.fileno(), sys.stdout.fileno())
+    server.serve_forever()
+
+
+def start_workers(args) -> List[Tuple[subprocess.Popen, int]]:
+    command = [sys.executable, "-m", "benchmarks.load", "--serve",
+               "--latency-ms", str(args.latency_ms), "--latency-sigma", str(args.latency_sigma),
+               "--error-rate", str(args.error_rate), "--rpm", str(args.rpm),
+               "--max-concurrency", str(args.max_concurrency)]
+    if args.responses:
+        command += ["--responses", args.responses]
+    workers = []
+    for index in range(args.workers):
+        seed = ["--seed", str(args.seed + index)] if args.seed is not None else []
+        process = subprocess.Popen(command + seed, cwd=ROOT, stdout=subprocess.PIPE, text=True)
+        workers.append((process, int(process.stdout.readline())))
+    return workers
+
+
+def request(port: int, method: str, path: str, body: Optional[dict]) -> Tuple[int, bool]:
+    """(status, whether the answer was flagged degraded)"""
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+    try:
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        connection.request(method, path, json.dumps(body) if body is not None else None, headers)
+        response = connection.getresponse()
+        response.read()
+        return response.status, response.getheader("X-Degraded") is not None
+    finally:
+        connection.close()
+
+
+def drive(ports: List[int], scenarios: List[str], concurrency: int, duration: float, distinct: int) -> dict:
+    """Closed loop: each client sends its next request as soon as the previous one finished"""
+    samples: Dict[str, List[float]] = {name: [] for name in scenarios}
+    errors: Dict[str, int] = {name: 0 for name in scenarios}
+    degraded: Dict[str, int] = {name: 0 for name in scenarios}
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client(number: int) -> None:
+        i = number
+        while time.perf_counter() < stop_at:
+            name = scenarios[i % len(scenarios)]
+            method, _, build = SCENARIOS[name]
+            path, body = build(i, distinct)
+            started = time.perf_counter()
+            try:
+                status, flagged = request(ports[i % len(ports)], method, path, body)
+                ok = status < 400
+            except OSError:
+                ok, flagged = False, False
+            elapsed = time.perf_counter() - started
+            with lock:
+                samples[name].append(elapsed)
+                errors[name] += not ok
+                degraded[name] += flagged
+            i += concurrency
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {"elapsed": time.perf_counter() - started, "samples": samples, "errors": errors, "degraded": degraded}
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summary(latencies: List[float], errors: int, degraded: int, elapsed: float) -> dict:
+    if not latencies:
+        return {"requests": 0, "errors": errors, "degraded": degraded, "throughput_rps": 0.0}
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "degraded": degraded,
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+def memory(pid: int) -> dict:
+    """Resident and peak resident memory of a worker in MB (Linux /proc only)"""
+    values = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("VmRSS", "VmHWM"):
+                    values[{"VmRSS": "rss_mb", "VmHWM": "peak_rss_mb"}[key]] = round(int(value.split()[0]) / 1024, 1)
+    except OSError:
+        pass
+    return values
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args, scenarios: List[str]) -> dict:
+    workers = start_workers(args)
+    try:
+        result = drive([port for _, port in workers], scenarios, args.concurrency, args.duration, args.distinct)
+        workers_memory = [memory(process.pid) for process, _ in workers]
+    finally:
+        for process, _ in workers:
+            process.terminate()
+            process.wait()
+
+    samples, errors, degraded = result["samples"], result["errors"], result["degraded"]
+    elapsed = result["elapsed"]
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "config": {key: getattr(args, key) for key in (
+                "workers", "concurrency", "duration", "distinct", "latency_ms", "latency_sigma", "error_rate")},
+        },
+        "overall": summary([s for name in scenarios for s in samples[name]],
+                           sum(errors.values()), sum(degraded.values()), elapsed),
+        "routes": {name: summary(samples[name], errors[name], degraded[name], elapsed) for name in scenarios},
+        "workers": workers_memory,
+    }
+
+
+def report(results: dict) -> None:
+    print(f"{'route':24} {'requests':>9} {'errors':>7} {'degraded':>9} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, values in list(results["routes"].items()) + [("overall", results["overall"])]:
+        print(f"{name:24} {values['requests']:>9} {values['errors']:>7} {values['degraded']:>9} "
+              f"{values['throughput_rps']:>9.2f} "
+              f"{values.get('p50_ms', 0):>9.2f} {values.get('p95_ms', 0):>9.2f} {values.get('p99_ms', 0):>9.2f}")
+    for index, values in enumerate(results["workers"]):
+        print(f"worker {index}: rss {values.get('rss_mb', 'n/a')} MB, peak {values.get('peak_rss_mb', 'n/a')} MB")
+
+
+def compare(results: dict, baseline_path: str, tolerance: float) -> bool:
+    """Fail on a drop in overall throughput or a rise in overall latency; per-route changes are informational"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    if baseline["meta"]["config"] != results["meta"]["config"]:
+        print(f"warning: baseline was recorded with {baseline['meta']['config']}")
+
+    ok = True
+    print(f"baseline commit {baseline['meta'].get('commit')} -> {results['meta'].get('commit')}")
+    for metric, higher_is_better in (("throughput_rps", True), ("p50_ms", False), ("p95_ms", False), ("p99_ms", False)):
+        before, after = baseline["overall"].get(metric), results["overall"].get(metric)
+        if not before or after is None:
+            continue
+        change = (after - before) / before
+        regressed = -change > tolerance if higher_is_better else change > tolerance
+        ok = ok and not regressed
+        print(f"overall {metric:16} {before:10.2f} -> {after:10.2f}  ({change:+.1%}){'  REGRESSION' if regressed else ''}")
+    for name, values in results["routes"].items():
+        before = baseline["routes"].get(name, {}).get("p95_ms")
+        if before and "p95_ms" in values:
+            change = (values["p95_ms"] - before) / before
+            print(f"{name:24} p95 {before:10.2f} -> {values['p95_ms']:10.2f} ms  ({change:+.1%})")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=1, help="server processes, each with its own BookService")
+    parser.add_argument("--concurrency", type=int, default=8, help="client connections in flight")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of load")
+    parser.add_argument("--distinct", type=int, default=200, help="distinct books requested (sets the cache hit ratio)")
+    parser.add_argument("--routes", nargs="+", help="scenario names (or prefixes) to run; default all")
+    parser.add_argument("--latency-ms", type=float, default=800.0, help="median fake Gemini latency")
+    parser.add_argument("--latency-sigma", type=float, default=0.4, help="log-normal sigma; 0 for a fixed latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of fake Gemini calls that fail with 503")
+    parser.add_argument("--responses", help="JSON list of [prompt marker, response] pairs replacing the canned ones")
+    parser.add_argument("--rpm", type=int, default=1_000_000, help="scheduler requests per minute")
+    parser.add_argument("--max-concurrency", type=int, default=64, help="scheduler concurrent Gemini calls")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--save", help="write results as a baseline JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="allowed relative throughput drop / latency rise before failing")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    from main import app
+    missing = uncovered_routes(app)
+    if missing:
+        sys.exit(f"no benchmark scenario for: {', '.join(missing)}")
+
+    scenarios = [name for name in SCENARIOS
+                 if not args.routes or any(name.startswith(prefix) for prefix in args.routes)]
+    results = run(args, scenarios)
+    report(results)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare and not compare(results, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
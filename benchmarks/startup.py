@@ -0,0 +1,117 @@
+"""Cold-start benchmark: import time and time-to-first-response.
+
+Every sample runs in a fresh interpreter so module caches do not leak
+between runs. The Gemini call itself is replaced by a canned response, so
+the numbers cover only our own start-up work (imports, app factory, SDK
+client construction on the first LLM call). Importing main must also leave
+the heavy modules in LAZY_MODULES unloaded; the run fails if one of them
+is pulled in eagerly.
+
+    python -m benchmarks.startup --runs 10
+    python -m benchmarks.startup --save benchmarks/startup_baseline.json
+    python -m benchmarks.startup --compare benchmarks/startup_baseline.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imported only by the code paths that need them, never by `import main`
+LAZY_MODULES = ("numpy", "google.genai", "httpx")
+
+# Executed in the child interpreter; prints one JSON sample.
+_PROBE = r"""
+import json, sys, time
+from unittest.mock import Mock
+
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+eager_imports = [name for name in LAZY_MODULES if name in sys.modules]
+
+client = main.app.test_client()
+client.get('/api/health')
+first_response = time.perf_counter()
+
+service = main.app.extensions["book_service"]
+service.gemini.client  # first LLM call builds the SDK client
+service.gemini._call_model = Mock(return_value='{"genre": "fantasy"}')
+client.get('/api/book/genre/Dune/Frank%20Herbert')
+first_llm_response = time.perf_counter()
+
+print(json.dumps({
+    "import_main_ms": (imported - start) * 1000,
+    "first_response_ms": (first_response - start) * 1000,
+    "first_llm_response_ms": (first_llm_response - start) * 1000,
+    "eager_imports": eager_imports,
+}))
+"""
+
+
+def sample() -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", f"LAZY_MODULES = {LAZY_MODULES!r}\n{_PROBE}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(runs: int) -> Tuple[dict, List[str]]:
+    samples = [sample() for _ in range(runs)]
+    eager_imports = sorted({name for s in samples for name in s.pop("eager_imports")})
+    if eager_imports:
+        print(f"importing main loaded: {', '.join(eager_imports)}  EAGER IMPORT", file=sys.stderr)
+    results = {
+        metric: {
+            "median": round(statistics.median(s[metric] for s in samples), 2),
+            "min": round(min(s[metric] for s in samples), 2),
+        }
+        for metric in samples[0]
+    }
+    return results, eager_imports
+
+
+def compare(results: dict, baseline_path: str, tolerance: float) -> bool:
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    ok = True
+    for metric, values in results.items():
+        if metric not in baseline:
+            continue
+        before, after = baseline[metric]["median"], values["median"]
+        change = (after - before) / before if before else 0.0
+        regressed = change > tolerance
+        ok = ok and not regressed
+        print(f"{metric:24} {before:10.2f} -> {after:10.2f} ms  ({change:+.1%}){'  REGRESSION' if regressed else ''}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--save", help="write results as a baseline JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed relative slowdown of the median before failing")
+    args = parser.parse_args()
+
+    results, eager_imports = run(args.runs)
+    print(json.dumps(results, indent=2))
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare and not compare(results, args.compare, args.tolerance):
+        sys.exit(1)
+    if eager_imports:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,59 +1,124 @@
 
 
-from flask import Flask, request, jsonify
+from typing import Optional
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 from services.book_service import BookService
 from models.book import BookRecommendation
 from routes import book_bp, recommendation_bp, analysis_bp
+from routes.context import get_book_service
+from routes.deadlines import init_deadlines
+from routes.http_cache import init_http_cache
+from routes.metrics import init_metrics
+from routes.timing import init_timing
+from services.metrics import REGISTRY
 
 
-app = Flask(__name__)
-CORS(app)  
+def create_app(book_service: Optional[BookService] = None) -> Flask:
+    """Zbuduj aplikację z jednym współdzielonym BookService na proces"""
+    app = Flask(__name__)
+    CORS(app)
 
+    # One service graph (BookService -> GeminiService -> pooled genai.Client)
+    app.extensions["book_service"] = book_service if book_service is not None else BookService()
 
-book_service = BookService()
+    # Buletprints registration
+    app.register_blueprint(book_bp)
+    app.register_blueprint(recommendation_bp)
+    app.register_blueprint(analysis_bp)
 
+    # Request metrics first, so their timing covers the other hooks
+    init_metrics(app)
+    # Server-Timing phases, optional JSON timing log and on-demand cProfile
+    init_timing(app)
+    # Per-request time budget passed down to Gemini calls
+    init_deadlines(app)
+    # ETag / Cache-Control / 304 for the GET lookup routes
+    init_http_cache(app)
 
-# Buletprints registration
-app.register_blueprint(book_bp)
-app.register_blueprint(recommendation_bp)
-app.register_blueprint(analysis_bp)
+    @app.route('/api/health', methods=['GET'])
+    def health_check():
+        """Sprawdź czy API działa"""
+        return jsonify({"status": "healthy", "message": "Book API is running!"})
 
-@app.route('/api/health', methods=['GET'])
-def health_check():
-    """Sprawdź czy API działa"""
-    return jsonify({"status": "healthy", "message": "Book API is running!"})
+    @app.route('/api/cache/stats', methods=['GET'])
+    def cache_stats():
+        """Statystyki cache odpowiedzi Gemini"""
+        return jsonify(get_book_service().cache_stats())
 
+    @app.route('/api/gemini/stats', methods=['GET'])
+    def gemini_stats():
+        """Statystyki wywołań Gemini (połączone zapytania, kolejka, limity, ponowienia, kasety)"""
+        gemini = get_book_service().gemini
+        return jsonify({
+            "single_flight": gemini.single_flight.stats(),
+            "scheduler": gemini.scheduler.stats(),
+            "calls": gemini.stats(),
+            "circuit_breaker": gemini.breaker.stats(),
+            "backend": gemini.backend.stats(),
+        })
 
+    @app.route('/api/catalog/stats', methods=['GET'])
+    def catalog_stats():
+        """Statystyki lokalnego katalogu sklasyfikowanych książek"""
+        return jsonify(get_book_service().catalog.stats())
 
-@app.errorhandler(404)
-def not_found(error):
-    return jsonify({"error": "Endpoint not found"}), 404
+    @app.route('/api/metrics', methods=['GET'])
+    def metrics():
+        """Metryki w formacie tekstowym Prometheusa (zsumowane ze wszystkich workerów)"""
+        return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
 
-@app.errorhandler(500)
-def internal_error(error):
-    return jsonify({"error": "Internal server error"}), 500
+    @app.route('/api/similarity/stats', methods=['GET'])
+    def similarity_stats():
+        """Statystyki lokalnego indeksu podobieństwa książek"""
+        return jsonify(get_book_service().similarity.stats())
 
-@app.errorhandler(405)
-def method_not_allowed(error):
-    return jsonify({"error": "Method not allowed"}), 405
+
+
+    @app.errorhandler(404)
+    def not_found(error):
+        return jsonify({"error": "Endpoint not found"}), 404
+
+    @app.errorhandler(500)
+    def internal_error(error):
+        return jsonify({"error": "Internal server error"}), 500
+
+    @app.errorhandler(405)
+    def method_not_allowed(error):
+        return jsonify({"error": "Method not allowed"}), 405
+
+    return app
+
+
+app = create_app()
 
 
 if __name__ == '__main__':
     print("🚀 Starting Book API...")
     print("📚 Available endpoints:")
     print("  GET  /api/health")
+    print("  GET  /api/metrics")
+    print("  GET  /api/cache/stats")
+    print("  GET  /api/gemini/stats")
+    print("  GET  /api/catalog/stats")
+    print("  GET  /api/similarity/stats")
     print("  POST /api/book/genre")
     print("  GET  /api/book/genre/<title>/<author>")
     print("  POST /api/book/similar")
-    print("  GET  /api/book/similar/<title>/<author>")
+    print("  GET  /api/book/similar/<title>/<author>?k=3")
     print("  POST /api/book/spice-level")
     print("  POST /api/book/tags")
+    print("  POST /api/book/profile")
+    print("  GET  /api/book/profile/<title>/<author>")
+    print("  POST /api/books/batch/genre")
+    print("  POST /api/books/batch/spice-level")
+    print("  POST /api/books/batch/tags")
     print("  POST /api/books/by-trope")
     print("  GET  /api/books/by-trope/<trope>")
     print("  GET  /api/books/by-trope/<trope>/<count>")
     print("  GET  /api/books/by-trope/<trope>/<count>/<genre>")
     print("  POST /api/recommendations/history")
+    print("  (add ?stream=ndjson or ?stream=sse to by-trope, by-mood and history to stream results)")
     print()
     print("🌍 Example URLs to test:")
     print("  http://localhost:5000/api/book/genre/Wiedźmin/Andrzej%20Sapkowski")
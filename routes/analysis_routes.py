@@ -1,10 +1,9 @@
 from flask import Blueprint, request, jsonify
-from services.book_service import BookService
 from models.book import BookRecommendation
+from .context import book_service
 import traceback
 
 analysis_bp = Blueprint('analysis', __name__)
-book_service = BookService()
 
 @analysis_bp.route('/api/analyze/reading-patterns', methods=['POST'])
 def analyze_reading_patterns():
@@ -12,10 +11,14 @@ def analyze_reading_patterns():
     try:
         data = request.get_json()
         read_books_data = data.get('read_books', [])
+        mode = data.get('mode', 'llm')
         
         if not read_books_data:
             return jsonify({"error": "read_books list is required"}), 400
         
+        if mode not in ('llm', 'local'):
+            return jsonify({"error": "mode must be 'llm' or 'local'"}), 400
+        
         # Konwertuj dane na obiekty Book
         read_books = []
         for book_data in read_books_data:
@@ -25,10 +28,11 @@ def analyze_reading_patterns():
                 return jsonify({"error": "Each book must have 'title' and 'author'"}), 400
         
         # Wywołaj analizę wzorców
-        patterns = book_service.analyze_reading_patterns(read_books)
+        patterns = book_service.analyze_reading_patterns(read_books, mode)
         
         return jsonify({
             "analyzed_books_count": len(read_books),
+            "mode": mode,
             "patterns": patterns
         })
     
@@ -1,9 +1,8 @@
 from flask import Blueprint, request, jsonify
-from services.book_service import BookService
 from models.book import BookRecommendation
+from .context import book_service
 
 book_bp = Blueprint('book', __name__)
-book_service = BookService()
 
 @book_bp.route('/api/book/genre', methods=['POST'])
 def get_book_genre():
@@ -41,6 +40,21 @@ def get_book_genre_url(title, author):
         return jsonify({"error": str(e)}), 500
     
 
+DEFAULT_SIMILAR_K = 3
+MAX_SIMILAR_K = 50
+
+
+def _parse_similar_k(value):
+    """Liczba podobnych książek z body/query string"""
+    try:
+        k = int(value)
+    except (TypeError, ValueError):
+        return None, "k must be an integer"
+    if not 1 <= k <= MAX_SIMILAR_K:
+        return None, f"k must be between 1 and {MAX_SIMILAR_K}"
+    return k, None
+
+
 @book_bp.route('/api/book/similar', methods=['POST'])
 def get_similar_books():
     """Pobierz podobne książki"""
@@ -52,7 +66,11 @@ def get_similar_books():
         if not title or not author:
             return jsonify({"error": "Title and author are required"}), 400
         
-        similar_books = book_service.get_similar_books(title, author)
+        k, error = _parse_similar_k(data.get('k', DEFAULT_SIMILAR_K))
+        if error:
+            return jsonify({"error": error}), 400
+        
+        similar_books = book_service.get_similar_books(title, author, k)
         return jsonify({
             "original_book": {"title": title, "author": author},
             "recommendations": [
@@ -66,9 +84,13 @@ def get_similar_books():
     
 @book_bp.route('/api/book/similar/<title>/<author>', methods=['GET'])
 def get_similar_books_url(title, author):
-    """Pobierz podobne książki przez URL"""
+    """Pobierz podobne książki przez URL (?k=liczba wyników)"""
     try:
-        similar_books = book_service.get_similar_books(title, author)
+        k, error = _parse_similar_k(request.args.get('k', DEFAULT_SIMILAR_K))
+        if error:
+            return jsonify({"error": error}), 400
+        
+        similar_books = book_service.get_similar_books(title, author, k)
         return jsonify({
             "original_book": {"title": title, "author": author},
             "recommendations": [
@@ -155,4 +177,120 @@ def get_book_tags():
         })
     
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
+
+def _profile_response(title, author, profile):
+    return jsonify({
+        "title": title,
+        "author": author,
+        "genre": profile["genre"],
+        "spice_level": profile["spice_level"],
+        "content_warnings": profile["content_warnings"],
+        "tags": profile["tags"],
+        "similar_books": [
+            {"title": book.title, "author": book.author}
+            for book in profile["similar_books"]
+        ]
+    })
+
+
+@book_bp.route('/api/book/profile', methods=['POST'])
+def get_book_profile():
+    """Pobierz pełny profil książki (gatunek, pikantność, tagi, podobne)"""
+    try:
+        data = request.get_json()
+        title = data.get('title')
+        author = data.get('author')
+        count = data.get('count', 10)
+
+        if not title or not author:
+            return jsonify({"error": "Title and author are required"}), 400
+
+        profile = book_service.get_book_profile(title, author, count)
+        return _profile_response(title, author, profile)
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@book_bp.route('/api/book/profile/<title>/<author>', methods=['GET'])
+def get_book_profile_url(title, author):
+    """Pobierz pełny profil książki przez URL"""
+    try:
+        profile = book_service.get_book_profile(title, author)
+        return _profile_response(title, author, profile)
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+MAX_BATCH_BOOKS = 1000
+
+
+def _parse_batch_books(data):
+    """Zamień listę {title, author} z body na obiekty BookRecommendation"""
+    books_data = (data or {}).get('books', [])
+    if not books_data or not isinstance(books_data, list):
+        return None, "books list is required"
+    if len(books_data) > MAX_BATCH_BOOKS:
+        return None, f"At most {MAX_BATCH_BOOKS} books per request"
+
+    books = []
+    for book_data in books_data:
+        if isinstance(book_data, dict) and book_data.get('title') and book_data.get('author'):
+            books.append(BookRecommendation(book_data['title'], book_data['author']))
+        else:
+            return None, "Each book must have 'title' and 'author'"
+    return books, None
+
+
+def _batch_response(results):
+    return jsonify({
+        "count": len(results),
+        "errors": sum(1 for item in results if "error" in item),
+        "results": results
+    })
+
+
+@book_bp.route('/api/books/batch/genre', methods=['POST'])
+def get_books_genre_batch():
+    """Pobierz gatunki wielu książek jednocześnie"""
+    try:
+        books, error = _parse_batch_books(request.get_json())
+        if error:
+            return jsonify({"error": error}), 400
+
+        return _batch_response(book_service.get_books_genre_batch(books))
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@book_bp.route('/api/books/batch/spice-level', methods=['POST'])
+def get_books_spice_level_batch():
+    """Pobierz poziomy pikantności wielu książek jednocześnie"""
+    try:
+        books, error = _parse_batch_books(request.get_json())
+        if error:
+            return jsonify({"error": error}), 400
+
+        return _batch_response(book_service.get_books_spice_level_batch(books))
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@book_bp.route('/api/books/batch/tags', methods=['POST'])
+def get_books_tags_batch():
+    """Pobierz tagi wielu książek jednocześnie"""
+    try:
+        data = request.get_json()
+        books, error = _parse_batch_books(data)
+        if error:
+            return jsonify({"error": error}), 400
+
+        count = data.get('count', 10)
+        return _batch_response(book_service.get_books_tags_batch(books, count))
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
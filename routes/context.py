@@ -0,0 +1,10 @@
+from flask import current_app
+from werkzeug.local import LocalProxy
+
+
+def get_book_service():
+    """BookService shared by the whole app, injected by create_app()"""
+    return current_app.extensions["book_service"]
+
+
+book_service = LocalProxy(get_book_service)
@@ -0,0 +1,66 @@
+import json
+from flask import Flask, g, request
+from services import deadline
+
+DEADLINE_HEADER = 'X-Request-Deadline-Ms'
+DEGRADED_HEADER = 'X-Degraded'
+
+# Budżet czasu (sekundy) dla endpointów bez nagłówka
+DEFAULT_DEADLINE = 10.0
+MAX_DEADLINE = 120.0
+BLUEPRINT_DEADLINES = {
+    'book': 10.0,
+    'recommendation': 20.0,
+    'analysis': 30.0,
+}
+ENDPOINT_DEADLINES = {
+    'book.get_books_genre_batch': 60.0,
+    'book.get_books_spice_level_batch': 60.0,
+    'book.get_books_tags_batch': 60.0,
+}
+
+
+def request_deadline():
+    """Deadline żądania z nagłówka (ms) albo domyślny dla endpointu, w sekundach"""
+    header = request.headers.get(DEADLINE_HEADER)
+    if header:
+        try:
+            return min(max(int(header), 0) / 1000, MAX_DEADLINE)
+        except ValueError:
+            pass
+    if request.endpoint in ENDPOINT_DEADLINES:
+        return ENDPOINT_DEADLINES[request.endpoint]
+    return BLUEPRINT_DEADLINES.get(request.blueprint, DEFAULT_DEADLINE)
+
+
+def init_deadlines(app: Flask) -> None:
+    """Każde żądanie do blueprintów ma budżet czasu; odpowiedzi zastępcze są oznaczane"""
+
+    @app.before_request
+    def start_deadline():
+        if request.blueprint in BLUEPRINT_DEADLINES:
+            g.deadline_tokens = deadline.begin_request(request_deadline())
+
+    @app.after_request
+    def flag_degraded(response):
+        reasons = deadline.degraded_reasons()
+        if not reasons:
+            return response
+        response.headers[DEGRADED_HEADER] = ', '.join(reasons)
+        if response.is_json and not response.is_streamed:
+            data = response.get_json(silent=True)
+            if isinstance(data, dict):
+                data['degraded'] = True
+                data['degraded_reasons'] = reasons
+                response.set_data(json.dumps(data, ensure_ascii=False))
+        return response
+
+    @app.teardown_request
+    def end_deadline(error=None):
+        tokens = g.pop('deadline_tokens', None)
+        if tokens is not None:
+            try:
+                deadline.end_request(tokens)
+            except ValueError:
+                # Streamed responses finish in a different context
+                pass
@@ -0,0 +1,109 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from flask import Flask, Response, request
+from services import deadline
+from .streaming import requested_stream_format
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+
+# Endpoint -> (max-age, stale-while-revalidate) w sekundach
+CACHE_POLICIES: Dict[str, Tuple[int, int]] = {
+    'book.get_book_genre_url': (DAY, 7 * DAY),
+    'book.get_spice_level_url': (DAY, 7 * DAY),
+    'book.get_book_tags_url': (DAY, 7 * DAY),
+    'book.get_book_profile_url': (DAY, 7 * DAY),
+    # Lokalny indeks i katalog rosną, więc podobne książki i tropy zmieniają się częściej
+    'book.get_similar_books_url': (HOUR, DAY),
+    'recommendation.get_books_by_trope_url': (HOUR, DAY),
+}
+
+
+class ETagRegistry:
+    """Ostatni ETag wysłany dla ścieżki (z query string), ważny przez max-age odpowiedzi"""
+
+    def __init__(self, max_entries: int = 10_000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+
+    def get(self, path: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None:
+                return None
+            etag, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[path]
+                return None
+            self._entries.move_to_end(path)
+            return etag
+
+    def put(self, path: str, etag: str, max_age: int) -> None:
+        with self._lock:
+            self._entries[path] = (etag, time.monotonic() + max_age)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def cache_control(policy: Tuple[int, int]) -> str:
+    max_age, stale_while_revalidate = policy
+    return f'public, max-age={max_age}, stale-while-revalidate={stale_while_revalidate}'
+
+
+def content_etag(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()[:32]
+
+
+def init_http_cache(app: Flask, policies: Optional[Dict[str, Tuple[int, int]]] = None) -> None:
+    """ETag, Cache-Control i 304 dla tras GET zwracających tę samą odpowiedź dla tych samych danych.
+
+    Znany, wciąż świeży ETag ścieżki pozwala odpowiedzieć 304 na If-None-Match
+    bez wywołania BookService. Odpowiedzi zastępcze (degraded), błędy
+    i strumienie (z ?stream albo z nagłówka Accept) nie są cache'owane;
+    wszystkie odpowiedzi tych tras mają Vary: Accept.
+    """
+    policies = {**CACHE_POLICIES, **(policies or {})}
+    registry = ETagRegistry()
+    app.extensions['etag_registry'] = registry
+
+    def policy():
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        return policies.get(request.endpoint)
+
+    @app.before_request
+    def answer_not_modified():
+        current = policy()
+        if current is None or not request.if_none_match or requested_stream_format() is not None:
+            return None
+        etag = registry.get(request.full_path)
+        if etag is None or not request.if_none_match.contains(etag):
+            return None
+        response = Response(status=304)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = cache_control(current)
+        response.vary.add('Accept')
+        return response
+
+    @app.after_request
+    def add_cache_headers(response):
+        current = policy()
+        if current is None:
+            return response
+        # Nagłówek Accept może wybrać odpowiedź strumieniowaną
+        response.vary.add('Accept')
+        if response.status_code != 200 or response.is_streamed or requested_stream_format() is not None:
+            return response
+        if deadline.degraded_reasons():
+            response.headers['Cache-Control'] = 'no-store'
+            return response
+        etag = content_etag(response.get_data())
+        registry.put(request.full_path, etag, current[0])
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = cache_control(current)
+        return response.make_conditional(request)
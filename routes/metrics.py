@@ -0,0 +1,31 @@
+import os
+import time
+from flask import Flask, g, request
+from services.metrics import HTTP_IN_FLIGHT, HTTP_LATENCY, HTTP_REQUESTS, REGISTRY
+
+
+def init_metrics(app: Flask) -> None:
+    """Liczniki i histogramy żądań HTTP dla /api/metrics"""
+    if os.environ.get("METRICS_DIR"):
+        # Kilka procesów workerów: każdy zapisuje swoje metryki do wspólnego katalogu
+        REGISTRY.enable_multiprocess(os.environ["METRICS_DIR"])
+
+    @app.before_request
+    def start_timer():
+        g.metrics_started = time.perf_counter()
+        HTTP_IN_FLIGHT.inc()
+
+    @app.after_request
+    def record_request(response):
+        started = g.get('metrics_started')
+        if started is not None:
+            # Szablon trasy zamiast ścieżki, żeby liczba serii była ograniczona
+            route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            HTTP_REQUESTS.inc(method=request.method, route=route, status=str(response.status_code))
+            HTTP_LATENCY.observe(time.perf_counter() - started, method=request.method, route=route)
+        return response
+
+    @app.teardown_request
+    def end_timer(error=None):
+        if g.pop('metrics_started', None) is not None:
+            HTTP_IN_FLIGHT.dec()
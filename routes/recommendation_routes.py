@@ -1,10 +1,10 @@
 from flask import Blueprint, request, jsonify
-from services.book_service import BookService
 from models.book import BookRecommendation
+from .context import book_service
+from .streaming import requested_stream_format, stream_books
 import traceback
 
 recommendation_bp = Blueprint('recommendation', __name__)
-book_service = BookService()
 
 @recommendation_bp.route('/api/books/by-trope', methods=['POST'])
 def get_books_by_trope():
@@ -18,6 +18,10 @@ def get_books_by_trope():
         if not trope:
             return jsonify({"error": "Trope is required"}), 400
         
+        stream_format = requested_stream_format()
+        if stream_format:
+            return stream_books(book_service.stream_books_for_trope(trope, count, genre), stream_format)
+        
         books = book_service.get_books_for_trope(trope, count, genre)
         return jsonify({
             "trope": trope,
@@ -37,6 +41,10 @@ def get_books_by_trope():
 def get_books_by_trope_url(trope, count=5, genre=None):
     """Pobierz książki według tropu przez URL"""
     try:
+        stream_format = requested_stream_format()
+        if stream_format:
+            return stream_books(book_service.stream_books_for_trope(trope, count, genre), stream_format)
+        
         books = book_service.get_books_for_trope(trope, count, genre)
         return jsonify({
             "trope": trope,
@@ -76,6 +84,12 @@ def get_books_by_mood():
             else:
                 return jsonify({"error": "Each book must have 'title' and 'author'"}), 400
         
+        stream_format = requested_stream_format()
+        if stream_format:
+            return stream_books(book_service.stream_books_by_mood(
+                mood, read_books, count, preferred_genres, spice_level, avoid_triggers, audience
+            ), stream_format)
+        
         recommendations = book_service.get_books_by_mood(
             mood, read_books, count, preferred_genres, spice_level, avoid_triggers, audience
         )
@@ -97,6 +111,10 @@ def get_books_by_mood():
 def get_books_by_mood_url(mood, count=5):
     """Pobierz książki według nastroju przez URL"""
     try:
+        stream_format = requested_stream_format()
+        if stream_format:
+            return stream_books(book_service.stream_books_by_mood(mood, count=count), stream_format)
+        
         recommendations = book_service.get_books_by_mood(mood, count=count)
         return jsonify({
             "mood": mood,
@@ -131,6 +149,12 @@ def get_recommendations_from_history():
             else:
                 return jsonify({"error": "Each book must have 'title' and 'author'"}), 400
         
+        stream_format = requested_stream_format()
+        if stream_format:
+            return stream_books(book_service.stream_recommendations_from_history(
+                read_books, count, preferred_genres, exclude_authors
+            ), stream_format)
+        
         recommendations = book_service.get_recommendations_from_history(
             read_books, count, preferred_genres, exclude_authors
         )
@@ -0,0 +1,68 @@
+import contextvars
+import json
+from flask import Response, request, stream_with_context
+from services import deadline
+
+STREAM_MIMETYPES = {
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream",
+}
+
+
+def requested_stream_format():
+    """Format strumienia z ?stream=ndjson|sse albo z nagłówka Accept (None = zwykły JSON)"""
+    stream = request.args.get('stream')
+    if stream in STREAM_MIMETYPES:
+        return stream
+    for stream, mimetype in STREAM_MIMETYPES.items():
+        if request.accept_mimetypes.best == mimetype:
+            return stream
+    return None
+
+
+def stream_books(books, stream_format):
+    """Wysyłaj każdą książkę do klienta, gdy tylko zostanie wygenerowana.
+
+    Nagłówki (i X-Degraded) są wysyłane przed treścią, więc strumień, który
+    urwał się albo dał odpowiedź zastępczą, kończy się zdarzeniem 'error'
+    (w NDJSON linią z "error") z powodami degradacji zamiast 'done'.
+    Książki są generowane w kontekście żądania (deadline, powody degradacji),
+    bo serwer czyta strumień już po jego zakończeniu.
+    """
+    context = contextvars.copy_context()
+    books = iter(books)
+
+    def generate():
+        failed = False
+        try:
+            while True:
+                book = context.run(next, books, None)
+                if book is None:
+                    break
+                payload = json.dumps({"title": book.title, "author": book.author}, ensure_ascii=False)
+                if stream_format == "sse":
+                    yield f"event: book\ndata: {payload}\n\n"
+                else:
+                    yield f"{payload}\n"
+        except Exception as e:
+            print(f"Stream failed: {e}")
+            failed = True
+
+        reasons = context.run(deadline.degraded_reasons)
+        if failed and not reasons:
+            reasons = ["error"]
+        if reasons:
+            payload = json.dumps({"error": "Incomplete answer", "degraded": True, "degraded_reasons": reasons},
+                                 ensure_ascii=False)
+            if stream_format == "sse":
+                yield f"event: error\ndata: {payload}\n\n"
+            else:
+                yield f"{payload}\n"
+        elif stream_format == "sse":
+            yield "event: done\ndata: {}\n\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype=STREAM_MIMETYPES[stream_format],
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,118 @@
+import cProfile
+import hmac
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+from flask import Flask, Response, g, request
+from flask.json.provider import DefaultJSONProvider
+from services import timing
+from services.timing import span
+
+SERVER_TIMING_HEADER = 'Server-Timing'
+PROFILE_TOKEN_HEADER = 'X-Profile-Token'
+PROFILE_SORT_HEADER = 'X-Profile-Sort'
+PROFILE_SORTS = ('cumulative', 'tottime', 'ncalls')
+PROFILE_LINES = 40
+
+timing_log = logging.getLogger('book_api.timing')
+
+# cProfile: jeden profilowany request naraz na proces
+_profile_lock = threading.Lock()
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """jsonify() mierzony jako faza 'serialize'"""
+
+    def response(self, *args, **kwargs):
+        with span('serialize'):
+            return super().response(*args, **kwargs)
+
+
+def _profiling_requested() -> bool:
+    """Profilowanie tylko z poprawnym tokenem z PROFILE_TOKEN; bez niego nagłówek jest ignorowany"""
+    expected = os.environ.get('PROFILE_TOKEN')
+    given = request.headers.get(PROFILE_TOKEN_HEADER)
+    return bool(expected and given) and hmac.compare_digest(expected.encode(), given.encode())
+
+
+def _profile_report(profiler: cProfile.Profile) -> str:
+    sort = request.headers.get(PROFILE_SORT_HEADER, 'cumulative')
+    out = io.StringIO()
+    stats = pstats.Stats(profiler, stream=out)
+    stats.sort_stats(sort if sort in PROFILE_SORTS else 'cumulative').print_stats(PROFILE_LINES)
+    return out.getvalue()
+
+
+def _stop_profiler():
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        _profile_lock.release()
+    return profiler
+
+
+def init_timing(app: Flask) -> None:
+    """Czas faz żądania w nagłówku Server-Timing, opcjonalnie log JSON (TIMING_LOG=1) i profil cProfile na żądanie.
+
+    Profil: ustaw PROFILE_TOKEN na serwerze i wyślij ten sam token w
+    nagłówku X-Profile-Token; odpowiedzią jest raport pstats zamiast treści
+    (sortowanie z X-Profile-Sort). Odpowiedzi strumieniowane są mierzone
+    do momentu wysłania nagłówków.
+    """
+    app.json = TimedJSONProvider(app)
+    log_enabled = os.environ.get('TIMING_LOG', '').lower() in ('1', 'true', 'yes')
+    if log_enabled and not timing_log.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        timing_log.addHandler(handler)
+        timing_log.setLevel(logging.INFO)
+        timing_log.propagate = False
+
+    @app.before_request
+    def start_spans():
+        g.span_recorder, g.span_token = timing.begin_request()
+        if _profiling_requested() and _profile_lock.acquire(blocking=False):
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+        if request.is_json:
+            # Parsowanie JSON tu, żeby było osobną fazą; widok dostaje wynik z cache Flaska
+            with span('request_parse'):
+                request.get_json(silent=True)
+
+    @app.after_request
+    def add_server_timing(response):
+        recorder = g.get('span_recorder')
+        if recorder is None:
+            return response
+        profiler = _stop_profiler()
+        if profiler is not None:
+            response = Response(_profile_report(profiler), status=response.status_code,
+                                mimetype='text/plain')
+        response.headers[SERVER_TIMING_HEADER] = timing.server_timing(recorder)
+        if log_enabled:
+            route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            timing_log.info(json.dumps({
+                'event': 'request_timing',
+                'method': request.method,
+                'route': route,
+                'status': response.status_code,
+                'duration_ms': round(recorder.elapsed() * 1000, 1),
+                'spans': {name: {'ms': round(seconds * 1000, 1), 'count': count}
+                          for name, seconds, count in recorder.spans()},
+            }))
+        return response
+
+    @app.teardown_request
+    def end_spans(error=None):
+        _stop_profiler()
+        g.pop('span_recorder', None)
+        token = g.pop('span_token', None)
+        if token is not None:
+            try:
+                timing.end_request(token)
+            except ValueError:
+                # Streamed responses finish in a different context
+                pass
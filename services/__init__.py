@@ -1,5 +1,8 @@
 from .book_service import BookService
 from .gemini_service import GeminiService
 from .book_service_protocol import BookServiceProtocol
+from .response_cache import ResponseCache
+from .single_flight import SingleFlight
+from .catalog import BookCatalog
 
-__all__ = ['BookService', 'GeminiService', 'BookServiceProtocol']
\ No newline at end of file
+__all__ = ['BookService', 'GeminiService', 'BookServiceProtocol', 'ResponseCache', 'SingleFlight', 'BookCatalog']
\ No newline at end of file
@@ -1,83 +1,368 @@
-import json,re
-from typing import Optional, List
+import contextvars
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, Optional, List, Tuple
 from .gemini_service import GeminiService
 from models.book import BookRecommendation
 from constants.categories import BookGenres
 from constants.tropes import BookTropes
 from constants.spice_level import BookSpiceScale
 from .book_service_protocol import BookServiceProtocol
+from .response_cache import ResponseCache
+from .catalog import BookCatalog, normalize_label
+from .normalization import TrigramIndex, book_key
+from .prompt_builder import history_summary
+from .history_analysis import AnalysisStore, history_keys
+from .stream_parser import JsonArrayStreamParser
+from .scheduler import Priority, bulk, priority
+from .deadline import degraded_reasons, mark_degraded
+from .metrics import PARSE_FAILURES, current_llm_method, instrumented, llm_method
+from .timing import span, timed
+
+if TYPE_CHECKING:
+    from .similarity_index import SimilarityIndex
 
 
 
 class BookService(BookServiceProtocol):
-    def __init__(self):
-        self.gemini = GeminiService()
-    
+    BATCH_CHUNK_SIZE = 10
+    BATCH_MAX_WORKERS = 4
+    # Upper bound on the reading-history part of a prompt, in estimated tokens
+    HISTORY_TOKEN_BUDGET = 1500
+    # Threads refreshing stale cached answers in the background
+    REFRESH_WORKERS = 2
+    # Books whose features are kept for local reading-pattern analysis
+    MAX_BOOK_FEATURES = 10_000
+
+    def __init__(self,
+                 cache: Optional[ResponseCache] = None,
+                 gemini: Optional[GeminiService] = None,
+                 catalog: Optional[BookCatalog] = None,
+                 title_index: Optional[TrigramIndex] = None,
+                 similarity: Optional["SimilarityIndex"] = None):
+        self.gemini = gemini if gemini is not None else GeminiService()
+        self.cache = cache if cache is not None else ResponseCache.default()
+        self.catalog = catalog if catalog is not None else BookCatalog()
+        self.title_index = title_index if title_index is not None else TrigramIndex()
+        # Built on first use: the index needs NumPy, which importing main should not pay for
+        self._similarity = similarity
+        self._similarity_lock = threading.Lock()
+        self.analyses = AnalysisStore()
+        self._book_features: "OrderedDict[Tuple[str, str], Any]" = OrderedDict()
+        self._features_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._refreshing = set()
+        self._refresh_pool: Optional[ThreadPoolExecutor] = None
+        self._refresh_stats = {"refreshes_started": 0, "refreshes_succeeded": 0}
+
+    @property
+    def similarity(self) -> "SimilarityIndex":
+        if self._similarity is None:
+            with self._similarity_lock:
+                if self._similarity is None:
+                    from .similarity_index import SimilarityIndex
+
+                    self._similarity = SimilarityIndex()
+        return self._similarity
+
+    def _canonical(self, title: str, author: str) -> Tuple[str, str]:
+        """Map spelling variants of a book to one canonical title/author before any lookup"""
+        book = self.title_index.canonical(title, author)
+        return book.title, book.author
+
+    def _canonical_books(self, books: List[BookRecommendation]) -> List[BookRecommendation]:
+        return [self.title_index.canonical(book.title, book.author) for book in books]
+
+    def _record(self,
+                book: BookRecommendation,
+                genre: Optional[str] = None,
+                spice_level: Optional[int] = None,
+                tags: Optional[List[str]] = None,
+                tropes: List[str] = ()) -> None:
+        """Feed what was learned about a book to the catalog and the similarity index.
+
+        A book Gemini answered for is confirmed, so it also becomes a
+        canonical title that later spelling variants resolve to.
+        """
+        if genre or spice_level is not None or tags or tropes:
+            self.title_index.add(book)
+        self.catalog.record(book, genre=genre, spice_level=spice_level, tropes=tropes)
+        if tags:
+            self.catalog.record_tags(book, tags)
+        # Free-text tropes from trope queries would add a feature per query; keep the known ones
+        known_tropes = [trope for trope in tropes if normalize_label(trope) in self.catalog.KNOWN_TROPES]
+        self.similarity.record(book, genre=genre, spice_level=spice_level, tags=known_tropes + list(tags or []))
+
+    def _cached_lookup(self, method: str, prompt: str, parse: Callable[[str], Any]) -> Any:
+        """Serve a parsed response from cache, calling Gemini only on a miss.
+
+        Stale-while-revalidate: once an answer has expired, the last good
+        one is still served at once (marking the request degraded) and
+        refreshed in the background. Returns None when Gemini gave no
+        response; such failures are not cached.
+        """
+        key = self.cache.make_key(method, str(self.gemini.model), prompt)
+        with span("cache"):
+            found, value = self.cache.get(key)
+            if found:
+                return value
+            found, value = self.cache.get_stale(key)
+        if found:
+            mark_degraded("stale")
+            self._refresh_in_background(key, method, prompt, parse)
+            return value
+
+        response_text = self.gemini._generate_content(prompt)
+        if not response_text:
+            return None
+
+        value = parse(response_text)
+        self.cache.set(key, value, method)
+        return value
+
+    def _refresh_in_background(self, key: str, method: str, prompt: str, parse: Callable[[str], Any]) -> None:
+        """Re-ask Gemini for a stale answer, at most once at a time per key"""
+        with self._refresh_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            self._refresh_stats["refreshes_started"] += 1
+            if self._refresh_pool is None:
+                self._refresh_pool = ThreadPoolExecutor(max_workers=self.REFRESH_WORKERS, thread_name_prefix="cache-refresh")
+
+        def refresh() -> None:
+            try:
+                with priority(Priority.BULK), llm_method(method):
+                    response_text = self.gemini._generate_content(prompt)
+                value = parse(response_text) if response_text else None
+                # A failed refresh must not replace the last good answer
+                if not self.cache.is_negative(value):
+                    self.cache.set(key, value, method)
+                    with self._refresh_lock:
+                        self._refresh_stats["refreshes_succeeded"] += 1
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(key)
+
+        # A fresh context: the refresh is not bound by the request's deadline
+        self._refresh_pool.submit(contextvars.Context().run, refresh)
+
+    def _generate_or_last_good(self, method: str, prompt: str) -> Optional[str]:
+        """Gemini response for an uncached method, or the last good response to the same prompt.
+
+        The fallback is used when Gemini fails, times out or the circuit
+        breaker is open; the request is then marked degraded.
+        """
+        key = self.cache.make_key(method, str(self.gemini.model), prompt)
+        response_text = self.gemini._generate_content(prompt)
+        if response_text:
+            self.cache.set_fallback(key, response_text)
+            return response_text
+
+        found, value = self.cache.get_fallback(key)
+        if found:
+            mark_degraded("stale")
+            return value
+        return None
+
+    def _history_summary(self, read_books: List) -> str:
+        """Reading history for a prompt, reduced to a representative subset when over budget"""
+        genre_of = self.catalog.genre_of if len(self.catalog) else None
+        return history_summary(read_books, self.HISTORY_TOKEN_BUDGET, genre_of)
+
+    def cache_stats(self) -> dict:
+        """Hit/miss counters of the response cache and background refreshes"""
+        with self._refresh_lock:
+            refresh_stats = dict(self._refresh_stats, refreshes_in_flight=len(self._refreshing))
+        return {**self.cache.stats(), **refresh_stats}
+
+    @instrumented
     def get_book_genre(self, title: str, author: str) -> str:
         """Get precise genre for a book"""
+        title, author = self._canonical(title, author)
+        prompt = self._genre_prompt(title, author)
+        genre = self._cached_lookup("get_book_genre", prompt, self._parse_genre)
+        if genre:
+            self._record(BookRecommendation(title, author), genre=genre)
+        return genre if genre else "Unknown"
+
+    @timed("prompt")
+    def _genre_prompt(self, title: str, author: str) -> str:
         categories_text = "\n".join(f"- {cat}" for cat in BookGenres.get_all())
-        
-        prompt = f"""
+
+        return f"""
         Based on the book titled '{title}' by {author}, select the **single most appropriate** genre from the list below.
         Available genres:
         {categories_text}
-        
+
         Return the result as a clean JSON in the following format:
         {{
             "genre": "..."
         }}
         """
-        
-        response_text = self.gemini._generate_content(prompt)
-        if not response_text:
-            return "Unknown"
-            
+
+    def _parse_genre(self, response_text: str) -> Optional[str]:
         data = self.gemini._extract_json_from_text(response_text, "genre")
         if data and "genre" in data:
             return data["genre"]
-        
+
+        PARSE_FAILURES.inc(method=current_llm_method())
         print("Could not extract genre from response:", response_text)
-        return "Unknown"
-    
-    def get_similar_books(self, title: str, author: str) -> List[BookRecommendation]:
-        """Get 3 similar book recommendations"""
-        prompt = f"""
-        You are a literary assistant. Based on the book titled '{title}' by {author}, 
-        recommend **exactly 3 other fiction books** that are most similar in genre, themes, and style.
+        return None
+
+    @instrumented
+    def get_similar_books(self, title: str, author: str, count: int = 3) -> List[BookRecommendation]:
+        """Get similar book recommendations (3 by default).
+
+        Books the similarity index knows well enough are answered locally;
+        Gemini is asked only for books not indexed yet or when the index
+        has fewer than count neighbours.
+        """
+        title, author = self._canonical(title, author)
+        if self.similarity.contains(title, author):
+            local = [book for book, _ in self.similarity.most_similar(title, author, count)]
+            if len(local) >= count:
+                return local
+
+        prompt = self._similar_books_prompt(title, author, count)
+        books = self._cached_lookup("get_similar_books", prompt, self._parse_recommendations)
+        similar_books = [BookRecommendation.from_string(book) for book in books or []]
+        for book in similar_books:
+            self.title_index.add(book)
+        return similar_books
+
+    @timed("prompt")
+    def _similar_books_prompt(self, title: str, author: str, count: int = 3) -> str:
+        recommendations_list = ",\n                ".join(['"Title by Author"'] * count)
+
+        return f"""
+        You are a literary assistant. Based on the book titled '{title}' by {author},
+        recommend **exactly {count} other fiction books** that are most similar in genre, themes, and style.
         Only include books that are well-known and similar in tone or target audience.
-        
+
         Return the result as clean JSON:
         {{
             "recommendations": [
-                "Title by Author",
-                "Title by Author", 
-                "Title by Author"
+                {recommendations_list}
             ]
         }}
         """
-        
-        response_text = self.gemini._generate_content(prompt)
-        if not response_text:
-            return []
-            
+
+    def _stream_recommendations(self, prompt: str) -> Iterator[BookRecommendation]:
+        """Yield each recommended book as soon as its entry has streamed in"""
+        parser = JsonArrayStreamParser("recommendations")
+        for chunk in self.gemini._generate_content_stream(prompt):
+            for book in parser.feed(chunk):
+                yield BookRecommendation.from_string(book)
+            if parser.done:
+                break
+
+    def _parse_recommendations(self, response_text: str, context: str = "recommendations") -> List[str]:
+        """Extract the list of 'Title by Author' strings from a response"""
         data = self.gemini._extract_json_from_text(response_text, "recommendations")
         if data and "recommendations" in data:
-            return [BookRecommendation.from_string(book) for book in data["recommendations"]]
-        
-        print("Could not extract recommendations from response:", response_text)
+            return data["recommendations"]
+
+        PARSE_FAILURES.inc(method=current_llm_method())
+        print(f"Could not extract {context} from response:", response_text)
         return []
-    
-    
+
+
+    @instrumented
     def get_books_for_trope(self, trope: str, count: int = 5, genre: Optional[str] = None) -> List[BookRecommendation]:
-        """Get book recommendations based on a specific trope"""
+        """Get book recommendations based on a specific trope.
+
+        Served from the catalog when it already knows enough matching books,
+        then from a cached answer to the same query (see warm_cache.py);
+        otherwise Gemini is asked only for the missing ones.
+        """
+        known = self.catalog.find(trope=trope, genre=genre, limit=count)
+        if len(known) >= count:
+            return known
+
+        key = self._trope_cache_key(trope, count, genre)
+        with span("cache"):
+            found, cached = self.cache.get(key)
+        if found and cached:
+            return [BookRecommendation.from_string(book) for book in cached]
+
+        prompt = self._trope_prompt(trope, count - len(known), genre, known)
+
+        response_text = self._generate_or_last_good("get_books_for_trope", prompt)
+        if not response_text:
+            return known
+
+        books = self._parse_recommendations(response_text, "trope recommendations")
+        result = (known + self._record_trope_books(books, trope, genre, known))[:count]
+        # Only complete, fresh answers: a fallback must not outlive the outage
+        if len(result) >= count and not degraded_reasons():
+            self.cache.set(key, [f"{book.title} by {book.author}" for book in result], "get_books_for_trope")
+        return result
+
+    @instrumented
+    def stream_books_for_trope(self, trope: str, count: int = 5, genre: Optional[str] = None) -> Iterator[BookRecommendation]:
+        """Streaming variant of get_books_for_trope"""
+        known = self.catalog.find(trope=trope, genre=genre, limit=count)
+        yield from known
+        if len(known) >= count:
+            return
+
+        remaining = count - len(known)
+        found, cached = self.cache.get(self._trope_cache_key(trope, count, genre))
+        if found and cached:
+            yield from [book for book in map(BookRecommendation.from_string, cached) if book not in known][:remaining]
+            return
+
+        for book in self._stream_recommendations(self._trope_prompt(trope, remaining, genre, known)):
+            for new_book in self._record_trope_books([f"{book.title} by {book.author}"], trope, genre, known):
+                yield new_book
+                remaining -= 1
+            if remaining <= 0:
+                return
+
+    def _trope_cache_key(self, trope: str, count: int, genre: Optional[str]) -> str:
+        """Cache key of a whole trope answer; trope and genre spelling variants share it.
+
+        The key hashes the prompt rendered for the normalized query, so editing
+        _trope_prompt invalidates cached answers like any other prompt change.
+        """
+        prompt = self._trope_prompt(normalize_label(trope), count, normalize_label(genre) if genre else None)
+        return self.cache.make_key("get_books_for_trope", str(self.gemini.model), prompt)
+
+    def _record_trope_books(self,
+                            books: List[str],
+                            trope: str,
+                            genre: Optional[str],
+                            known: List[BookRecommendation]) -> List[BookRecommendation]:
+        """Index fresh trope recommendations, dropping ones already returned"""
+        known_keys = {book_key(book.title, book.author) for book in known}
+        new_books = []
+        for book in map(BookRecommendation.from_string, books):
+            self._record(book, genre=genre, tropes=[trope])
+            if book_key(book.title, book.author) not in known_keys:
+                new_books.append(book)
+        return new_books
+
+    @timed("prompt")
+    def _trope_prompt(self,
+                      trope: str,
+                      count: int,
+                      genre: Optional[str],
+                      exclude: Optional[List[BookRecommendation]] = None) -> str:
         recommendations_list = ",\n                ".join(['"Title by Author"'] * count)
-        
+
         genre_constraint = f" within the {genre} genre" if genre else ""
-        
-        prompt = f"""
+
+        exclude_constraint = ""
+        if exclude:
+            exclude_constraint = "\n        Do not include: " + "; ".join(f"'{book.title}' by {book.author}" for book in exclude)
+
+        return f"""
         You are a literary assistant. Recommend **exactly {count} fiction books**{genre_constraint} that prominently feature the trope: "{trope}".
-        Only include well-known books that clearly showcase this trope.
-        
+        Only include well-known books that clearly showcase this trope.{exclude_constraint}
+
         Return the result as clean JSON:
         {{
             "recommendations": [
@@ -85,62 +370,66 @@ class BookService(BookServiceProtocol):
             ]
         }}
         """
-        
-        response_text = self.gemini._generate_content(prompt)
-        if not response_text:
-            return []
-            
-        data = self.gemini._extract_json_from_text(response_text, "recommendations")
-        if data and "recommendations" in data:
-            return [BookRecommendation.from_string(book) for book in data["recommendations"]]
-        
-        print("Could not extract trope recommendations from response:", response_text)
-        return []
 
+    @instrumented
     def get_book_spice_level(self, title: str, author: str) -> dict:
         """Get spice/steam level for a book on 1-6 pepper scale"""
-        prompt = f"""
-        You are a literary assistant. Based on the book titled '{title}' by {author}, 
+        title, author = self._canonical(title, author)
+        prompt = self._spice_level_prompt(title, author)
+        spice_data = self._cached_lookup("get_book_spice_level", prompt, self._parse_spice_level)
+        if spice_data:
+            self._record(BookRecommendation(title, author), spice_level=spice_data["spice_level"])
+        return spice_data if spice_data else {"spice_level": 0, "content_warnings": []}
+
+    @timed("prompt")
+    def _spice_level_prompt(self, title: str, author: str) -> str:
+        return f"""
+        You are a literary assistant. Based on the book titled '{title}' by {author},
         rate the spice level on a scale of 1-6 peppers 🌶️:
-        
+
         0 🌶️ - No romantic/sexual content
         1 🌶️ - Sweet romance, kisses, hand-holding
         2 🌶️ - Some intimate scenes, gentle passion, fade to black
         3 🌶️ - Explicit sexual content, detailed scenes
         4 🌶️ - Very explicit, frequent sexual scenes
         5 🌶️ - Extremely explicit, multiple partners, kinky content
-        
+
         Return the result as clean JSON:
         {{
             "spice_level": 3,
             "content_warnings": ["warning1", "warning2"]
         }}
         """
-        
-        response_text = self.gemini._generate_content(prompt)
-        if not response_text:
-            return {"spice_level": 0, "content_warnings": []}
-            
-        # Try to extract complete dict
-        pattern = r'\{.*?"spice_level"\s*:\s*\d+.*?\}'
-        match = re.search(pattern, response_text, re.DOTALL)
-        if match:
-            try:
-                return json.loads(match.group(0))
-            except json.JSONDecodeError:
-                pass
-        
+
+    def _parse_spice_level(self, response_text: str) -> dict:
+        data = self.gemini._extract_json_from_text(response_text, "spice_level")
+        if data and isinstance(data["spice_level"], int):
+            return data
+
+        PARSE_FAILURES.inc(method=current_llm_method())
         print("Could not extract spice level from response:", response_text)
-        return {"spice_level": 0, "content_warnings": []}
+        return {}
 
 
+    @instrumented
     def get_book_tags(self, title: str, author: str, count: int = 10) -> List[str]:
         """Get tags/tropes for a specific book"""
-        prompt = f"""
-        You are a literary assistant. Based on the book titled '{title}' by {author}, 
+        title, author = self._canonical(title, author)
+        prompt = self._tags_prompt(title, author, count)
+        tags = self._cached_lookup("get_book_tags", prompt, self._parse_tags)
+        if tags:
+            self._record(BookRecommendation(title, author), tags=tags)
+        return tags if tags else []
+
+    @timed("prompt")
+    def _tags_prompt(self, title: str, author: str, count: int) -> str:
+        return f"""
+        You are a literary assistant. Based on the book titled '{title}' by {author},
         identify **exactly {count} most prominent tags/tropes** that describe this book.
         Include themes, tropes, content warnings, and notable elements.
-        
+        Whenever one of these tropes applies, use it as a tag with exactly this wording:
+        {self._trope_vocabulary()}
+
         Return the result as clean JSON:
         {{
             "tags": [
@@ -150,56 +439,391 @@ class BookService(BookServiceProtocol):
             ]
         }}
         """
-        
-        response_text = self.gemini._generate_content(prompt)
-        if not response_text:
-            return []
-            
+
+    @staticmethod
+    def _trope_vocabulary() -> str:
+        """Known tropes, so tags can be matched to BookTropes (see reading_profile.BookFeatures)"""
+        return ", ".join(BookTropes.get_all())
+
+    def _parse_tags(self, response_text: str) -> List[str]:
         data = self.gemini._extract_json_from_text(response_text, "tags")
         if data and "tags" in data:
             return data["tags"]
-        
+
+        PARSE_FAILURES.inc(method=current_llm_method())
         print("Could not extract tags from response:", response_text)
         return []
-    
+
+    @instrumented
+    @bulk
+    def get_books_genre_batch(self, books: List[BookRecommendation]) -> List[dict]:
+        """Get genres for many books, several books per Gemini call"""
+        books = self._canonical_books(books)
+        results = self._batch_lookup(
+            "get_book_genre", books,
+            lambda book: self._genre_prompt(book.title, book.author),
+            self._batch_genre_prompt,
+            lambda item: item.get("genre") or None,
+            lambda genre: {"genre": genre},
+        )
+        for book, item in zip(books, results):
+            if "genre" in item:
+                self._record(book, genre=item["genre"])
+        return results
+
+    @instrumented
+    @bulk
+    def get_books_spice_level_batch(self, books: List[BookRecommendation]) -> List[dict]:
+        """Get spice levels for many books, several books per Gemini call"""
+        books = self._canonical_books(books)
+        def extract(item: dict) -> Optional[dict]:
+            if not isinstance(item.get("spice_level"), int):
+                return None
+            return {"spice_level": item["spice_level"], "content_warnings": item.get("content_warnings", [])}
+
+        results = self._batch_lookup(
+            "get_book_spice_level", books,
+            lambda book: self._spice_level_prompt(book.title, book.author),
+            self._batch_spice_level_prompt,
+            extract,
+            lambda spice_data: spice_data,
+        )
+        for book, item in zip(books, results):
+            if "spice_level" in item:
+                self._record(book, spice_level=item["spice_level"])
+        return results
+
+    @instrumented
+    @bulk
+    def get_books_tags_batch(self, books: List[BookRecommendation], count: int = 10) -> List[dict]:
+        """Get tags for many books, several books per Gemini call"""
+        books = self._canonical_books(books)
+        results = self._batch_lookup(
+            "get_book_tags", books,
+            lambda book: self._tags_prompt(book.title, book.author, count),
+            lambda chunk: self._batch_tags_prompt(chunk, count),
+            lambda item: item.get("tags") or None,
+            lambda tags: {"tags": tags},
+        )
+        for book, item in zip(books, results):
+            if "tags" in item:
+                self._record(book, tags=item["tags"])
+        return results
+
+    def _batch_lookup(self,
+                      method: str,
+                      books: List[BookRecommendation],
+                      single_prompt: Callable[[BookRecommendation], str],
+                      batch_prompt: Callable[[List[BookRecommendation]], str],
+                      extract: Callable[[dict], Any],
+                      to_fields: Callable[[Any], dict]) -> List[dict]:
+        """Answer a per-book lookup for many books.
+
+        Books already cached (under the same key as the single-book method)
+        are served directly; the rest are packed BATCH_CHUNK_SIZE per prompt
+        and the chunks run on at most BATCH_MAX_WORKERS threads. Fresh answers
+        are written back under the single-book key.
+        """
+        model = str(self.gemini.model)
+        values: List[Any] = [None] * len(books)
+        pending = []
+        for index, book in enumerate(books):
+            key = self.cache.make_key(method, model, single_prompt(book))
+            found, value = self.cache.get(key)
+            if found and not self.cache.is_negative(value):
+                values[index] = value
+            else:
+                pending.append((index, key))
+
+        chunks = [pending[i:i + self.BATCH_CHUNK_SIZE] for i in range(0, len(pending), self.BATCH_CHUNK_SIZE)]
+
+        def run_chunk(chunk) -> List[Any]:
+            prompt = batch_prompt([books[index] for index, _ in chunk])
+            response_text = self.gemini._generate_content(prompt)
+            if not response_text:
+                return [None] * len(chunk)
+            items = self._parse_batch_results(response_text)
+            return [extract(items[position]) if position in items else None
+                    for position in range(1, len(chunk) + 1)]
+
+        if chunks:
+            with ThreadPoolExecutor(max_workers=min(self.BATCH_MAX_WORKERS, len(chunks))) as pool:
+                # Each chunk runs in a copy of the caller's context (scheduling priority)
+                futures = [pool.submit(contextvars.copy_context().run, run_chunk, chunk) for chunk in chunks]
+                for chunk, chunk_values in zip(chunks, (future.result() for future in futures)):
+                    for (index, key), value in zip(chunk, chunk_values):
+                        if value is not None:
+                            self.cache.set(key, value, method)
+                            values[index] = value
+
+        results = []
+        for book, value in zip(books, values):
+            item = {"title": book.title, "author": book.author}
+            if value is None:
+                item["error"] = "No result from Gemini"
+            else:
+                item.update(to_fields(value))
+            results.append(item)
+        return results
+
+    def _batch_books_list(self, books: List[BookRecommendation]) -> str:
+        return "\n".join(
+            f"{position}. '{book.title}' by {book.author}"
+            for position, book in enumerate(books, start=1)
+        )
+
+    @timed("prompt")
+    def _batch_genre_prompt(self, books: List[BookRecommendation]) -> str:
+        categories_text = "\n".join(f"- {cat}" for cat in BookGenres.get_all())
+
+        return f"""
+        For each numbered book below, select the **single most appropriate** genre from the list of available genres.
+        Books:
+        {self._batch_books_list(books)}
+
+        Available genres:
+        {categories_text}
+
+        Return the result as clean JSON with one entry per book, using the book's number as "index":
+        {{
+            "results": [
+                {{"index": 1, "genre": "..."}}
+            ]
+        }}
+        """
+
+    @timed("prompt")
+    def _batch_spice_level_prompt(self, books: List[BookRecommendation]) -> str:
+        return f"""
+        You are a literary assistant. For each numbered book below, rate the spice level on a scale of 0-5 peppers 🌶️:
+
+        0 🌶️ - No romantic/sexual content
+        1 🌶️ - Sweet romance, kisses, hand-holding
+        2 🌶️ - Some intimate scenes, gentle passion, fade to black
+        3 🌶️ - Explicit sexual content, detailed scenes
+        4 🌶️ - Very explicit, frequent sexual scenes
+        5 🌶️ - Extremely explicit, multiple partners, kinky content
+
+        Books:
+        {self._batch_books_list(books)}
+
+        Return the result as clean JSON with one entry per book, using the book's number as "index":
+        {{
+            "results": [
+                {{"index": 1, "spice_level": 3, "content_warnings": ["warning1", "warning2"]}}
+            ]
+        }}
+        """
+
+    @timed("prompt")
+    def _batch_tags_prompt(self, books: List[BookRecommendation], count: int) -> str:
+        return f"""
+        You are a literary assistant. For each numbered book below, identify **exactly {count} most prominent tags/tropes**
+        that describe the book. Include themes, tropes, content warnings, and notable elements.
+        Whenever one of these tropes applies, use it as a tag with exactly this wording:
+        {self._trope_vocabulary()}
+
+        Books:
+        {self._batch_books_list(books)}
+
+        Return the result as clean JSON with one entry per book, using the book's number as "index":
+        {{
+            "results": [
+                {{"index": 1, "tags": ["tag1", "tag2", "tag3"]}}
+            ]
+        }}
+        """
+
+    def _extract_json_object(self, response_text: str) -> Optional[dict]:
+        """Parse the outermost JSON object of a structured (nested) response"""
+        return self.gemini._extract_json_from_text(response_text, None)
+
+    def _parse_batch_results(self, response_text: str) -> Dict[int, dict]:
+        """Map book number -> result object from a batched response"""
+        data = self.gemini._extract_json_from_text(response_text, "results")
+
+        if not isinstance(data, dict) or not isinstance(data.get("results"), list):
+            PARSE_FAILURES.inc(method=current_llm_method())
+            print("Could not extract batch results from response:", response_text)
+            return {}
+
+        return {
+            item["index"]: item
+            for item in data["results"]
+            if isinstance(item, dict) and isinstance(item.get("index"), int)
+        }
+
+    @instrumented
+    def get_book_profile(self, title: str, author: str, tags_count: int = 10) -> dict:
+        """Get genre, spice level, tags and similar books in one Gemini call.
+
+        Each field is also stored under its single-method cache key. Fields
+        the combined response misses are fetched with the individual methods,
+        in parallel.
+        """
+        title, author = self._canonical(title, author)
+        model = str(self.gemini.model)
+        fields = {
+            "genre": ("get_book_genre", self._genre_prompt(title, author)),
+            "spice": ("get_book_spice_level", self._spice_level_prompt(title, author)),
+            "tags": ("get_book_tags", self._tags_prompt(title, author, tags_count)),
+            "similar_books": ("get_similar_books", self._similar_books_prompt(title, author)),
+        }
+        keys = {field: self.cache.make_key(method, model, prompt) for field, (method, prompt) in fields.items()}
+
+        values = {}
+        for field, key in keys.items():
+            found, value = self.cache.get(key)
+            if found and not self.cache.is_negative(value):
+                values[field] = value
+
+        if len(values) < len(fields):
+            response_text = self.gemini._generate_content(self._profile_prompt(title, author, tags_count))
+            profile = self._parse_profile(response_text) if response_text else {}
+            for field, value in profile.items():
+                if field not in values:
+                    self.cache.set(keys[field], value, fields[field][0])
+                    values[field] = value
+
+        missing = [field for field in fields if field not in values]
+        if missing:
+            fallbacks = {
+                "genre": lambda: self.get_book_genre(title, author),
+                "spice": lambda: self.get_book_spice_level(title, author),
+                "tags": lambda: self.get_book_tags(title, author, tags_count),
+                "similar_books": lambda: [f"{book.title} by {book.author}" for book in self.get_similar_books(title, author)],
+            }
+            with ThreadPoolExecutor(max_workers=len(missing)) as pool:
+                futures = {field: pool.submit(contextvars.copy_context().run, fallbacks[field]) for field in missing}
+                for field, future in futures.items():
+                    values[field] = future.result()
+
+        spice = values["spice"] or {}
+        book = BookRecommendation(title, author)
+        self._record(book, genre=values["genre"], spice_level=spice.get("spice_level"), tags=values["tags"] or [])
+        return {
+            "genre": values["genre"] or "Unknown",
+            "spice_level": spice.get("spice_level", 0),
+            "content_warnings": spice.get("content_warnings", []),
+            "tags": values["tags"] or [],
+            "similar_books": [BookRecommendation.from_string(book) for book in values["similar_books"] or []],
+        }
+
+    @timed("prompt")
+    def _profile_prompt(self, title: str, author: str, tags_count: int) -> str:
+        categories_text = "\n".join(f"- {cat}" for cat in BookGenres.get_all())
+
+        return f"""
+        You are a literary assistant. For the book titled '{title}' by {author}, provide:
+        - "genre": the **single most appropriate** genre from the available genres below
+        - "spice_level": the spice level on a scale of 0-5 peppers 🌶️, with "content_warnings"
+        - "tags": **exactly {tags_count} most prominent tags/tropes** (themes, tropes, content warnings, notable elements)
+        - "similar_books": **exactly 3 other well-known fiction books** most similar in genre, themes, and style
+
+        Available genres:
+        {categories_text}
+
+        Spice scale:
+        0 🌶️ - No romantic/sexual content
+        1 🌶️ - Sweet romance, kisses, hand-holding
+        2 🌶️ - Some intimate scenes, gentle passion, fade to black
+        3 🌶️ - Explicit sexual content, detailed scenes
+        4 🌶️ - Very explicit, frequent sexual scenes
+        5 🌶️ - Extremely explicit, multiple partners, kinky content
+
+        Return the result as clean JSON:
+        {{
+            "genre": "...",
+            "spice_level": 3,
+            "content_warnings": ["warning1", "warning2"],
+            "tags": ["tag1", "tag2", "tag3"],
+            "similar_books": ["Title by Author", "Title by Author", "Title by Author"]
+        }}
+        """
+
+    def _parse_profile(self, response_text: str) -> dict:
+        """Split a profile response into values shaped like the single-method results"""
+        data = self._extract_json_object(response_text)
+        if not data:
+            PARSE_FAILURES.inc(method=current_llm_method())
+            print("Could not extract book profile from response:", response_text)
+            return {}
+
+        profile = {}
+        if isinstance(data.get("genre"), str) and data["genre"]:
+            profile["genre"] = data["genre"]
+        if isinstance(data.get("spice_level"), int):
+            profile["spice"] = {
+                "spice_level": data["spice_level"],
+                "content_warnings": data.get("content_warnings", []),
+            }
+        if isinstance(data.get("tags"), list) and data["tags"]:
+            profile["tags"] = data["tags"]
+        if isinstance(data.get("similar_books"), list) and data["similar_books"]:
+            profile["similar_books"] = data["similar_books"]
+        return profile
+
+    @instrumented
+    @bulk
     def get_recommendations_from_history(self,
                                    read_books: List,
                                    count: int = 5,
                                    preferred_genres: Optional[List[str]] = None,
                                    exclude_authors: Optional[List[str]] = None) -> List[BookRecommendation]:
         """Get book recommendations based on reading history"""
-        
-        
-        books_summary = "\n".join([
-            f"- '{book.title}' by {book.author}"
-            for book in read_books
-        ])
-        
-       
+        prompt = self._history_prompt(read_books, count, preferred_genres, exclude_authors)
+
+        response_text = self._generate_or_last_good("get_recommendations_from_history", prompt)
+        if not response_text:
+            return []
+
+        books = self._parse_recommendations(response_text, "history-based recommendations")
+        return [BookRecommendation.from_string(book) for book in books]
+
+    @instrumented
+    def stream_recommendations_from_history(self,
+                                            read_books: List,
+                                            count: int = 5,
+                                            preferred_genres: Optional[List[str]] = None,
+                                            exclude_authors: Optional[List[str]] = None) -> Iterator[BookRecommendation]:
+        """Streaming variant of get_recommendations_from_history"""
+        return self._stream_recommendations(
+            self._history_prompt(read_books, count, preferred_genres, exclude_authors)
+        )
+
+    @timed("prompt")
+    def _history_prompt(self,
+                        read_books: List,
+                        count: int,
+                        preferred_genres: Optional[List[str]],
+                        exclude_authors: Optional[List[str]]) -> str:
+        books_summary = self._history_summary(read_books)
+
+
         genre_constraint = ""
         if preferred_genres:
             genre_constraint = f"\nFocus on these genres: {', '.join(preferred_genres)}"
-        
-        
+
+
         exclude_constraint = ""
         if exclude_authors:
             exclude_constraint = f"\nExclude books by: {', '.join(exclude_authors)}"
-        
-       
+
+
         recommendations_list = ",\n                ".join(['"Title by Author"'] * count)
-        
-        prompt = f"""
-        You are a literary assistant. Based on the user's reading history, recommend **exactly {count} fiction books** 
+
+        return f"""
+        You are a literary assistant. Based on the user's reading history, recommend **exactly {count} fiction books**
         that match their taste and reading patterns.
-        
+
         Books they've read and enjoyed:
         {books_summary}
         {genre_constraint}
         {exclude_constraint}
-        
+
         Analyze their reading patterns and recommend books with similar themes, writing styles, or genres.
         Only include well-known books that are likely to appeal to someone with this reading history.
-        
+
         Return the result as clean JSON:
         {{
             "recommendations": [
@@ -207,32 +831,66 @@ class BookService(BookServiceProtocol):
             ]
         }}
         """
-        
-        response_text = self.gemini._generate_content(prompt)
+
+
+
+
+    @instrumented
+    @bulk
+    def analyze_reading_patterns(self, read_books: List, mode: str = "llm") -> dict:
+        """Analyze a reading history.
+
+        mode="local" computes the profile from per-book features instead of
+        asking Gemini about the whole history (see _analyze_reading_patterns_locally).
+
+        Identical histories (in any order) are answered from earlier analyses;
+        a history extending an analyzed one only sends the new books, together
+        with the previous result, to Gemini.
+        """
+        if mode == "local":
+            return self._analyze_reading_patterns_locally(read_books)
+
+        keys = history_keys(read_books)
+        stored = self.analyses.get(keys)
+        if stored is not None:
+            return stored
+
+        base = self.analyses.best_base(keys)
+        if base is not None:
+            base_keys, previous = base
+            new_books, seen = [], set(base_keys)
+            for book in read_books:
+                key = book_key(book.title, book.author)
+                if key not in seen:
+                    seen.add(key)
+                    new_books.append(book)
+            prompt = self._reading_patterns_update_prompt(previous, len(base_keys), new_books)
+        else:
+            prompt = self._reading_patterns_prompt(read_books)
+
+        response_text = self._generate_or_last_good("analyze_reading_patterns", prompt)
         if not response_text:
-            return []
-            
-        data = self.gemini._extract_json_from_text(response_text, "recommendations")
-        if data and "recommendations" in data:
-            return [BookRecommendation.from_string(book) for book in data["recommendations"]]
-        
-        print("Could not extract history-based recommendations from response:", response_text)
-        return []
-    
-    
-    
-    
-    def analyze_reading_patterns(self, read_books: List) -> dict:
+            return {
+            "favorite_genres": [],
+            "frequent_tropes": [],
+            "spice_tolerance": "unknown",
+            "average_book_length": 0
+        }
+
+        result = self._parse_reading_patterns(response_text)
+        if result.get("favorite_genres"):
+            self.analyses.put(keys, result)
+        return result
+
+    @timed("prompt")
+    def _reading_patterns_prompt(self, read_books: List) -> str:
         genres = BookGenres.get_all()
         spice_levels = BookSpiceScale.get_all()
         tropes = BookTropes.get_all()
-       
-        books_summary = "\n".join([
-            f"- '{book.title}' by {book.author}"
-            for book in read_books
-        ])
 
-        prompt = f"""
+        books_summary = self._history_summary(read_books)
+
+        return f"""
         You are a literary assistant. Based on the user's reading history, analyze their reading patterns and preferences.
 
         Books they've read and enjoyed:
@@ -243,7 +901,7 @@ class BookService(BookServiceProtocol):
         IMPORTANT: Only return the MOST COMMON patterns, not everything you find.
 
         - Available Genres: {', '.join(genres)}
-        - Available Tropes: {', '.join(tropes)}  
+        - Available Tropes: {', '.join(tropes)}
         - Spice levels: {', '.join(spice_levels)}
 
         Return EXACTLY this JSON format:
@@ -255,72 +913,173 @@ class BookService(BookServiceProtocol):
 
         Return MAXIMUM 3 items in each array.
         """
-        
-        response_text = self.gemini._generate_content(prompt)
-        if not response_text:
-            return {
-            "favorite_genres": [],
-            "frequent_tropes": [],
-            "spice_tolerance": "unknown",
-            "average_book_length": 0
-        }
-            
+
+    def _analyze_reading_patterns_locally(self, read_books: List) -> dict:
+        """Deterministic profile from per-book genre, tropes and spice level.
+
+        Features of books not seen before come from the (cached) batch
+        lookups; the profile itself is a NumPy aggregation over the history.
+        """
+        from .reading_profile import BookFeatures, aggregate
+
+        books = self._canonical_books(read_books)
+        keys = [book_key(book.title, book.author) for book in books]
+
+        known = {}
+        with self._features_lock:
+            for key in keys:
+                if key in self._book_features:
+                    self._book_features.move_to_end(key)
+                    known[key] = self._book_features[key]
+
+        missing = list({key: book for key, book in zip(keys, books) if key not in known}.items())
+        fresh = {}
+        if missing:
+            missing_books = [book for _, book in missing]
+            genres = self.get_books_genre_batch(missing_books)
+            tags = self.get_books_tags_batch(missing_books)
+            spice = self.get_books_spice_level_batch(missing_books)
+            for (key, _), genre_item, tags_item, spice_item in zip(missing, genres, tags, spice):
+                features = BookFeatures(genre_item.get("genre"), tags_item.get("tags", []), spice_item.get("spice_level"))
+                fresh[key] = features
+                if not any("error" in item for item in (genre_item, tags_item, spice_item)):
+                    known[key] = features
+                    self._remember_features(key, features)
+
+        profile = aggregate([known.get(key) or fresh[key] for key in keys])
+        profile["analyzed_books_with_features"] = len(set(keys) & known.keys())
+        return profile
+
+    def _remember_features(self, key: Tuple[str, str], features: Any) -> None:
+        with self._features_lock:
+            self._book_features[key] = features
+            self._book_features.move_to_end(key)
+            while len(self._book_features) > self.MAX_BOOK_FEATURES:
+                self._book_features.popitem(last=False)
+
+    @timed("prompt")
+    def _reading_patterns_update_prompt(self, previous: dict, analyzed_count: int, new_books: List) -> str:
+        genres = BookGenres.get_all()
+        spice_levels = BookSpiceScale.get_all()
+        tropes = BookTropes.get_all()
+
+        return f"""
+        You are a literary assistant. You previously analyzed the user's reading history of {analyzed_count} books
+        and found this profile:
+        {json.dumps(previous, ensure_ascii=False)}
+
+        Since then they have read and enjoyed these books:
+        {self._history_summary(new_books)}
+
+        Update the profile to reflect the whole history ({analyzed_count + len(new_books)} books), weighting the
+        new books by their share of the history. Keep their TOP 3 favorite genres, TOP 3 most frequent tropes,
+        and spice tolerance.
+
+        - Available Genres: {', '.join(genres)}
+        - Available Tropes: {', '.join(tropes)}
+        - Spice levels: {', '.join(spice_levels)}
+
+        Return EXACTLY this JSON format:
+        {{
+            "favorite_genres": ["top_genre_1", "top_genre_2", "top_genre_3"],
+            "frequent_tropes": ["top_trope_1", "top_trope_2", "top_trope_3"],
+            "spice_tolerance": "most_common_level",
+        }}
+
+        Return MAXIMUM 3 items in each array.
+        """
+
+    def _parse_reading_patterns(self, response_text: str) -> dict:
         result = self.gemini._extract_json_from_text(response_text, "favorite_genres")
-  
+
         if isinstance(result, dict):
             return result
-        
+
         # Fallback
+        PARSE_FAILURES.inc(method=current_llm_method())
         return {
             "favorite_genres": [],
             "frequent_tropes": [],
             "spice_tolerance": "unknown",
-           
+
         }
+    @instrumented
     def get_books_by_mood(
         self,
         mood: str,
-        read_books: Optional[List[BookRecommendation]] = None,  
+        read_books: Optional[List[BookRecommendation]] = None,
         count: int = 5,
         preferred_genres: Optional[List[str]] = None,
-        spice_level: Optional[str] = None, 
+        spice_level: Optional[str] = None,
         avoid_triggers: Optional[List[str]] = None,
-        audience: Optional[str] = None 
+        audience: Optional[str] = None
     ) -> List[BookRecommendation]:
-         
+
         """Get book recommendations based on mood"""
-        
+        prompt = self._mood_prompt(mood, read_books, count, preferred_genres, spice_level, avoid_triggers, audience)
+
+        response_text = self._generate_or_last_good("get_books_by_mood", prompt)
+        if not response_text:
+            return []
+
+        books = self._parse_recommendations(response_text, "history-based recommendations")
+        return [BookRecommendation.from_string(book) for book in books]
+
+    @instrumented
+    def stream_books_by_mood(
+        self,
+        mood: str,
+        read_books: Optional[List[BookRecommendation]] = None,
+        count: int = 5,
+        preferred_genres: Optional[List[str]] = None,
+        spice_level: Optional[str] = None,
+        avoid_triggers: Optional[List[str]] = None,
+        audience: Optional[str] = None
+    ) -> Iterator[BookRecommendation]:
+        """Streaming variant of get_books_by_mood"""
+        return self._stream_recommendations(
+            self._mood_prompt(mood, read_books, count, preferred_genres, spice_level, avoid_triggers, audience)
+        )
+
+    @timed("prompt")
+    def _mood_prompt(
+        self,
+        mood: str,
+        read_books: Optional[List[BookRecommendation]],
+        count: int,
+        preferred_genres: Optional[List[str]],
+        spice_level: Optional[str],
+        avoid_triggers: Optional[List[str]],
+        audience: Optional[str]
+    ) -> str:
         read_books_summary = ""
         if read_books:
-            read_books_summary = "\n".join([
-                f"- '{book.title}' by {book.author}"
-                for book in read_books
-            ])
-       
+            read_books_summary = self._history_summary(read_books)
+
         genre_constraint = ""
         if preferred_genres:
             genre_constraint = f"\nFocus on these genres: {', '.join(preferred_genres)}"
-        
-        
+
+
         avoid_triggers = ""
         if avoid_triggers:
             exclude_constraint = f"\nAvoid triggers: {', '.join(avoid_triggers)}"
 
-        
-        
-       
+
+
+
         recommendations_list = ",\n                ".join(['"Title by Author"'] * count)
-        
-        prompt = f"""
-        You are a literary assistant. Based on the user's mood and additional infomrations, recommend **exactly {count} fiction books** 
+
+        return f"""
+        You are a literary assistant. Based on the user's mood and additional infomrations, recommend **exactly {count} fiction books**
         that match their expectations. Mood: {mood}, spice level: {spice_level}, audience: {audience}, preferred genres: {genre_constraint}, avoid triggers: {avoid_triggers}
 
-        
+
         Analyze their reading expectations, suitable with the current mood and recommend books that match given criteria.
         Only include well-known books that are likely to appeal to someone with this criteria.
         Keep in mind that the user has read these books:
         {read_books_summary}, and enjoyed them.Do not recommend them again.
-        
+
         Return the result as clean JSON:
         {{
             "recommendations": [
@@ -328,15 +1087,3 @@ class BookService(BookServiceProtocol):
             ]
         }}
         """
-        
-        response_text = self.gemini._generate_content(prompt)
-        if not response_text:
-            return []
-            
-        data = self.gemini._extract_json_from_text(response_text, "recommendations")
-        if data and "recommendations" in data:
-            return [BookRecommendation.from_string(book) for book in data["recommendations"]]
-        
-        print("Could not extract history-based recommendations from response:", response_text)
-        return []
-    
\ No newline at end of file
@@ -1,4 +1,4 @@
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional
 from abc import ABC,abstractmethod
 
 class BookServiceProtocol(ABC):
@@ -8,8 +8,8 @@ class BookServiceProtocol(ABC):
         pass
 
     @abstractmethod
-    def get_similar_books(self, title: str, author: str) -> List[str]:
-        """Get 3 similar book recommendations"""
+    def get_similar_books(self, title: str, author: str, count: int = 3) -> List[str]:
+        """Get similar book recommendations (3 by default)"""
         pass
 
     
@@ -29,6 +29,26 @@ class BookServiceProtocol(ABC):
         """Get tags for a book"""
         pass
 
+    @abstractmethod
+    def get_books_genre_batch(self, books: List) -> List[dict]:
+        """Get genres for many books at once"""
+        pass
+
+    @abstractmethod
+    def get_books_spice_level_batch(self, books: List) -> List[dict]:
+        """Get spice levels for many books at once"""
+        pass
+
+    @abstractmethod
+    def get_books_tags_batch(self, books: List, count: int = 10) -> List[dict]:
+        """Get tags for many books at once"""
+        pass
+
+    @abstractmethod
+    def get_book_profile(self, title: str, author: str, tags_count: int = 10) -> dict:
+        """Get genre, spice level, tags and similar books for a book"""
+        pass
+
     @abstractmethod
     def get_recommendations_from_history(self, 
                                        read_books: List,
@@ -38,7 +58,7 @@ class BookServiceProtocol(ABC):
         """Get book recommendations based on reading history"""
         pass
     @abstractmethod
-    def analyze_reading_patterns(self, read_books: List) -> List:
+    def analyze_reading_patterns(self, read_books: List, mode: str = "llm") -> List:
         """
         Analyze user's reading behavior to detect patterns, preferences, pacing, genre frequency, etc.
         Example return: {
@@ -74,3 +94,31 @@ class BookServiceProtocol(ABC):
         A list of book recommendations with metadata.
         """
         pass
+
+    @abstractmethod
+    def stream_books_for_trope(self, trope: str, count: int = 5, genre: Optional[str] = None) -> Iterator:
+        """Yield trope recommendations one by one as they are generated"""
+        pass
+
+    @abstractmethod
+    def stream_recommendations_from_history(self,
+                                            read_books: List,
+                                            count: int = 5,
+                                            preferred_genres: Optional[List[str]] = None,
+                                            exclude_authors: Optional[List[str]] = None) -> Iterator:
+        """Yield history-based recommendations one by one as they are generated"""
+        pass
+
+    @abstractmethod
+    def stream_books_by_mood(
+        self,
+        mood: str,
+        read_books: Optional[List] = None,
+        count: int = 5,
+        preferred_genres: Optional[List[str]] = None,
+        spice_level: Optional[str] = None,
+        avoid_triggers: Optional[List[str]] = None,
+        audience: Optional[str] = None
+    ) -> Iterator:
+        """Yield mood-based recommendations one by one as they are generated"""
+        pass
@@ -0,0 +1,225 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from constants.categories import BookGenres
+from constants.tropes import BookTropes
+from models.book import BookRecommendation
+from . import deadline
+from .book_service import BookService
+from .catalog import BookCatalog
+from .circuit_breaker import CircuitBreaker
+from .gemini_service import GeminiService
+from .response_cache import ResponseCache
+from .scheduler import Priority, priority
+from .similarity_index import SimilarityIndex
+
+BOOK_METHODS = ("genre", "spice-level", "tags", "similar")
+
+
+@dataclass(frozen=True)
+class WarmTask:
+    """One cached answer to precompute: a trope query or a per-book lookup"""
+    kind: str
+    args: Tuple
+
+    @property
+    def id(self) -> str:
+        return "|".join([self.kind] + ["" if arg is None else str(arg) for arg in self.args])
+
+
+def trope_tasks(counts: Iterable[int] = (5,), genres: Optional[List[str]] = None) -> Iterator[WarmTask]:
+    """Every trope alone and with every genre, for each count"""
+    genres = BookGenres.get_all() if genres is None else genres
+    for trope in BookTropes.get_all():
+        for count in counts:
+            for genre in [None] + list(genres):
+                yield WarmTask("trope", (trope, count, genre))
+
+
+def book_tasks(books: Iterable[BookRecommendation], methods: Iterable[str] = BOOK_METHODS) -> Iterator[WarmTask]:
+    for book in books:
+        for method in methods:
+            yield WarmTask(method, (book.title, book.author))
+
+
+def read_titles(path: str) -> List[BookRecommendation]:
+    """Popular titles: a JSON list of {title, author} or one 'Title by Author' per line"""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        return [BookRecommendation(item["title"], item["author"]) for item in json.loads(text)]
+    return [BookRecommendation.from_string(line) for line in text.splitlines() if line.strip()]
+
+
+class Checkpoint:
+    """Outcome of every finished task, appended as JSON lines so an interrupted run can resume"""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self._lock = threading.Lock()
+        self._done: Dict[str, float] = {}
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        if entry["status"] == "ok":
+                            self._done[entry["task"]] = entry["at"]
+
+    def done_since(self, task: WarmTask, since: float) -> bool:
+        with self._lock:
+            return self._done.get(task.id, float("-inf")) >= since
+
+    def record(self, task: WarmTask, status: str) -> None:
+        now = time.time()
+        with self._lock:
+            if status == "ok":
+                self._done[task.id] = now
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"task": task.id, "status": status, "at": now}, ensure_ascii=False) + "\n")
+
+
+class RefreshingCache:
+    """Write-through view of a ResponseCache that never answers reads.
+
+    Forces every lookup to Gemini so warmed entries get a fresh TTL; empty
+    or failed answers are not written, so they never replace a good one.
+    """
+
+    def __init__(self, cache: ResponseCache):
+        self.cache = cache
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        return False, None
+
+    def get_stale(self, key: str) -> Tuple[bool, Any]:
+        return False, None
+
+    def set(self, key: str, value: Any, method: str) -> None:
+        if not self.cache.is_negative(value):
+            self.cache.set(key, value, method)
+
+    def __getattr__(self, name: str):
+        return getattr(self.cache, name)
+
+
+class _UnservedCatalog(BookCatalog):
+    """Learns books but never answers, so each trope query reaches the cache or Gemini"""
+
+    def find(self, *args, **kwargs) -> List[BookRecommendation]:
+        return []
+
+
+class _UnservedIndex(SimilarityIndex):
+    """Same for similar books: the answer must land in the response cache"""
+
+    def contains(self, title: str, author: str) -> bool:
+        return False
+
+
+class CacheWarmer:
+    """Run warm tasks through a BookService at BULK priority with bounded parallelism.
+
+    Calls go through the service's scheduler, so its rate limits and 429
+    pauses apply; while the circuit breaker is open no new task is started.
+    A task counts as done only when its answer was complete and not
+    degraded; done tasks younger than max_age are skipped on the next run.
+    """
+
+    def __init__(self,
+                 service: BookService,
+                 checkpoint: Checkpoint,
+                 parallelism: int = 4,
+                 max_age: float = 24 * 60 * 60,
+                 task_timeout: float = 120.0,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.service = service
+        self.checkpoint = checkpoint
+        self.parallelism = parallelism
+        self.max_age = max_age
+        self.task_timeout = task_timeout
+        self._sleep = sleep
+        self._stats = {"ok": 0, "empty": 0, "degraded": 0, "error": 0, "skipped": 0}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_cache(cls, cache: ResponseCache, refresh: bool = False,
+                  gemini: Optional[GeminiService] = None, **kwargs) -> "CacheWarmer":
+        service = BookService(
+            cache=RefreshingCache(cache) if refresh else cache,
+            gemini=gemini,
+            catalog=_UnservedCatalog(),
+            similarity=_UnservedIndex(),
+        )
+        return cls(service, **kwargs)
+
+    def _lookup(self, task: WarmTask) -> Any:
+        service = self.service
+        if task.kind == "trope":
+            trope, count, genre = task.args
+            return service.get_books_for_trope(trope, count, genre)
+        title, author = task.args
+        if task.kind == "genre":
+            genre = service.get_book_genre(title, author)
+            return None if genre == "Unknown" else genre
+        if task.kind == "spice-level":
+            return service.get_book_spice_level(title, author)
+        if task.kind == "tags":
+            return service.get_book_tags(title, author)
+        if task.kind == "similar":
+            return service.get_similar_books(title, author)
+        raise ValueError(f"unknown warm task {task.kind!r}")
+
+    def _run(self, task: WarmTask) -> str:
+        tokens = deadline.begin_request(self.task_timeout)
+        try:
+            with priority(Priority.BULK):
+                result = self._lookup(task)
+            if deadline.degraded_reasons():
+                return "degraded"
+            if not result or (task.kind == "trope" and len(result) < task.args[1]):
+                return "empty"
+            return "ok"
+        except Exception as e:
+            print(f"Could not warm {task.id}: {e}")
+            return "error"
+        finally:
+            deadline.end_request(tokens)
+
+    def _warm(self, task: WarmTask) -> None:
+        status = self._run(task)
+        self.checkpoint.record(task, status)
+        with self._lock:
+            self._stats[status] += 1
+
+    def _wait_for_breaker(self) -> None:
+        breaker = self.service.gemini.breaker
+        while breaker.state == CircuitBreaker.OPEN:
+            self._sleep(1.0)
+
+    def run(self, tasks: Iterable[WarmTask], progress: Optional[Callable[[dict], None]] = None) -> dict:
+        since = time.time() - self.max_age
+        in_flight = set()
+        with ThreadPoolExecutor(max_workers=self.parallelism, thread_name_prefix="cache-warm") as pool:
+            for task in tasks:
+                if self.checkpoint.done_since(task, since):
+                    with self._lock:
+                        self._stats["skipped"] += 1
+                    continue
+                if len(in_flight) >= self.parallelism:
+                    _, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    if progress is not None:
+                        progress(self.stats())
+                self._wait_for_breaker()
+                in_flight.add(pool.submit(self._warm, task))
+            wait(in_flight)
+        return self.stats()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
@@ -0,0 +1,130 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from models.book import BookRecommendation
+from constants.tropes import BookTropes
+from .normalization import book_key
+
+BookKey = Tuple[str, str]
+
+
+def normalize_label(label: str) -> str:
+    """'Enemies-to-Lovers ' -> 'enemies to lovers'"""
+    return " ".join(label.replace("-", " ").replace("_", " ").lower().split())
+
+
+class BookCatalog:
+    """In-process record of every book the service has classified.
+
+    Inverted indexes on trope, genre and spice level let trope/genre
+    queries be answered with set lookups instead of a Gemini call. Only
+    known BookTropes are indexed, and the least recently recorded books
+    are forgotten past max_books.
+    """
+
+    KNOWN_TROPES = {normalize_label(trope) for trope in BookTropes.get_all()}
+
+    def __init__(self, max_books: int = 100_000):
+        self.max_books = max_books
+        self._lock = threading.Lock()
+        self._books: "OrderedDict[BookKey, BookRecommendation]" = OrderedDict()
+        self._genres: Dict[BookKey, str] = {}
+        self._tropes: Dict[BookKey, Set[str]] = {}
+        # dicts used as insertion-ordered sets
+        self._by_trope: Dict[str, Dict[BookKey, None]] = {}
+        self._by_genre: Dict[str, Dict[BookKey, None]] = {}
+        self._by_spice: Dict[int, Dict[BookKey, None]] = {}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._books)
+
+    @staticmethod
+    def _key(title: str, author: str) -> BookKey:
+        return book_key(title, author)
+
+    def record(self,
+               book: BookRecommendation,
+               genre: Optional[str] = None,
+               spice_level: Optional[int] = None,
+               tropes: Iterable[str] = ()) -> None:
+        if not book.title or book.author == "Unknown":
+            return
+        key = self._key(book.title, book.author)
+        known_tropes = [normalize_label(trope) for trope in tropes if normalize_label(trope) in self.KNOWN_TROPES]
+        with self._lock:
+            if key in self._books:
+                self._books.move_to_end(key)
+            else:
+                self._books[key] = BookRecommendation(book.title.strip(), book.author.strip())
+            if genre and genre != "Unknown":
+                self._genres[key] = normalize_label(genre)
+                self._by_genre.setdefault(normalize_label(genre), {})[key] = None
+            if isinstance(spice_level, int):
+                self._by_spice.setdefault(spice_level, {})[key] = None
+            for trope in known_tropes:
+                self._tropes.setdefault(key, set()).add(trope)
+                self._by_trope.setdefault(trope, {})[key] = None
+            while len(self._books) > self.max_books:
+                self._forget(next(iter(self._books)))
+
+    def _forget(self, key: BookKey) -> None:
+        del self._books[key]
+        self._genres.pop(key, None)
+        for trope in self._tropes.pop(key, ()):
+            self._discard(self._by_trope, trope, key)
+        for genre in [genre for genre, keys in self._by_genre.items() if key in keys]:
+            self._discard(self._by_genre, genre, key)
+        for level in [level for level, keys in self._by_spice.items() if key in keys]:
+            self._discard(self._by_spice, level, key)
+
+    @staticmethod
+    def _discard(index: dict, label, key: BookKey) -> None:
+        keys = index[label]
+        del keys[key]
+        if not keys:
+            del index[label]
+
+    def record_tags(self, book: BookRecommendation, tags: Iterable[str]) -> None:
+        """Index the tags that are known BookTropes"""
+        self.record(book, tropes=tags)
+
+    def genre_of(self, book: BookRecommendation) -> Optional[str]:
+        """Last known genre of a book, if it was ever classified"""
+        with self._lock:
+            return self._genres.get(self._key(book.title, book.author))
+
+    def find(self,
+             trope: Optional[str] = None,
+             genre: Optional[str] = None,
+             spice_level: Optional[int] = None,
+             limit: Optional[int] = None) -> List[BookRecommendation]:
+        """Books matching every given criterion, oldest index entries first"""
+        with self._lock:
+            indexes = []
+            if trope is not None:
+                indexes.append(self._by_trope.get(normalize_label(trope), {}))
+            if genre is not None:
+                indexes.append(self._by_genre.get(normalize_label(genre), {}))
+            if spice_level is not None:
+                indexes.append(self._by_spice.get(spice_level, {}))
+            if not indexes:
+                return []
+
+            smallest = min(indexes, key=len)
+            results = []
+            for key in smallest:
+                if all(key in index for index in indexes):
+                    results.append(self._books[key])
+                    if limit is not None and len(results) >= limit:
+                        break
+            return results
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "books": len(self._books),
+                "tropes": len(self._by_trope),
+                "genres": len(self._by_genre),
+                "spice_levels": len(self._by_spice),
+            }
@@ -0,0 +1,116 @@
+import threading
+import time
+from collections import deque
+from typing import Callable
+
+
+class CircuitOpen(Exception):
+    """The breaker is open; the call was rejected without going upstream"""
+
+
+class CircuitBreaker:
+    """Stop calling a backend that keeps failing or has become very slow.
+
+    Outcomes of the last `window` calls are kept while closed. Once at
+    least min_calls are known and the share of failures reaches
+    failure_ratio (or the share of calls slower than slow_call_seconds
+    reaches slow_ratio) the breaker opens and rejects calls for
+    open_seconds. It then lets half_open_probes calls through: if they all
+    succeed quickly it closes, otherwise it opens again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self,
+                 failure_ratio: float = 0.5,
+                 slow_ratio: float = 0.8,
+                 slow_call_seconds: float = 10.0,
+                 window: int = 20,
+                 min_calls: int = 10,
+                 open_seconds: float = 30.0,
+                 half_open_probes: int = 1,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_ratio = failure_ratio
+        self.slow_ratio = slow_ratio
+        self.slow_call_seconds = slow_call_seconds
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probe_successes = 0
+        self._stats = {"opened": 0, "rejected": 0}
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _maybe_half_open(self) -> None:
+        if self._state == self.OPEN and self.clock() - self._opened_at >= self.open_seconds:
+            self._state = self.HALF_OPEN
+            self._probes = 0
+            self._probe_successes = 0
+
+    def _open(self) -> None:
+        self._state = self.OPEN
+        self._opened_at = self.clock()
+        self._outcomes.clear()
+        self._stats["opened"] += 1
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now; every allowed call must be recorded or released"""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and self._probes < self.half_open_probes:
+                self._probes += 1
+                return True
+            self._stats["rejected"] += 1
+            return False
+
+    def release(self) -> None:
+        """An allowed call ended without a verdict on the backend (e.g. the caller's own deadline ran out)"""
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._probes > self._probe_successes:
+                self._probes -= 1
+
+    def record(self, success: bool, seconds: float) -> None:
+        slow = seconds >= self.slow_call_seconds
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                if success and not slow:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.half_open_probes:
+                        self._state = self.CLOSED
+                else:
+                    self._open()
+                return
+            if self._state == self.OPEN:
+                return
+
+            self._outcomes.append((not success, slow))
+            if len(self._outcomes) >= self.min_calls:
+                failures = sum(failed for failed, _ in self._outcomes)
+                slow_calls = sum(is_slow for _, is_slow in self._outcomes)
+                if (failures >= self.failure_ratio * len(self._outcomes)
+                        or slow_calls >= self.slow_ratio * len(self._outcomes)):
+                    self._open()
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._maybe_half_open()
+            return {
+                **self._stats,
+                "state": self._state,
+                "recent_calls": len(self._outcomes),
+                "recent_failures": sum(failed for failed, _ in self._outcomes),
+            }
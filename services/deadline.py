@@ -0,0 +1,64 @@
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+
+
+class DeadlineExceeded(Exception):
+    """The request's time budget ran out before the upstream call finished"""
+
+
+# Absolute time.monotonic() deadline of the current request, if any
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("request_deadline", default=None)
+# Reasons the current answer is degraded; the list object is shared with copied contexts
+_degraded: contextvars.ContextVar[Optional[List[str]]] = contextvars.ContextVar("request_degraded", default=None)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the deadline (None without a deadline)"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def check() -> None:
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded()
+
+
+@contextmanager
+def deadline(seconds: float) -> Iterator[None]:
+    """Give the block at most seconds; a tighter enclosing deadline still applies"""
+    current = _deadline.get()
+    token = _deadline.set(min(time.monotonic() + seconds, current if current is not None else float("inf")))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def begin_request(seconds: Optional[float]) -> Tuple[contextvars.Token, contextvars.Token]:
+    """Start a request with a fresh deadline and degradation record"""
+    return (
+        _deadline.set(time.monotonic() + seconds if seconds is not None else None),
+        _degraded.set([]),
+    )
+
+
+def end_request(tokens: Tuple[contextvars.Token, contextvars.Token]) -> None:
+    deadline_token, degraded_token = tokens
+    _deadline.reset(deadline_token)
+    _degraded.reset(degraded_token)
+
+
+def mark_degraded(reason: str) -> None:
+    """Note that the current answer is a fallback (stale value, partial result, ...)"""
+    reasons = _degraded.get()
+    if reasons is not None and reason not in reasons:
+        reasons.append(reason)
+
+
+def degraded_reasons() -> List[str]:
+    return list(_degraded.get() or [])
@@ -1,35 +1,300 @@
-import json
-import re
-from typing import Optional
-from google import genai
-from configure.config import GEMINI_API_KEY
+import contextvars
+import hashlib
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Iterator, Optional
+from . import deadline
+from .circuit_breaker import CircuitBreaker, CircuitOpen
+from .json_extractor import extract_json
+from .llm_backend import ClientBackend, backend_from_env
+from .metrics import observe_llm_call
+from .prompt_builder import estimate_tokens
+from .resilience import CallMetrics, HedgePolicy, RetryPolicy, is_retryable
+from .scheduler import GeminiScheduler
+from .single_flight import SingleFlight
+from .timing import span
+
+if TYPE_CHECKING:
+    from google import genai
 
 
 
 class GeminiService:
-    def __init__(self):
-        self.client = genai.Client(api_key=GEMINI_API_KEY)
+    # Keep-alive pool shared by all requests of one worker process
+    MAX_CONNECTIONS = 32
+    MAX_KEEPALIVE_CONNECTIONS = 16
+    KEEPALIVE_EXPIRY = 120.0
+    # Expected response size, reserved from the tokens-per-minute budget until the real size is known
+    OUTPUT_TOKEN_ALLOWANCE = 512
+
+    def __init__(self,
+                 single_flight: Optional[SingleFlight] = None,
+                 client: Optional["genai.Client"] = None,
+                 scheduler: Optional[GeminiScheduler] = None,
+                 retry: Optional[RetryPolicy] = None,
+                 hedging: Optional[HedgePolicy] = None,
+                 breaker: Optional[CircuitBreaker] = None,
+                 backend=None):
+        # The SDK is heavy to import, so the client is only built on first use
+        self._client = client
+        self._client_lock = threading.Lock()
         self.model = "gemini-2.5-flash"
+        self.single_flight = single_flight if single_flight is not None else SingleFlight.default()
+        self.scheduler = scheduler if scheduler is not None else GeminiScheduler.default()
+        self.retry = retry if retry is not None else RetryPolicy.from_env()
+        self.hedging = hedging if hedging is not None else HedgePolicy.from_env()
+        self.metrics = CallMetrics()
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        # Where prompts go: the SDK client, or a cassette recorder/replayer (GEMINI_CASSETTE)
+        self.backend = backend if backend is not None else backend_from_env(ClientBackend(lambda: self.client))
+        self._call_pool: Optional[ThreadPoolExecutor] = None
+        self._sleep = time.sleep
+    
+    @property
+    def client(self) -> "genai.Client":
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self.create_client()
+        return self._client
+    
+    @classmethod
+    def create_client(cls) -> "genai.Client":
+        """Gemini client whose HTTP connections are pooled and kept alive between calls"""
+        import httpx
+        from google import genai
+        from google.genai import types
+        from configure.config import GEMINI_API_KEY
+
+        limits = httpx.Limits(
+            max_connections=cls.MAX_CONNECTIONS,
+            max_keepalive_connections=cls.MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=cls.KEEPALIVE_EXPIRY,
+        )
+        return genai.Client(
+            api_key=GEMINI_API_KEY,
+            http_options=types.HttpOptions(
+                client_args={"limits": limits},
+            ),
+        )
     
     def _generate_content(self, prompt: str) -> Optional[str]:
-        """Base method for API calls"""
+        """Base method for API calls.
+        
+        Identical prompts already in flight are coalesced into a single
+        upstream call; an error is delivered to every waiting caller. The
+        upstream call waits for admission by the scheduler, retryable errors
+        are retried with backoff and slow calls may be hedged. A call that
+        cannot finish before the request deadline is abandoned, and while the
+        circuit breaker is open calls are rejected at once; either way the
+        request is marked degraded and None is returned.
+        """
+        key = f"{self.model}:{hashlib.sha256(prompt.encode('utf-8')).hexdigest()}"
+        with span("gemini"), observe_llm_call(estimate_tokens(prompt)) as call:
+            try:
+                text = self.single_flight.do(key, lambda: self._resilient_call(prompt))
+            except Exception as e:
+                call["outcome"] = self._failed(e)
+                return None
+            self._succeeded(call, text)
+            return text
+
+    @staticmethod
+    def _failed(error: Exception) -> str:
+        """Report a failed call; returns its outcome label for metrics"""
+        if isinstance(error, deadline.DeadlineExceeded):
+            deadline.mark_degraded("deadline_exceeded")
+            return "deadline_exceeded"
+        if isinstance(error, CircuitOpen):
+            deadline.mark_degraded("circuit_open")
+            return "circuit_open"
+        print(f"Error calling Gemini API: {error}")
+        # The caller answers with a default ("Unknown", []) that must not be cached downstream
+        deadline.mark_degraded("upstream_error")
+        return "error"
+
+    @staticmethod
+    def _succeeded(call: dict, text: Optional[str]) -> None:
+        call["outcome"] = "ok" if text else "empty"
+        if text:
+            call["response_tokens"] = estimate_tokens(text)
+    
+    def _generate_content_stream(self, prompt: str) -> Iterator[str]:
+        """Yield response text chunks as the model produces them"""
+        with observe_llm_call(estimate_tokens(prompt)) as call:
+            if not self.breaker.allow():
+                call["outcome"] = self._failed(CircuitOpen())
+                return
+            reserved = self._token_estimate(prompt)
+            started = time.perf_counter()
+            try:
+                ticket = self.scheduler.acquire(reserved)
+            except deadline.DeadlineExceeded as e:
+                self.breaker.release()
+                call["outcome"] = self._failed(e)
+                return
+            produced = 0
+            healthy = False
+            try:
+                for text in self._call_model_stream(prompt):
+                    if text:
+                        produced += estimate_tokens(text)
+                        yield text
+                healthy = True
+                call["outcome"] = "ok" if produced else "empty"
+                call["response_tokens"] = produced
+            except GeneratorExit:
+                # The consumer stopped reading once it had what it needed
+                healthy = True
+                call["outcome"] = "ok" if produced else "empty"
+                call["response_tokens"] = produced
+                raise
+            except Exception as e:
+                self._check_rate_limit(e)
+                healthy = not self._backend_failure(e)
+                call["outcome"] = self._failed(e)
+            finally:
+                self.breaker.record(healthy, time.perf_counter() - started)
+                ticket.release()
+                ticket.settle(estimate_tokens(prompt) + produced)
+    
+    def _resilient_call(self, prompt: str) -> Optional[str]:
+        """Call upstream, retrying retryable errors with jittered exponential backoff.
+
+        The end-to-end outcome is recorded by the circuit breaker.
+        """
+        deadline.check()
+        if not self.breaker.allow():
+            raise CircuitOpen()
+        started = time.perf_counter()
+        self.metrics.count("calls")
+        healthy = judged = False
         try:
-            response = self.client.models.generate_content(
-                model=self.model,
-                contents=prompt
-            )
-            return response.text if response.text else None
-        except Exception as e:
-            print(f"Error calling Gemini API: {e}")
+            attempt = 0
+            while True:
+                try:
+                    text = self._hedged_call(prompt)
+                    healthy = judged = True
+                    return text
+                except Exception as e:
+                    # Running out of the request's own budget says nothing about the backend
+                    if not isinstance(e, deadline.DeadlineExceeded):
+                        healthy, judged = not self._backend_failure(e), True
+                    attempt += 1
+                    if attempt >= self.retry.max_attempts or not is_retryable(e):
+                        self.metrics.count("failures")
+                        raise
+                    delay = self._retry_delay(attempt)
+                    self.metrics.count("retries")
+                    self._sleep(delay)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.metrics.calls.add(elapsed)
+            if judged:
+                self.breaker.record(healthy, elapsed)
+            else:
+                self.breaker.release()
+
+    @staticmethod
+    def _backend_failure(error: Exception) -> bool:
+        """Upstream errors that say the backend is unhealthy (not e.g. a rejected prompt)"""
+        return is_retryable(error)
+
+    def _retry_delay(self, attempt: int) -> float:
+        """Backoff before the next attempt; gives up if it would overrun the deadline"""
+        delay = self.retry.delay(attempt - 1)
+        left = deadline.remaining()
+        if left is not None and left <= delay:
+            self.metrics.count("failures")
+            raise deadline.DeadlineExceeded()
+        return delay
+
+    def _hedge_delay(self) -> Optional[float]:
+        if self.hedging is None or not self.metrics.may_hedge(self.hedging.max_ratio):
             return None
+        return self.hedging.delay(self.metrics.upstream)
+
+    def _hedged_call(self, prompt: str) -> Optional[str]:
+        """One attempt; if it outlives the hedge delay a duplicate is sent and the first answer wins.
+
+        With a deadline or hedging the attempt runs on a pool thread so the
+        caller can stop waiting. A blocking SDK call cannot be interrupted,
+        so a losing or late call is abandoned (cancelled if it has not
+        started) and its result dropped.
+        """
+        delay = self._hedge_delay()
+        left = deadline.remaining()
+        if delay is None and left is None:
+            return self._timed_call(prompt)
+
+        if self._call_pool is None:
+            with self._client_lock:
+                if self._call_pool is None:
+                    self._call_pool = ThreadPoolExecutor(max_workers=self.MAX_CONNECTIONS, thread_name_prefix="gemini-call")
+
+        primary = self._call_pool.submit(contextvars.copy_context().run, self._timed_call, prompt)
+        done, _ = wait([primary], timeout=min(value for value in (delay, left) if value is not None))
+        if done:
+            return primary.result()
+        if delay is None or (left is not None and deadline.remaining() <= 0):
+            primary.cancel()
+            raise deadline.DeadlineExceeded()
+
+        self.metrics.count("hedges")
+        backup = self._call_pool.submit(contextvars.copy_context().run, self._timed_call, prompt)
+        pending, error = {primary, backup}, None
+        while pending:
+            done, pending = wait(pending, timeout=deadline.remaining(), return_when=FIRST_COMPLETED)
+            if not done:
+                for other in pending:
+                    other.cancel()
+                raise deadline.DeadlineExceeded()
+            for future in done:
+                if future.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    if future is backup:
+                        self.metrics.count("hedge_wins")
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _timed_call(self, prompt: str) -> Optional[str]:
+        started = time.perf_counter()
+        self.metrics.count("attempts")
+        text = self._scheduled_call(prompt)
+        self.metrics.upstream.add(time.perf_counter() - started)
+        return text
+
+    def stats(self) -> dict:
+        """Retry, hedging and latency metrics of upstream calls"""
+        return self.metrics.stats()
+
+    def _token_estimate(self, prompt: str) -> int:
+        return estimate_tokens(prompt) + self.OUTPUT_TOKEN_ALLOWANCE
+
+    def _check_rate_limit(self, error: Exception) -> None:
+        if getattr(error, "code", None) == 429 or getattr(error, "status_code", None) == 429:
+            self.scheduler.rate_limited()
+
+    def _scheduled_call(self, prompt: str) -> Optional[str]:
+        with self.scheduler.slot(self._token_estimate(prompt)) as ticket:
+            try:
+                text = self._call_model(prompt)
+            except Exception as e:
+                self._check_rate_limit(e)
+                raise
+        ticket.settle(estimate_tokens(prompt) + estimate_tokens(text or ""))
+        return text
+
+    def _call_model(self, prompt: str) -> Optional[str]:
+        return self.backend.generate(self.model, prompt)
     
-    def _extract_json_from_text(self, text: str, key: str) -> Optional[dict]:
+    def _call_model_stream(self, prompt: str) -> Iterator[str]:
+        return self.backend.generate_stream(self.model, prompt)
+
+    def _extract_json_from_text(self, text: str, key: Optional[str]) -> Optional[dict]:
         """Extract JSON containing specific key from text"""
-        pattern = rf'\{{.*?"{key}"\s*:\s*.*?\}}'
-        match = re.search(pattern, text, re.DOTALL)
-        if match:
-            try:
-                return json.loads(match.group(0))
-            except json.JSONDecodeError:
-                return None
-        return None
\ No newline at end of file
+        with span("parse"):
+            return extract_json(text, key)
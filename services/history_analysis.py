@@ -0,0 +1,64 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import FrozenSet, Iterable, Optional, Tuple
+from .normalization import BookKey, book_key
+
+
+def history_keys(read_books: Iterable) -> FrozenSet[BookKey]:
+    return frozenset(book_key(book.title, book.author) for book in read_books)
+
+
+def history_fingerprint(keys: FrozenSet[BookKey]) -> str:
+    """Order-insensitive fingerprint of a reading history"""
+    digest = hashlib.sha256()
+    for title, author in sorted(keys):
+        digest.update(f"{title}\x1f{author}\x1e".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class AnalysisStore:
+    """Reading-pattern analyses keyed by history fingerprint.
+
+    Besides exact hits, finds the largest stored history contained in a new
+    one, so an extended history can be analyzed from the delta alone.
+    """
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[FrozenSet[BookKey], dict]]" = OrderedDict()
+        self._stats = {"exact_hits": 0, "delta_hits": 0, "misses": 0}
+
+    def get(self, keys: FrozenSet[BookKey]) -> Optional[dict]:
+        fingerprint = history_fingerprint(keys)
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is None:
+                return None
+            self._entries.move_to_end(fingerprint)
+            self._stats["exact_hits"] += 1
+            return dict(entry[1])
+
+    def best_base(self, keys: FrozenSet[BookKey]) -> Optional[Tuple[FrozenSet[BookKey], dict]]:
+        """The analysis of the largest stored history that keys extends"""
+        with self._lock:
+            best = None
+            for base_keys, result in self._entries.values():
+                if len(base_keys) < len(keys) and base_keys <= keys:
+                    if best is None or len(base_keys) > len(best[0]):
+                        best = (base_keys, result)
+            self._stats["delta_hits" if best else "misses"] += 1
+            return (best[0], dict(best[1])) if best else None
+
+    def put(self, keys: FrozenSet[BookKey], result: dict) -> None:
+        fingerprint = history_fingerprint(keys)
+        with self._lock:
+            self._entries[fingerprint] = (keys, dict(result))
+            self._entries.move_to_end(fingerprint)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries)}
@@ -0,0 +1,145 @@
+import json
+import re
+from collections import deque
+from typing import Any, List, Optional, Tuple
+
+# Only these characters can change the scanner state, so everything else is
+# skipped by the regex engine instead of a Python loop.
+_STRUCTURAL = re.compile(r'[\\"{}\[\],]')
+_TRAILING_COMMA = re.compile(r'("(?:\\.|[^"\\])*")|,(\s*[}\]])')
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+def extract_json(text: str, key: Optional[str] = None) -> Optional[dict]:
+    """Return the first JSON object in text (containing key, if given).
+
+    A single brace-balanced pass finds top-level objects, ignoring braces
+    inside strings, so nested objects, code fences and surrounding prose are
+    handled in linear time. Objects that do not parse are repaired locally:
+    trailing commas are dropped, and output truncated mid-object is closed
+    at the last complete element; an unfinished value is dropped, never
+    completed.
+    """
+    if not text or (key is not None and f'"{key}"' not in text):
+        return None
+
+    # Fast path: the usual single object wrapped in prose or a code fence
+    first, last = text.find("{"), text.rfind("}")
+    if first != -1 and last > first:
+        try:
+            found = _find_key(json.loads(text[first:last + 1]), key)
+        except json.JSONDecodeError:
+            found = None
+        if found is not None:
+            return found
+
+    pos = 0
+    while True:
+        start = text.find("{", pos)
+        if start == -1:
+            return None
+
+        end, stack, in_string, cut = _scan(text, start)
+        if end is None:
+            return _repair_truncated(text[start:], stack, in_string, cut, key)
+
+        found = _find_key(_loads(text[start:end + 1]), key)
+        if found is not None:
+            return found
+        pos = end + 1
+
+
+def _scan(text: str, start: int) -> Tuple[Optional[int], List[str], bool, Optional[Tuple[int, str]]]:
+    """Walk one object from text[start] == '{'.
+
+    Returns (end index or None if truncated, open brackets, whether the text
+    ended inside a string, last comma outside a string with the brackets
+    open at that point).
+    """
+    stack: List[str] = []
+    in_string = False
+    skip_until = -1
+    cut = None
+
+    for match in _STRUCTURAL.finditer(text, start):
+        i = match.start()
+        if i < skip_until:
+            continue
+        char = match.group()
+
+        if in_string:
+            if char == "\\":
+                skip_until = i + 2
+            elif char == '"':
+                in_string = False
+            continue
+
+        if char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append(char)
+        elif char in "}]":
+            if stack:
+                stack.pop()
+            if not stack:
+                return i, stack, False, cut
+        elif char == ",":
+            cut = (i - start, "".join(stack))
+
+    return None, stack, in_string, cut
+
+
+def _repair_truncated(fragment: str, stack: List[str], in_string: bool,
+                      cut: Optional[Tuple[int, str]], key: Optional[str]) -> Optional[dict]:
+    candidates = []
+    if cut is not None:
+        # Drop the unfinished element after the last comma
+        position, open_brackets = cut
+        candidates.append(fragment[:position] + _closing(open_brackets))
+
+    # Close the brackets as they are only if the text stopped right after a
+    # complete string or container; a string or number cut off mid-value is
+    # never completed, since that would make up a value
+    closed = fragment.rstrip().rstrip(",").rstrip()
+    if not in_string and closed.endswith(('"', "]", "}")):
+        candidates.append(closed + _closing("".join(stack)))
+
+    for candidate in candidates:
+        found = _find_key(_loads(candidate), key)
+        if found is not None:
+            return found
+    return None
+
+
+def _closing(open_brackets: str) -> str:
+    return "".join(_CLOSERS[bracket] for bracket in reversed(open_brackets))
+
+
+def _loads(candidate: str) -> Any:
+    try:
+        return json.loads(candidate)
+    except json.JSONDecodeError:
+        pass
+    try:
+        return json.loads(_TRAILING_COMMA.sub(lambda m: m.group(1) or m.group(2), candidate))
+    except json.JSONDecodeError:
+        return None
+
+
+def _find_key(data: Any, key: Optional[str]) -> Optional[dict]:
+    """The object itself if it has key, else the first nested object that does"""
+    if not isinstance(data, dict):
+        return None
+    if key is None:
+        return data
+
+    pending = deque([data])
+    while pending:
+        current = pending.popleft()
+        if isinstance(current, dict):
+            if key in current:
+                return current
+            pending.extend(current.values())
+        elif isinstance(current, list):
+            pending.extend(current)
+    return None
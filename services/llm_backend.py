@@ -0,0 +1,235 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Optional
+
+if TYPE_CHECKING:
+    from google import genai
+
+
+class ClientBackend:
+    """Model calls through the google-genai SDK client"""
+
+    def __init__(self, client: Callable[[], "genai.Client"]):
+        # The client is resolved per call so GeminiService can still build it lazily
+        self._client = client
+
+    def generate(self, model: str, prompt: str) -> Optional[str]:
+        response = self._client().models.generate_content(model=model, contents=prompt)
+        return response.text if response.text else None
+
+    def generate_stream(self, model: str, prompt: str) -> Iterator[str]:
+        for chunk in self._client().models.generate_content_stream(model=model, contents=prompt):
+            yield chunk.text
+
+    def stats(self) -> dict:
+        return {"backend": "client"}
+
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Prompts differ in indentation and line breaks between code versions; only the words matter"""
+    return _WHITESPACE.sub(" ", prompt).strip()
+
+
+def prompt_key(model: str, prompt: str) -> str:
+    return hashlib.sha256(f"{model}\n{normalize_prompt(prompt)}".encode("utf-8")).hexdigest()[:32]
+
+
+class CassetteMiss(Exception):
+    """The prompt was never recorded"""
+
+
+class ReplayedError(Exception):
+    """An upstream error as it was recorded; keeps the status code so retries behave the same"""
+
+    def __init__(self, message: str, code: Optional[int] = None):
+        super().__init__(message)
+        self.code = code
+
+
+class Cassette:
+    """Recorded model interactions, one JSON object per line (gzip-compressed for *.gz).
+
+    An interaction holds the prompt key, the response text (or the chunks of
+    a stream with their offsets in seconds), the error if the call failed
+    and the call's latency. Prompts themselves are not stored. The same
+    prompt may have several interactions; they are replayed in turn.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.interactions: Dict[str, List[dict]] = {}
+        if os.path.exists(path):
+            with self._open("rt") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.interactions.setdefault(entry["key"], []).append(entry)
+
+    def _open(self, mode: str):
+        if self.path.endswith(".gz"):
+            return gzip.open(self.path, mode, encoding="utf-8")
+        return open(self.path, mode, encoding="utf-8")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(entries) for entries in self.interactions.values())
+
+    def append(self, entry: dict) -> None:
+        """Store an interaction; it is written out at once so an interrupted recording is kept"""
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            self.interactions.setdefault(entry["key"], []).append(entry)
+            with self._open("at") as f:
+                f.write(line + "\n")
+
+
+def _error(error: Exception) -> dict:
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    return {"type": type(error).__name__, "message": str(error), "code": code if isinstance(code, int) else None}
+
+
+class RecordingBackend:
+    """Pass calls to another backend and record every prompt -> response pair"""
+
+    def __init__(self, inner, cassette: Cassette, clock: Callable[[], float] = time.perf_counter):
+        self.inner = inner
+        self.cassette = cassette
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._recorded = 0
+
+    def _record(self, model: str, prompt: str, started: float, **fields) -> None:
+        self.cassette.append({"key": prompt_key(model, prompt), "model": model,
+                              "latency": round(self.clock() - started, 4), **fields})
+        with self._lock:
+            self._recorded += 1
+
+    def generate(self, model: str, prompt: str) -> Optional[str]:
+        started = self.clock()
+        try:
+            text = self.inner.generate(model, prompt)
+        except Exception as e:
+            self._record(model, prompt, started, error=_error(e))
+            raise
+        self._record(model, prompt, started, response=text)
+        return text
+
+    def generate_stream(self, model: str, prompt: str) -> Iterator[str]:
+        """Record the chunks read, also when the consumer stops early (as the stream parsers do)"""
+        started = self.clock()
+        chunks = []
+        error = None
+        try:
+            for text in self.inner.generate_stream(model, prompt):
+                chunks.append([round(self.clock() - started, 4), text])
+                yield text
+        except Exception as e:
+            error = _error(e)
+            raise
+        finally:
+            self._record(model, prompt, started, chunks=chunks, **({"error": error} if error else {}))
+
+    def stats(self) -> dict:
+        return {"backend": "record", "cassette": self.cassette.path, "recorded": self._recorded}
+
+
+class ReplayBackend:
+    """Answer from a cassette without network access.
+
+    Recorded latencies are reproduced multiplied by latency_scale (0 answers
+    at once). A prompt that was never recorded raises CassetteMiss; misses
+    are counted per prompt key with the start of the prompt, for stats().
+    """
+
+    MAX_REPORTED_MISSES = 20
+
+    def __init__(self,
+                 cassette: Cassette,
+                 latency_scale: float = 1.0,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.cassette = cassette
+        self.latency_scale = latency_scale
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._positions: Dict[str, int] = {}
+        self._misses: Dict[str, dict] = {}
+        self._stats = {"hits": 0, "misses": 0}
+
+    def _next(self, model: str, prompt: str) -> dict:
+        key = prompt_key(model, prompt)
+        with self._lock:
+            entries = self.cassette.interactions.get(key)
+            if not entries:
+                self._stats["misses"] += 1
+                miss = self._misses.setdefault(key, {"count": 0, "prompt": normalize_prompt(prompt)[:120]})
+                miss["count"] += 1
+                raise CassetteMiss(f"no recorded response for prompt {key}")
+            position = self._positions.get(key, 0)
+            self._positions[key] = position + 1
+            self._stats["hits"] += 1
+            return entries[position % len(entries)]
+
+    def _result(self, entry: dict) -> Optional[str]:
+        if "error" in entry:
+            raise ReplayedError(entry["error"]["message"], entry["error"]["code"])
+        if "chunks" in entry:
+            return "".join(text or "" for _, text in entry["chunks"]) or None
+        return entry.get("response")
+
+    def generate(self, model: str, prompt: str) -> Optional[str]:
+        entry = self._next(model, prompt)
+        self._sleep(entry["latency"] * self.latency_scale)
+        return self._result(entry)
+
+    def generate_stream(self, model: str, prompt: str) -> Iterator[str]:
+        entry = self._next(model, prompt)
+        if "chunks" not in entry:
+            # Recorded as a whole response: one chunk after the full latency
+            self._sleep(entry["latency"] * self.latency_scale)
+            text = self._result(entry)
+            if text:
+                yield text
+            return
+        elapsed = 0.0
+        for offset, text in entry["chunks"]:
+            self._sleep(max(0.0, offset - elapsed) * self.latency_scale)
+            elapsed = offset
+            yield text
+        if "error" in entry:
+            self._result(entry)
+
+    def stats(self) -> dict:
+        with self._lock:
+            misses = sorted(self._misses.items(), key=lambda item: -item[1]["count"])
+            return {
+                "backend": "replay",
+                "cassette": self.cassette.path,
+                "interactions": len(self.cassette),
+                **self._stats,
+                "missed_prompts": [{"key": key, **miss} for key, miss in misses[:self.MAX_REPORTED_MISSES]],
+            }
+
+
+def backend_from_env(live):
+    """GEMINI_CASSETTE=<file> with GEMINI_CASSETTE_MODE=record|replay wraps or replaces the live backend.
+
+    GEMINI_REPLAY_LATENCY_SCALE multiplies replayed latencies (default 1).
+    """
+    path = os.environ.get("GEMINI_CASSETTE")
+    if not path:
+        return live
+    mode = os.environ.get("GEMINI_CASSETTE_MODE", "replay")
+    if mode == "record":
+        return RecordingBackend(live, Cassette(path))
+    if mode == "replay":
+        return ReplayBackend(Cassette(path), float(os.environ.get("GEMINI_REPLAY_LATENCY_SCALE", 1.0)))
+    raise ValueError(f"GEMINI_CASSETTE_MODE must be 'record' or 'replay', not {mode!r}")
@@ -0,0 +1,304 @@
+import atexit
+import contextvars
+import functools
+import glob
+import inspect
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+TOKEN_BUCKETS = (16, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+Labels = Tuple[str, ...]
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), registry: Optional["Registry"] = None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Labels, object] = {}
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _key(self, labels: Dict[str, str]) -> Labels:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            samples = [[list(labels), _copy(value)] for labels, value in self._values.items()]
+        return {"type": self.type, "help": self.help, "labelnames": list(self.labelnames), "samples": samples}
+
+
+def _copy(value):
+    return [list(value[0]), value[1], value[2]] if isinstance(value, list) else value
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    """Summed across live worker processes"""
+    type = "gauge"
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS, registry: Optional["Registry"] = None):
+        self.buckets = tuple(buckets)
+        super().__init__(name, help, labelnames, registry)
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # per-bucket counts (last one is +Inf), sum, count
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def snapshot(self) -> dict:
+        data = super().snapshot()
+        data["buckets"] = list(self.buckets)
+        return data
+
+
+class Registry:
+    """Metrics of this process, rendered in the Prometheus text format.
+
+    With a shared directory (METRICS_DIR), every worker process writes its
+    snapshot there every flush_interval seconds and on exit; a scrape of
+    any worker merges all snapshots. Counters and histograms of exited
+    workers are kept so totals never go down; gauges only count live ones.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+        self._directory: Optional[str] = None
+        self._flusher: Optional[threading.Thread] = None
+
+    def register(self, metric: _Metric) -> None:
+        with self._lock:
+            self._metrics[metric.name] = metric
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def enable_multiprocess(self, directory: str, flush_interval: float = 5.0) -> None:
+        with self._lock:
+            if self._flusher is not None:
+                return
+            os.makedirs(directory, exist_ok=True)
+            self._directory = directory
+            self._flusher = threading.Thread(target=self._flush_loop, args=(flush_interval,),
+                                             name="metrics-flush", daemon=True)
+        self._flusher.start()
+        atexit.register(self.flush)
+
+    def _path(self, pid: int) -> str:
+        return os.path.join(self._directory, f"metrics-{pid}.json")
+
+    def _flush_loop(self, interval: float) -> None:
+        while True:
+            time.sleep(interval)
+            self.flush()
+
+    def flush(self) -> None:
+        if self._directory is None:
+            return
+        path = self._path(os.getpid())
+        try:
+            with open(path + ".tmp", "w") as f:
+                json.dump(self.snapshot(), f)
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            print(f"Could not write metrics snapshot: {e}")
+
+    def _snapshots(self) -> List[Tuple[dict, bool]]:
+        """(snapshot, process alive) of this and every other worker"""
+        snapshots = [(self.snapshot(), True)]
+        if self._directory is None:
+            return snapshots
+        own = self._path(os.getpid())
+        for path in glob.glob(os.path.join(self._directory, "metrics-*.json")):
+            if path == own:
+                continue
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            snapshots.append((data, _alive(path)))
+        return snapshots
+
+    def render(self) -> str:
+        merged: Dict[str, dict] = {}
+        for snapshot, alive in self._snapshots():
+            for name, data in snapshot.items():
+                if data["type"] == "gauge" and not alive:
+                    continue
+                target = merged.setdefault(name, {**data, "samples": {}})
+                for labels, value in data["samples"]:
+                    key = tuple(labels)
+                    if data["type"] == "histogram":
+                        current = target["samples"].setdefault(key, [[0] * len(value[0]), 0.0, 0])
+                        current[0] = [a + b for a, b in zip(current[0], value[0])]
+                        current[1] += value[1]
+                        current[2] += value[2]
+                    else:
+                        target["samples"][key] = target["samples"].get(key, 0.0) + value
+
+        lines = []
+        for name, data in sorted(merged.items()):
+            lines.append(f"# HELP {name} {data['help']}")
+            lines.append(f"# TYPE {name} {data['type']}")
+            labelnames = data["labelnames"]
+            for labels, value in sorted(data["samples"].items()):
+                pairs = list(zip(labelnames, labels))
+                if data["type"] != "histogram":
+                    lines.append(f"{name}{_labels(pairs)} {_number(value)}")
+                    continue
+                counts, total, count = value
+                cumulative = 0
+                for bound, bucket_count in zip(list(data["buckets"]) + ["+Inf"], counts):
+                    cumulative += bucket_count
+                    le = bound if bound == "+Inf" else _number(bound)
+                    lines.append(f"{name}_bucket{_labels(pairs + [('le', le)])} {cumulative}")
+                lines.append(f"{name}_sum{_labels(pairs)} {_number(total)}")
+                lines.append(f"{name}_count{_labels(pairs)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _alive(path: str) -> bool:
+    try:
+        os.kill(int(os.path.basename(path)[len("metrics-"):-len(".json")]), 0)
+        return True
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        return True
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in pairs) + "}"
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests by route and status",
+                        ("method", "route", "status"))
+HTTP_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency by route",
+                         ("method", "route"))
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being handled")
+
+LLM_CALLS = Counter("gemini_calls_total", "Gemini calls by BookService method and outcome",
+                    ("method", "outcome"))
+LLM_LATENCY = Histogram("gemini_call_duration_seconds", "Gemini call latency by BookService method",
+                        ("method",))
+LLM_IN_FLIGHT = Gauge("gemini_calls_in_flight", "Gemini calls in progress", ("method",))
+LLM_PROMPT_TOKENS = Histogram("gemini_prompt_tokens", "Estimated prompt size in tokens",
+                              ("method",), buckets=TOKEN_BUCKETS)
+LLM_RESPONSE_TOKENS = Histogram("gemini_response_tokens", "Estimated response size in tokens",
+                                ("method",), buckets=TOKEN_BUCKETS)
+PARSE_FAILURES = Counter("gemini_parse_failures_total", "Gemini responses that could not be parsed",
+                         ("method",))
+
+
+_llm_method: contextvars.ContextVar[str] = contextvars.ContextVar("llm_method", default="other")
+
+
+def current_llm_method() -> str:
+    return _llm_method.get()
+
+
+@contextmanager
+def llm_method(name: str) -> Iterator[None]:
+    """Label the Gemini calls made inside the block"""
+    token = _llm_method.set(name)
+    try:
+        yield
+    finally:
+        _llm_method.reset(token)
+
+
+def instrumented(method: Callable) -> Callable:
+    """Label the Gemini calls made by a BookService method with its name.
+
+    Generators returned by the method (streaming variants) run each step in
+    the labelled context as well.
+    """
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        context = contextvars.copy_context()
+        context.run(_llm_method.set, method.__name__)
+        result = context.run(method, *args, **kwargs)
+        if inspect.isgenerator(result):
+            return _run_in(context, result)
+        return result
+    return wrapper
+
+
+def _run_in(context: contextvars.Context, generator: Iterator) -> Iterator:
+    while True:
+        try:
+            item = context.run(next, generator)
+        except StopIteration:
+            return
+        yield item
+
+
+@contextmanager
+def observe_llm_call(prompt_tokens: int) -> Iterator[dict]:
+    """Time one Gemini call; the caller sets call["outcome"] and call["response_tokens"]"""
+    method = current_llm_method()
+    call = {"outcome": "error", "response_tokens": None}
+    LLM_IN_FLIGHT.inc(method=method)
+    LLM_PROMPT_TOKENS.observe(prompt_tokens, method=method)
+    started = time.perf_counter()
+    try:
+        yield call
+    finally:
+        LLM_IN_FLIGHT.dec(method=method)
+        LLM_LATENCY.observe(time.perf_counter() - started, method=method)
+        LLM_CALLS.inc(method=method, outcome=call["outcome"])
+        if call["response_tokens"] is not None:
+            LLM_RESPONSE_TOKENS.observe(call["response_tokens"], method=method)
@@ -0,0 +1,163 @@
+import re
+import threading
+import unicodedata
+from collections import Counter, OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional, Set, Tuple
+from models.book import BookRecommendation
+
+BookKey = Tuple[str, str]
+
+# Letters NFKD does not decompose into base letter + combining mark
+_EXTRA_FOLDS = str.maketrans({
+    "ł": "l", "đ": "d", "ø": "o", "æ": "ae", "œ": "oe", "ħ": "h", "ı": "i", "þ": "th",
+})
+_PUNCTUATION = re.compile(r"[^\w\s]|_")
+_ROMAN = re.compile(r"(x{0,3})(ix|iv|v?i{0,3})")
+_ROMAN_VALUES = {"i": 1, "v": 5, "x": 10}
+
+
+@lru_cache(maxsize=65536)
+def normalize_text(text: str) -> str:
+    """NFKC, case folding, diacritic folding, punctuation and whitespace cleanup"""
+    text = unicodedata.normalize("NFKC", text).casefold().translate(_EXTRA_FOLDS)
+    text = "".join(char for char in unicodedata.normalize("NFKD", text) if not unicodedata.combining(char))
+    return " ".join(_PUNCTUATION.sub(" ", text).split())
+
+
+def normalize_author(author: str) -> str:
+    """'Andrzej Sapkowski' and 'A. Sapkowski' both become 'a sapkowski'"""
+    parts = normalize_text(author).split()
+    if len(parts) < 2:
+        return " ".join(parts)
+    return " ".join([part[0] for part in parts[:-1]] + [parts[-1]])
+
+
+def book_key(title: str, author: str) -> BookKey:
+    return (normalize_text(title), normalize_author(author))
+
+
+def _roman_value(token: str) -> Optional[int]:
+    if not token or not _ROMAN.fullmatch(token):
+        return None
+    total = 0
+    for char, following in zip(token, token[1:] + " "):
+        value = _ROMAN_VALUES[char]
+        total += -value if _ROMAN_VALUES.get(following, 0) > value else value
+    return total
+
+
+def volume_numbers(text: str) -> Tuple[int, ...]:
+    """Numbers (digits or roman numerals up to XXXIX) in a normalized title, in order"""
+    numbers = []
+    for token in text.split():
+        if token.isdigit():
+            numbers.append(int(token))
+        else:
+            value = _roman_value(token)
+            if value is not None:
+                numbers.append(value)
+    return tuple(numbers)
+
+
+def trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """Resolve title/author variants to one canonical known book.
+
+    Exact matches on the normalized key are a dict lookup; near-duplicates
+    (typos, missing words) are found through a trigram inverted index and
+    accepted when the Jaccard similarity of the title reaches the threshold,
+    the author matches and both titles carry the same volume numbers, so
+    "Red Rising 2" never resolves to "Red Rising". The least recently used
+    books are forgotten past max_books.
+    """
+
+    def __init__(self, threshold: float = 0.75, max_books: int = 100_000):
+        self.threshold = threshold
+        self.max_books = max_books
+        self._lock = threading.Lock()
+        self._books: "OrderedDict[BookKey, BookRecommendation]" = OrderedDict()
+        self._grams: Dict[BookKey, Set[str]] = {}
+        self._index: Dict[str, Set[BookKey]] = {}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._books)
+
+    def add(self, book: BookRecommendation) -> None:
+        key = book_key(book.title, book.author)
+        if not key[0] or book.author == "Unknown":
+            return
+        with self._lock:
+            if key in self._books:
+                self._books.move_to_end(key)
+                return
+            self._books[key] = BookRecommendation(book.title.strip(), book.author.strip())
+            grams = trigrams(key[0])
+            self._grams[key] = grams
+            for gram in grams:
+                self._index.setdefault(gram, set()).add(key)
+            while len(self._books) > self.max_books:
+                self._forget(next(iter(self._books)))
+
+    def _forget(self, key: BookKey) -> None:
+        del self._books[key]
+        for gram in self._grams.pop(key):
+            keys = self._index[gram]
+            keys.discard(key)
+            if not keys:
+                del self._index[gram]
+
+    def resolve(self, title: str, author: str) -> Optional[BookRecommendation]:
+        """The canonical known book for this title/author, if any"""
+        key = book_key(title, author)
+        with self._lock:
+            if key in self._books:
+                self._books.move_to_end(key)
+                return self._books[key]
+
+            query = trigrams(key[0])
+            volumes = volume_numbers(key[0])
+            shared: Counter = Counter()
+            for gram in query:
+                for candidate in self._index.get(gram, ()):
+                    shared[candidate] += 1
+
+            best, best_score = None, self.threshold
+            for candidate, common in shared.items():
+                if not self._same_author(key[1], candidate[1]) or volume_numbers(candidate[0]) != volumes:
+                    continue
+                score = common / (len(query) + len(self._grams[candidate]) - common)
+                if score >= best_score:
+                    best, best_score = candidate, score
+            if best is None:
+                return None
+            self._books.move_to_end(best)
+            return self._books[best]
+
+    def canonical(self, title: str, author: str) -> BookRecommendation:
+        """Resolve to a known book, or return this one as given.
+
+        Unknown titles are not registered: only books confirmed by a Gemini
+        answer are added (see add), so a misspelled query never becomes the
+        canonical spelling for everyone after it.
+        """
+        book = self.resolve(title, author)
+        if book is not None:
+            return book
+        return BookRecommendation(title.strip(), author.strip())
+
+    def _same_author(self, query: str, candidate: str) -> bool:
+        if query == candidate:
+            return True
+        grams = trigrams(query)
+        other = trigrams(candidate)
+        return len(grams & other) / len(grams | other) >= self.threshold
+
+    def known(self) -> List[BookRecommendation]:
+        with self._lock:
+            return list(self._books.values())
@@ -0,0 +1,79 @@
+from typing import Callable, List, Optional
+from models.book import BookRecommendation
+
+# Rough average for English/Polish text with Gemini's tokenizer
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate, good enough for budgeting prompts"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def book_line(book: BookRecommendation) -> str:
+    return f"- '{book.title}' by {book.author}"
+
+
+def select_history(read_books: List[BookRecommendation],
+                   budget_tokens: int,
+                   genre_of: Optional[Callable[[BookRecommendation], Optional[str]]] = None) -> List[BookRecommendation]:
+    """Pick a representative subset of a reading history that fits the budget.
+
+    The history is assumed to be in reading order (most recent last). Half of
+    the budget goes to the most recent books; the rest is spent on coverage,
+    one book per not-yet-represented genre (when genre_of knows it) and per
+    author, newest first, before topping up by recency. The selection keeps
+    the original order.
+    """
+    costs = [estimate_tokens(book_line(book)) + 1 for book in read_books]
+    if sum(costs) <= budget_tokens:
+        return list(read_books)
+
+    chosen = set()
+    spent = 0
+
+    def take(index: int) -> bool:
+        nonlocal spent
+        if index in chosen or spent + costs[index] > budget_tokens:
+            return False
+        chosen.add(index)
+        spent += costs[index]
+        return True
+
+    newest_first = range(len(read_books) - 1, -1, -1)
+
+    for index in newest_first:
+        if spent + costs[index] > budget_tokens // 2:
+            break
+        take(index)
+
+    def covered(key: Callable[[BookRecommendation], Optional[str]]) -> set:
+        return {key(read_books[index]) for index in chosen}
+
+    coverage_keys = []
+    if genre_of is not None:
+        coverage_keys.append(genre_of)
+    coverage_keys.append(lambda book: book.author.strip().lower())
+
+    for key in coverage_keys:
+        seen = covered(key)
+        for index in newest_first:
+            value = key(read_books[index])
+            if value and value not in seen and take(index):
+                seen.add(value)
+
+    for index in newest_first:
+        take(index)
+
+    return [read_books[index] for index in sorted(chosen)]
+
+
+def history_summary(read_books: List[BookRecommendation],
+                    budget_tokens: int,
+                    genre_of: Optional[Callable[[BookRecommendation], Optional[str]]] = None) -> str:
+    """Bulleted history for a prompt, trimmed to budget_tokens"""
+    selected = select_history(read_books, budget_tokens, genre_of)
+    summary = "\n".join(book_line(book) for book in selected)
+    if len(selected) < len(read_books):
+        summary += f"\n(a representative {len(selected)} of the {len(read_books)} books they have read)"
+    return summary
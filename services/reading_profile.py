@@ -0,0 +1,86 @@
+import re
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from constants.categories import BookGenres
+from constants.spice_level import BookSpiceScale
+from constants.tropes import BookTropes
+from .catalog import normalize_label
+
+GENRES = BookGenres.get_all()
+TROPES = BookTropes.get_all()
+SPICE_LEVELS = sorted(BookSpiceScale.SCALE)
+
+_GENRE_INDEX = {normalize_label(genre): i for i, genre in enumerate(GENRES)}
+_TROPE_INDEX = {normalize_label(trope): i for i, trope in enumerate(TROPES)}
+# Tags such as "slow burn romance" still count as the trope they name
+_TROPE_PATTERN = re.compile(r"\b(" + "|".join(map(re.escape, sorted(_TROPE_INDEX, key=len, reverse=True))) + r")\b")
+
+
+class BookFeatures:
+    """Per-book feature vector: one-hot genre, multi-hot tropes, spice level (-1 if unknown)"""
+
+    __slots__ = ("genre", "tropes", "spice_level")
+
+    def __init__(self, genre: Optional[str], tags: Sequence[str], spice_level: Optional[int]):
+        self.genre = np.zeros(len(GENRES), dtype=np.float32)
+        if genre and normalize_label(genre) in _GENRE_INDEX:
+            self.genre[_GENRE_INDEX[normalize_label(genre)]] = 1.0
+
+        self.tropes = np.zeros(len(TROPES), dtype=np.float32)
+        for tag in tags:
+            for match in _TROPE_PATTERN.finditer(normalize_label(tag)):
+                self.tropes[_TROPE_INDEX[match.group(1)]] = 1.0
+
+        self.spice_level = spice_level if BookSpiceScale.is_valid_level(spice_level) else -1
+
+
+def recency_weights(count: int) -> np.ndarray:
+    """Oldest book counts half as much as the most recent one"""
+    if count == 1:
+        return np.ones(1, dtype=np.float32)
+    return np.linspace(0.5, 1.0, count, dtype=np.float32)
+
+
+def _top_k(labels: List[str], scores: np.ndarray, k: int) -> List[str]:
+    order = np.argsort(-scores, kind="stable")[:k]
+    return [labels[i] for i in order if scores[i] > 0]
+
+
+def aggregate(features: List[BookFeatures], top_k: int = 3) -> dict:
+    """Reading profile from per-book features with vectorized weighted counts"""
+    if not features:
+        return {
+            "favorite_genres": [],
+            "frequent_tropes": [],
+            "spice_tolerance": "unknown",
+            "spice_distribution": {},
+        }
+
+    weights = recency_weights(len(features))
+    genre_matrix = np.stack([book.genre for book in features])
+    trope_matrix = np.stack([book.tropes for book in features])
+    spice = np.fromiter((book.spice_level for book in features), dtype=np.int64, count=len(features))
+
+    genre_scores = weights @ genre_matrix
+    trope_scores = weights @ trope_matrix
+
+    known = spice >= 0
+    spice_counts = np.bincount(spice[known], weights=weights[known], minlength=len(SPICE_LEVELS))
+    total = spice_counts.sum()
+    if total > 0:
+        distribution: Dict[str, float] = {
+            str(level): round(float(count / total), 4) for level, count in zip(SPICE_LEVELS, spice_counts)
+        }
+        favourite_level = int(np.argmax(spice_counts))
+        spice_tolerance = f"{favourite_level}: {BookSpiceScale.get_description(favourite_level)}"
+    else:
+        distribution, spice_tolerance = {}, "unknown"
+
+    return {
+        "favorite_genres": _top_k(GENRES, genre_scores, top_k),
+        "frequent_tropes": _top_k(TROPES, trope_scores, top_k),
+        "spice_tolerance": spice_tolerance,
+        "spice_distribution": distribution,
+    }
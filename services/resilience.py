@@ -0,0 +1,136 @@
+import os
+import random
+import sys
+import threading
+from collections import deque
+from typing import Callable, Optional
+
+# Timeouts, rate limiting and transient server errors
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether another attempt can reasonably succeed"""
+    status = getattr(error, "code", None) or getattr(error, "status_code", None)
+    if status in RETRYABLE_STATUS:
+        return True
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    # httpx is only imported once the Gemini client exists
+    httpx = sys.modules.get("httpx")
+    return httpx is not None and isinstance(error, httpx.TransportError)
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter: attempt n sleeps U(0, min(max_delay, base_delay * 2**n))"""
+
+    def __init__(self,
+                 max_attempts: int = 3,
+                 base_delay: float = 0.5,
+                 max_delay: float = 8.0,
+                 rng: Callable[[], float] = random.random):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rng = rng
+
+    @classmethod
+    def from_env(cls) -> "RetryPolicy":
+        return cls(max_attempts=int(os.environ.get("GEMINI_MAX_ATTEMPTS", 3)))
+
+    def delay(self, attempt: int) -> float:
+        return self.rng() * min(self.max_delay, self.base_delay * 2 ** attempt)
+
+
+class LatencyWindow:
+    """Most recent latencies in seconds, for percentiles"""
+
+    def __init__(self, size: int = 1024):
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=size)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._samples)
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def summary(self) -> dict:
+        p50, p99 = self.percentile(0.5), self.percentile(0.99)
+        return {
+            "samples": len(self),
+            "p50_ms": round(p50 * 1000, 2) if p50 is not None else None,
+            "p99_ms": round(p99 * 1000, 2) if p99 is not None else None,
+        }
+
+
+class HedgePolicy:
+    """When to send a duplicate of a slow call.
+
+    The hedge fires once the first attempt has run longer than the given
+    percentile of recent upstream latencies. Hedges are capped at
+    max_ratio of all calls, so a general slowdown cannot double the load.
+    """
+
+    def __init__(self,
+                 percentile: float = 0.95,
+                 min_samples: int = 50,
+                 max_ratio: float = 0.1,
+                 min_delay: float = 0.05):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.max_ratio = max_ratio
+        self.min_delay = min_delay
+
+    @classmethod
+    def from_env(cls) -> Optional["HedgePolicy"]:
+        """Hedging is opt-in: GEMINI_HEDGE_PERCENTILE=0.95 enables it"""
+        percentile = os.environ.get("GEMINI_HEDGE_PERCENTILE")
+        return cls(percentile=float(percentile)) if percentile else None
+
+    def delay(self, upstream: LatencyWindow) -> Optional[float]:
+        """Seconds to wait before hedging, or None while there is too little history"""
+        if len(upstream) < self.min_samples:
+            return None
+        return max(self.min_delay, upstream.percentile(self.percentile))
+
+
+class CallMetrics:
+    """Counters and latency windows of GeminiService calls.
+
+    upstream is the latency of single attempts; calls is what callers see
+    end to end, after retries and hedging.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.upstream = LatencyWindow()
+        self.calls = LatencyWindow()
+        self._counts = {"calls": 0, "attempts": 0, "retries": 0, "failures": 0, "hedges": 0, "hedge_wins": 0}
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self._counts[name] += 1
+
+    def may_hedge(self, max_ratio: float) -> bool:
+        with self._lock:
+            return self._counts["hedges"] < max_ratio * max(1, self._counts["calls"])
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self._counts)
+        counts["hedge_rate"] = round(counts["hedges"] / counts["calls"], 4) if counts["calls"] else 0.0
+        return {
+            **counts,
+            "upstream_latency": self.upstream.summary(),
+            "call_latency": self.calls.summary(),
+        }
@@ -0,0 +1,262 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+class ResponseCache:
+    """Two-tier cache (in-process LRU + SQLite) for parsed Gemini responses.
+
+    Keys are built from the method name, the model name and a hash of the
+    rendered prompt, so editing a prompt template or switching models
+    naturally invalidates previous entries. Last good responses of uncached
+    methods live in their own bounded store (set_fallback/get_fallback), so
+    one-off prompts never evict cached answers.
+    """
+
+    DAY = 24 * 60 * 60
+    DEFAULT_TTLS = {
+        "get_book_genre": 30 * DAY,
+        "get_book_spice_level": 30 * DAY,
+        "get_book_tags": 7 * DAY,
+        "get_similar_books": 7 * DAY,
+        "get_books_for_trope": 7 * DAY,
+    }
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self,
+                 max_entries: int = 2048,
+                 db_path: Optional[str] = None,
+                 max_disk_entries: int = 200_000,
+                 ttls: Optional[Dict[str, int]] = None,
+                 default_ttl: int = DAY,
+                 negative_ttl: int = 5 * 60,
+                 max_stale: int = 30 * DAY,
+                 max_fallbacks: int = 256,
+                 max_disk_fallbacks: int = 20_000):
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttls = {**self.DEFAULT_TTLS, **(ttls or {})}
+        self.default_ttl = default_ttl
+        self.negative_ttl = negative_ttl
+        self.max_stale = max_stale
+        self.max_fallbacks = max_fallbacks
+        self.max_disk_fallbacks = max_disk_fallbacks
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._fallbacks: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stale_hits": 0,
+            "sets": 0,
+            "negative_sets": 0,
+            "memory_evictions": 0,
+            "disk_evictions": 0,
+            "fallback_hits": 0,
+        }
+
+        self._db = None
+        self._disk_count = 0
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS fallbacks ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " stored_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS fallbacks_stored ON fallbacks (stored_at)")
+            self._db.commit()
+            self._disk_count = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    @classmethod
+    def default(cls) -> "ResponseCache":
+        """Process-wide cache shared by every BookService that is not given its own"""
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls(db_path=os.environ.get("BOOK_CACHE_PATH"))
+            return cls._default
+
+    @staticmethod
+    def make_key(method: str, model: str, prompt: str) -> str:
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return f"{method}:{model}:{digest}"
+
+    @staticmethod
+    def is_negative(value: Any) -> bool:
+        """Empty or 'Unknown' results are only cached for a short time"""
+        return value is None or value == "Unknown" or value == [] or value == {}
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Return (found, value); expired entries count as misses"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return True, value
+                # Expired entries stay until evicted, as stale fallbacks
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM entries WHERE key = ?", (key,)
+                ).fetchone()
+                if row and row[1] > now:
+                    self._db.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+                    self._db.commit()
+                    value = json.loads(row[0])
+                    self._remember(key, row[1], value)
+                    self._stats["disk_hits"] += 1
+                    return True, value
+
+            self._stats["misses"] += 1
+            return False, None
+
+    def get_stale(self, key: str) -> Tuple[bool, Any]:
+        """Return (found, value) for an entry expired less than max_stale ago; only real (non-negative) answers"""
+        oldest = time.time() - self.max_stale
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[0] > oldest and not self.is_negative(entry[1]):
+                self._stats["stale_hits"] += 1
+                return True, entry[1]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value FROM entries WHERE key = ? AND expires_at > ?", (key, oldest)
+                ).fetchone()
+                if row:
+                    value = json.loads(row[0])
+                    if not self.is_negative(value):
+                        self._stats["stale_hits"] += 1
+                        return True, value
+            return False, None
+
+    def set(self, key: str, value: Any, method: str) -> None:
+        negative = self.is_negative(value)
+        ttl = self.negative_ttl if negative else self.ttls.get(method, self.default_ttl)
+        now = time.time()
+        expires_at = now + ttl
+        with self._lock:
+            self._remember(key, expires_at, value)
+            self._stats["sets"] += 1
+            if negative:
+                self._stats["negative_sets"] += 1
+
+            if self._db is not None:
+                exists = self._db.execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone()
+                self._db.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value), expires_at, now),
+                )
+                if not exists:
+                    self._disk_count += 1
+                self._evict_disk(now)
+                self._db.commit()
+
+    def set_fallback(self, key: str, value: Any) -> None:
+        """Keep the last good response to a prompt, outside the cache's own LRU and TTLs"""
+        now = time.time()
+        with self._lock:
+            self._fallbacks[key] = (now, value)
+            self._fallbacks.move_to_end(key)
+            while len(self._fallbacks) > self.max_fallbacks:
+                self._fallbacks.popitem(last=False)
+
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO fallbacks (key, value, stored_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), now),
+                )
+                self._db.execute(
+                    "DELETE FROM fallbacks WHERE key IN"
+                    " (SELECT key FROM fallbacks ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_disk_fallbacks,),
+                )
+                self._db.commit()
+
+    def get_fallback(self, key: str) -> Tuple[bool, Any]:
+        """Return (found, value) for a response stored less than max_stale ago"""
+        oldest = time.time() - self.max_stale
+        with self._lock:
+            entry = self._fallbacks.get(key)
+            if entry is not None and entry[0] > oldest:
+                self._fallbacks.move_to_end(key)
+                self._stats["fallback_hits"] += 1
+                return True, entry[1]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value FROM fallbacks WHERE key = ? AND stored_at > ?", (key, oldest)
+                ).fetchone()
+                if row:
+                    self._stats["fallback_hits"] += 1
+                    return True, json.loads(row[0])
+            return False, None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._fallbacks.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM entries")
+                self._db.execute("DELETE FROM fallbacks")
+                self._db.commit()
+                self._disk_count = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._stats["memory_hits"] + self._stats["disk_hits"] + self._stats["misses"]
+            hits = lookups - self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "fallback_entries": len(self._fallbacks),
+                "disk_entries": self._disk_count,
+                "disk_enabled": self._db is not None,
+            }
+
+    def _remember(self, key: str, expires_at: float, value: Any) -> None:
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats["memory_evictions"] += 1
+
+    def _evict_disk(self, now: float) -> None:
+        if self._disk_count <= self.max_disk_entries:
+            return
+        # Drop expired rows first, then the least recently used ones
+        self._db.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+        remaining = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        overflow = remaining - self.max_disk_entries
+        if overflow > 0:
+            self._db.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY accessed_at LIMIT ?)",
+                (overflow,),
+            )
+            remaining -= overflow
+        self._stats["disk_evictions"] += self._disk_count - remaining
+        self._disk_count = remaining
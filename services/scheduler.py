@@ -0,0 +1,253 @@
+import contextvars
+import functools
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Iterator, List, Optional
+from . import deadline
+from .timing import span
+
+
+class Priority:
+    """Scheduling classes; lower values are admitted first"""
+    INTERACTIVE = 0
+    BULK = 1
+
+    NAMES = {INTERACTIVE: "interactive", BULK: "bulk"}
+
+
+_current_priority: contextvars.ContextVar[int] = contextvars.ContextVar("gemini_priority", default=Priority.INTERACTIVE)
+
+
+def current_priority() -> int:
+    return _current_priority.get()
+
+
+@contextmanager
+def priority(level: int) -> Iterator[None]:
+    """Run the Gemini calls made inside the block with the given priority"""
+    token = _current_priority.set(level)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def bulk(method: Callable) -> Callable:
+    """Decorator for heavy service methods whose calls must not delay interactive lookups"""
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        with priority(Priority.BULK):
+            return method(*args, **kwargs)
+    return wrapper
+
+
+class TokenBucket:
+    """Refills continuously at rate_per_minute, holding at most capacity"""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None, now: float = 0.0):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.updated = now
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until amount can be taken (0 if it can be taken now)"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+    def give_back(self, amount: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class Ticket:
+    """An admitted call; release() frees its concurrency slot"""
+
+    def __init__(self, scheduler: "GeminiScheduler", level: int, tokens: int):
+        self.scheduler = scheduler
+        self.priority = level
+        self.tokens = tokens
+        self.enqueued = scheduler.clock()
+        self.released = False
+
+    def settle(self, actual_tokens: int) -> None:
+        """Correct the token bucket once the real usage is known"""
+        self.scheduler._settle(self.tokens, actual_tokens)
+        self.tokens = actual_tokens
+
+    def release(self) -> None:
+        if not self.released:
+            self.released = True
+            self.scheduler._release()
+
+
+class GeminiScheduler:
+    """Admission control for upstream Gemini calls.
+
+    Calls wait in a priority queue (interactive before bulk, FIFO within a
+    class). Only the head of the queue is admitted, once a concurrency slot
+    is free and both the requests-per-minute and tokens-per-minute buckets
+    can pay for it, so the quota is spent smoothly instead of in bursts
+    that end in 429s. An upstream 429 pauses admission for everyone.
+    """
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    SAMPLES = 1024
+    RATE_LIMIT_PAUSE = 5.0
+
+    def __init__(self,
+                 requests_per_minute: float = 1000,
+                 tokens_per_minute: float = 1_000_000,
+                 max_concurrency: int = 16,
+                 clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self.max_concurrency = max_concurrency
+        self._cond = threading.Condition()
+        self._requests = TokenBucket(requests_per_minute, now=clock())
+        self._tokens = TokenBucket(tokens_per_minute, now=clock())
+        self._queue: List = []
+        self._sequence = itertools.count()
+        self._active = 0
+        self._paused_until = 0.0
+        self._queue_times: Dict[int, Deque[float]] = {level: deque(maxlen=self.SAMPLES) for level in Priority.NAMES}
+        self._stats = {"admitted": 0, "throttled": 0, "upstream_rate_limited": 0, "deadline_exceeded": 0}
+
+    @classmethod
+    def default(cls) -> "GeminiScheduler":
+        """Process-wide scheduler shared by every GeminiService that is not given its own"""
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls(
+                    requests_per_minute=float(os.environ.get("GEMINI_RPM", 1000)),
+                    tokens_per_minute=float(os.environ.get("GEMINI_TPM", 1_000_000)),
+                    max_concurrency=int(os.environ.get("GEMINI_MAX_CONCURRENCY", 16)),
+                )
+            return cls._default
+
+    def acquire(self, tokens: int, level: Optional[int] = None) -> Ticket:
+        """Block until the call may go upstream.
+
+        Raises DeadlineExceeded if the request deadline passes while queued.
+        """
+        ticket = Ticket(self, current_priority() if level is None else level, tokens)
+        with span("queue"), self._cond:
+            entry = (ticket.priority, next(self._sequence), ticket)
+            heapq.heappush(self._queue, entry)
+            throttled = False
+            while True:
+                timeout = self._admission_delay(entry)
+                if timeout is not None and timeout <= 0:
+                    break
+                throttled = throttled or timeout is not None
+                self._cond.wait(self._wait_timeout(entry, timeout))
+            self._admit(ticket, throttled)
+        return ticket
+
+    def _admission_delay(self, entry) -> Optional[float]:
+        """Seconds until a queued entry can be admitted; None while it is not its turn"""
+        if self._queue[0] is not entry or self._active >= self.max_concurrency:
+            return None
+        now = self.clock()
+        return max(self._paused_until - now,
+                   self._requests.wait_time(1, now),
+                   self._tokens.wait_time(entry[2].tokens, now))
+
+    def _wait_timeout(self, entry, timeout: Optional[float]) -> Optional[float]:
+        """Bound a wait by the request deadline, leaving the queue once it has passed"""
+        left = deadline.remaining()
+        if left is None:
+            return timeout
+        if left <= 0:
+            self._dequeue(entry)
+            self._stats["deadline_exceeded"] += 1
+            raise deadline.DeadlineExceeded()
+        return left if timeout is None else min(timeout, left)
+
+    def _dequeue(self, entry) -> None:
+        self._queue.remove(entry)
+        heapq.heapify(self._queue)
+        self._cond.notify_all()
+
+    def _admit(self, ticket: Ticket, throttled: bool) -> None:
+        heapq.heappop(self._queue)
+        self._requests.take(1)
+        self._tokens.take(ticket.tokens)
+        self._active += 1
+        self._stats["admitted"] += 1
+        self._stats["throttled"] += throttled
+        self._queue_times[ticket.priority].append(self.clock() - ticket.enqueued)
+        # The next caller in line may be admissible too
+        self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, tokens: int, level: Optional[int] = None) -> Iterator[Ticket]:
+        ticket = self.acquire(tokens, level)
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+
+    def _release(self) -> None:
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    def _settle(self, reserved: int, actual: int) -> None:
+        with self._cond:
+            if actual < reserved:
+                self._tokens.give_back(reserved - actual)
+            else:
+                self._tokens.take(actual - reserved)
+            self._cond.notify_all()
+
+    def rate_limited(self, retry_after: Optional[float] = None) -> None:
+        """Upstream answered 429: hold back every queued call for a while"""
+        with self._cond:
+            self._stats["upstream_rate_limited"] += 1
+            pause = retry_after if retry_after is not None else self.RATE_LIMIT_PAUSE
+            self._paused_until = max(self._paused_until, self.clock() + pause)
+            self._cond.notify_all()
+
+    @staticmethod
+    def _percentile(samples: List[float], fraction: float) -> float:
+        if not samples:
+            return 0.0
+        return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+    def stats(self) -> dict:
+        with self._cond:
+            queued = {name: 0 for name in Priority.NAMES.values()}
+            for level, _, _ in self._queue:
+                queued[Priority.NAMES[level]] += 1
+            queue_time = {}
+            for level, samples in self._queue_times.items():
+                ordered = sorted(samples)
+                queue_time[Priority.NAMES[level]] = {
+                    "p50_ms": round(self._percentile(ordered, 0.5) * 1000, 2),
+                    "p99_ms": round(self._percentile(ordered, 0.99) * 1000, 2),
+                    "max_ms": round((ordered[-1] if ordered else 0.0) * 1000, 2),
+                }
+            return {
+                **self._stats,
+                "active": self._active,
+                "queued": queued,
+                "queue_time": queue_time,
+                "requests_available": round(self._requests.tokens, 2),
+                "tokens_available": round(self._tokens.tokens),
+            }
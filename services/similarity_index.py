@@ -0,0 +1,260 @@
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from models.book import BookRecommendation
+from .catalog import normalize_label
+from .normalization import BookKey, book_key
+
+GENRE_WEIGHT = 1.5
+TAG_WEIGHT = 1.0
+SPICE_WEIGHT = 0.5
+
+
+def book_terms(genre: Optional[str] = None,
+               spice_level: Optional[int] = None,
+               tags: Iterable[str] = ()) -> Dict[str, float]:
+    """Weighted feature terms of a book; neighbouring spice levels count half"""
+    terms: Dict[str, float] = {}
+    if genre and genre != "Unknown":
+        terms[f"genre:{normalize_label(genre)}"] = GENRE_WEIGHT
+    if isinstance(spice_level, int):
+        terms[f"spice:{spice_level}"] = SPICE_WEIGHT
+        for neighbour in (spice_level - 1, spice_level + 1):
+            terms.setdefault(f"spice:{neighbour}", SPICE_WEIGHT / 2)
+    for tag in tags:
+        terms[f"tag:{normalize_label(tag)}"] = TAG_WEIGHT
+    return terms
+
+
+def descriptive_terms(terms: Dict[str, float]) -> int:
+    """Genre and tag terms; spice alone says nothing about what a book is like"""
+    return sum(1 for term in terms if not term.startswith("spice:"))
+
+
+class SimilarityIndex:
+    """Top-k cosine similarity over hashed book feature vectors.
+
+    Every indexed book is a row of an L2-normalized float32 matrix built with
+    the signed hashing trick from its genre, tags/tropes and spice level, so
+    a batch of queries is one matrix product. Past lsh_threshold books,
+    queries only score candidates sharing a random-hyperplane bucket in at
+    least one of the LSH tables. Only genre and tag terms count towards
+    MIN_TERMS, and books known only by their spice level are never returned
+    as neighbours. The least recently recorded or queried books are
+    forgotten past max_books.
+    """
+
+    MIN_TERMS = 3
+
+    def __init__(self,
+                 dim: int = 256,
+                 lsh_threshold: int = 100_000,
+                 lsh_tables: int = 8,
+                 lsh_bits: int = 12,
+                 seed: int = 0,
+                 max_books: int = 100_000):
+        self.dim = dim
+        self.lsh_threshold = lsh_threshold
+        self.max_books = max_books
+        self._lock = threading.Lock()
+        self._matrix = np.zeros((1024, dim), dtype=np.float32)
+        self._described = np.zeros(1024, dtype=bool)
+        self._rows: Dict[BookKey, int] = {}
+        self._books: List[BookRecommendation] = []
+        self._terms: List[Dict[str, float]] = []
+        self._keys: List[BookKey] = []
+        self._recency: "OrderedDict[BookKey, None]" = OrderedDict()
+
+        rng = np.random.default_rng(seed)
+        self._planes = rng.standard_normal((lsh_tables, dim, lsh_bits)).astype(np.float32)
+        self._bit_values = (1 << np.arange(lsh_bits)).astype(np.int64)
+        self._buckets: Optional[List[Dict[int, set]]] = None
+        self._codes: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._books)
+
+    def _vector(self, terms: Dict[str, float]) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for term, weight in terms.items():
+            digest = zlib.crc32(term.encode("utf-8"))
+            vector[digest % self.dim] += weight if digest & 0x80000000 else -weight
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def record(self,
+               book: BookRecommendation,
+               genre: Optional[str] = None,
+               spice_level: Optional[int] = None,
+               tags: Iterable[str] = ()) -> None:
+        """Merge newly learned features of a book into its vector"""
+        new_terms = book_terms(genre, spice_level, tags)
+        if not new_terms or not book.title or book.author == "Unknown":
+            return
+        key = book_key(book.title, book.author)
+        with self._lock:
+            row = self._rows.get(key)
+            if row is None:
+                while len(self._books) >= self.max_books:
+                    self._forget(next(iter(self._recency)))
+                row = len(self._books)
+                self._grow(row + 1)
+                self._rows[key] = row
+                self._books.append(BookRecommendation(book.title.strip(), book.author.strip()))
+                self._terms.append({})
+                self._keys.append(key)
+            self._recency[key] = None
+            self._recency.move_to_end(key)
+
+            terms = self._terms[row]
+            if isinstance(spice_level, int):
+                # A new rating replaces the old one instead of blending with it
+                for term in [term for term in terms if term.startswith("spice:")]:
+                    del terms[term]
+            terms.update(new_terms)
+            self._matrix[row] = self._vector(terms)
+            self._described[row] = descriptive_terms(terms) > 0
+
+            if self._buckets is not None:
+                self._rehash(row)
+            elif len(self._books) >= self.lsh_threshold:
+                self._build_lsh()
+
+    def contains(self, title: str, author: str) -> bool:
+        """Whether a book has enough features to be queried locally"""
+        with self._lock:
+            row = self._rows.get(book_key(title, author))
+            return row is not None and descriptive_terms(self._terms[row]) >= self.MIN_TERMS
+
+    def most_similar(self, title: str, author: str, k: int = 3) -> List[Tuple[BookRecommendation, float]]:
+        return self.most_similar_batch([BookRecommendation(title, author)], k)[0]
+
+    def most_similar_batch(self,
+                           books: List[BookRecommendation],
+                           k: int = 3) -> List[List[Tuple[BookRecommendation, float]]]:
+        """Top-k (book, cosine similarity) for each query book, best first.
+
+        Books that are not indexed get an empty list.
+        """
+        with self._lock:
+            keys = [book_key(book.title, book.author) for book in books]
+            rows = [self._rows.get(key) for key in keys]
+            for key, row in zip(keys, rows):
+                if row is not None:
+                    self._recency.move_to_end(key)
+            size = len(self._books)
+            results: List[List[Tuple[BookRecommendation, float]]] = [[] for _ in books]
+            indexed = [(i, row) for i, row in enumerate(rows) if row is not None]
+            if not indexed or size < 2:
+                return results
+
+            matrix = self._matrix[:size]
+            if self._buckets is None:
+                queries = matrix[[row for _, row in indexed]]
+                scores = queries @ matrix.T
+                for (i, row), row_scores in zip(indexed, scores):
+                    results[i] = self._top_k(np.arange(size), row_scores, row, k)
+            else:
+                for i, row in indexed:
+                    candidates = self._candidates(row)
+                    if len(candidates) <= k:
+                        candidates = np.arange(size)
+                    results[i] = self._top_k(candidates, matrix[candidates] @ matrix[row], row, k)
+            return results
+
+    def _top_k(self, candidates: np.ndarray, scores: np.ndarray, row: int, k: int) -> List[Tuple[BookRecommendation, float]]:
+        scores = np.where((candidates == row) | ~self._described[candidates], -np.inf, scores)
+        limit = min(k, len(candidates) - 1)
+        if limit <= 0:
+            return []
+        best = np.argpartition(-scores, limit - 1)[:limit]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [(self._books[candidates[i]], round(float(scores[i]), 4)) for i in best if scores[i] > 0]
+
+    def _forget(self, key: BookKey) -> None:
+        """Drop a book, moving the last row into its place"""
+        row, last = self._rows.pop(key), len(self._books) - 1
+        del self._recency[key]
+        if self._buckets is not None:
+            for table, buckets in enumerate(self._buckets):
+                for moved in {row, last}:
+                    code = int(self._codes[table, moved])
+                    if code != -1 and code in buckets:
+                        buckets[code].discard(moved)
+                        if not buckets[code]:
+                            del buckets[code]
+                if row != last:
+                    code = int(self._codes[table, last])
+                    if code != -1:
+                        buckets.setdefault(code, set()).add(row)
+                self._codes[table, row] = self._codes[table, last]
+                self._codes[table, last] = -1
+        if row != last:
+            self._matrix[row] = self._matrix[last]
+            self._described[row] = self._described[last]
+            self._books[row] = self._books[last]
+            self._terms[row] = self._terms[last]
+            self._keys[row] = self._keys[last]
+            self._rows[self._keys[row]] = row
+        self._matrix[last] = 0
+        self._described[last] = False
+        self._books.pop()
+        self._terms.pop()
+        self._keys.pop()
+
+    def _grow(self, size: int) -> None:
+        if size > len(self._matrix):
+            grown = np.zeros((max(size, 2 * len(self._matrix)), self.dim), dtype=np.float32)
+            grown[:len(self._matrix)] = self._matrix
+            self._matrix = grown
+            described = np.zeros(len(grown), dtype=bool)
+            described[:len(self._described)] = self._described
+            self._described = described
+
+    def _signatures(self, vectors: np.ndarray) -> np.ndarray:
+        """LSH code of each vector in each table, shape (tables, n)"""
+        bits = np.einsum("nd,tdb->tnb", vectors, self._planes) > 0
+        return bits.astype(np.int64) @ self._bit_values
+
+    def _build_lsh(self) -> None:
+        size = len(self._books)
+        self._codes = self._signatures(self._matrix[:size])
+        self._buckets = []
+        for table_codes in self._codes:
+            buckets: Dict[int, set] = {}
+            for row, code in enumerate(table_codes.tolist()):
+                buckets.setdefault(code, set()).add(row)
+            self._buckets.append(buckets)
+
+    def _rehash(self, row: int) -> None:
+        codes = self._signatures(self._matrix[row:row + 1])[:, 0]
+        if row >= self._codes.shape[1]:
+            grown = np.zeros((self._codes.shape[0], max(row + 1, 2 * self._codes.shape[1])), dtype=np.int64)
+            grown[:, :self._codes.shape[1]] = self._codes
+            grown[:, self._codes.shape[1]:] = -1
+            self._codes = grown
+        for table, (buckets, code) in enumerate(zip(self._buckets, codes.tolist())):
+            old = int(self._codes[table, row])
+            if old != -1 and old in buckets:
+                buckets[old].discard(row)
+            buckets.setdefault(code, set()).add(row)
+            self._codes[table, row] = code
+
+    def _candidates(self, row: int) -> np.ndarray:
+        candidates = set()
+        for table, buckets in enumerate(self._buckets):
+            candidates |= buckets.get(int(self._codes[table, row]), set())
+        return np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "books": len(self._books),
+                "queryable_books": sum(1 for terms in self._terms if descriptive_terms(terms) >= self.MIN_TERMS),
+                "approximate": self._buckets is not None,
+            }
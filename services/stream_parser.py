@@ -0,0 +1,78 @@
+import json
+from typing import Iterator
+
+
+class JsonArrayStreamParser:
+    """Incrementally pull string items out of a JSON array while it streams in.
+
+    Feed raw text chunks as they arrive; every string element of the array
+    under ``key`` is yielded as soon as its closing quote has been seen,
+    without waiting for the rest of the document.
+    """
+
+    def __init__(self, key: str = "recommendations"):
+        self._marker = f'"{key}"'
+        self._buffer = ""
+        self._pos = 0
+        self._in_array = False
+        self._done = False
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    def feed(self, chunk: str) -> Iterator[str]:
+        self._buffer += chunk
+        while not self._done:
+            if not self._in_array:
+                if not self._enter_array():
+                    return
+                continue
+
+            item = self._next_item()
+            if item is None:
+                return
+            yield item
+
+    def _enter_array(self) -> bool:
+        marker = self._buffer.find(self._marker, self._pos)
+        if marker == -1:
+            # Keep a tail in case the key is split across chunks
+            self._pos = max(self._pos, len(self._buffer) - len(self._marker))
+            return False
+        bracket = self._buffer.find("[", marker + len(self._marker))
+        if bracket == -1:
+            return False
+        self._pos = bracket + 1
+        self._in_array = True
+        return True
+
+    def _next_item(self):
+        buffer = self._buffer
+        pos = self._pos
+        while pos < len(buffer) and buffer[pos] != '"':
+            if buffer[pos] == "]":
+                self._done = True
+                self._pos = pos + 1
+                return None
+            # Separators, whitespace and non-string elements are skipped
+            pos += 1
+        if pos >= len(buffer):
+            self._pos = pos
+            return None
+
+        end = pos + 1
+        while end < len(buffer):
+            if buffer[end] == "\\":
+                end += 2
+                continue
+            if buffer[end] == '"':
+                self._pos = end + 1
+                try:
+                    return json.loads(buffer[pos:end + 1])
+                except json.JSONDecodeError:
+                    return buffer[pos + 1:end]
+            end += 1
+        # String not finished yet; wait for the next chunk
+        self._pos = pos
+        return None
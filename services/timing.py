@@ -0,0 +1,88 @@
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+
+class SpanRecorder:
+    """Time spent in named phases of one request.
+
+    Spans with the same name are summed. Spans recorded by pool threads
+    that run in a copy of the request context land here too, so phases
+    running in parallel can add up to more than the request's wall time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._spans: Dict[str, List[float]] = {}
+        self.started = time.perf_counter()
+
+    def add(self, name: str, seconds: float) -> None:
+        with self._lock:
+            total = self._spans.setdefault(name, [0.0, 0])
+            total[0] += seconds
+            total[1] += 1
+
+    def spans(self) -> List[Tuple[str, float, int]]:
+        """(name, seconds, count) in the order the phases first occurred"""
+        with self._lock:
+            return [(name, seconds, count) for name, (seconds, count) in self._spans.items()]
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+
+# Recorder of the current request; the object is shared with copied contexts
+_recorder: contextvars.ContextVar[Optional[SpanRecorder]] = contextvars.ContextVar("span_recorder", default=None)
+
+
+def begin_request() -> Tuple[SpanRecorder, contextvars.Token]:
+    recorder = SpanRecorder()
+    return recorder, _recorder.set(recorder)
+
+
+def end_request(token: contextvars.Token) -> None:
+    _recorder.reset(token)
+
+
+def current_recorder() -> Optional[SpanRecorder]:
+    return _recorder.get()
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Add the time spent in the block to the current request's `name` phase"""
+    recorder = _recorder.get()
+    if recorder is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder.add(name, time.perf_counter() - started)
+
+
+def timed(name: str) -> Callable[[Callable], Callable]:
+    """Decorator form of span()"""
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def server_timing(recorder: SpanRecorder) -> str:
+    """Server-Timing header value: one entry per phase plus the total, in milliseconds"""
+    entries = []
+    for name, seconds, count in recorder.spans():
+        entry = f"{name};dur={seconds * 1000:.1f}"
+        if count > 1:
+            entry += f';desc="{count}x"'
+        entries.append(entry)
+    entries.append(f"total;dur={recorder.elapsed() * 1000:.1f}")
+    return ", ".join(entries)
@@ -1,6 +1,10 @@
+import json
 
 import pytest
-from main import app
+from unittest.mock import Mock
+from main import app, create_app
+from models.book import BookRecommendation
+from services import deadline
 
 @pytest.fixture
 def client():
@@ -23,4 +27,98 @@ def test_invalid_book_genre(client):
 
     response = client.post('/api/book/genre', json={'title': 'Dune'}) 
     assert response.status_code == 400
-    assert 'error' in response.get_json()
\ No newline at end of file
+    assert 'error' in response.get_json()
+
+def test_batch_genre_requires_books(client):
+    response = client.post('/api/books/batch/genre', json={'books': [{'title': 'Dune'}]})
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_create_app_injects_shared_service():
+    service = Mock()
+    service.get_book_genre.return_value = "fantasy"
+
+    test_app = create_app(service)
+    response = test_app.test_client().get('/api/book/genre/Dune/Frank%20Herbert')
+
+    assert response.json['genre'] == "fantasy"
+    service.get_book_genre.assert_called_once_with("Dune", "Frank Herbert")
+
+
+def test_by_trope_streams_ndjson():
+    service = Mock()
+    service.stream_books_for_trope.return_value = iter([
+        BookRecommendation("Dune", "Frank Herbert"),
+        BookRecommendation("Foundation", "Isaac Asimov"),
+    ])
+
+    response = create_app(service).test_client().get('/api/books/by-trope/chosen%20one?stream=ndjson')
+
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.get_data(as_text=True).splitlines() == [
+        '{"title": "Dune", "author": "Frank Herbert"}',
+        '{"title": "Foundation", "author": "Isaac Asimov"}',
+    ]
+
+
+def test_history_streams_sse():
+    service = Mock()
+    service.stream_recommendations_from_history.return_value = iter([BookRecommendation("Dune", "Frank Herbert")])
+
+    response = create_app(service).test_client().post(
+        '/api/recommendations/history',
+        json={'read_books': [{'title': 'Hyperion', 'author': 'Dan Simmons'}]},
+        headers={'Accept': 'text/event-stream'}
+    )
+
+    body = response.get_data(as_text=True)
+    assert response.mimetype == 'text/event-stream'
+    assert body.startswith('event: book\ndata: {"title": "Dune"')
+    assert body.endswith('event: done\ndata: {}\n\n')
+
+
+def test_stream_that_fails_midway_ends_with_an_error_event():
+    service = Mock()
+    def books(*args):
+        yield BookRecommendation("Dune", "Frank Herbert")
+        deadline.mark_degraded("upstream_error")
+    service.stream_recommendations_from_history.side_effect = books
+
+    response = create_app(service).test_client().post(
+        '/api/recommendations/history',
+        json={'read_books': [{'title': 'Hyperion', 'author': 'Dan Simmons'}]},
+        headers={'Accept': 'text/event-stream'}
+    )
+
+    body = response.get_data(as_text=True)
+    assert 'event: done' not in body
+    assert body.endswith('event: error\ndata: {"error": "Incomplete answer", "degraded": true, '
+                         '"degraded_reasons": ["upstream_error"]}\n\n')
+
+
+def test_ndjson_stream_that_raises_ends_with_an_error_line():
+    service = Mock()
+    def books(*args):
+        yield BookRecommendation("Dune", "Frank Herbert")
+        raise RuntimeError("connection reset")
+    service.stream_books_for_trope.side_effect = books
+
+    response = create_app(service).test_client().get('/api/books/by-trope/heist?stream=ndjson')
+
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert lines[0]["title"] == "Dune"
+    assert lines[-1]["degraded_reasons"] == ["error"]
+
+
+def test_similar_books_takes_k():
+    service = Mock()
+    service.get_similar_books.return_value = [BookRecommendation("Foundation", "Isaac Asimov")]
+
+    with create_app(service).test_client() as client:
+        response = client.get('/api/book/similar/Dune/Frank%20Herbert?k=5')
+        invalid = client.post('/api/book/similar', json={'title': 'Dune', 'author': 'Frank Herbert', 'k': 0})
+
+    assert response.status_code == 200
+    service.get_similar_books.assert_called_once_with("Dune", "Frank Herbert", 5)
+    assert invalid.status_code == 400
@@ -2,12 +2,13 @@ import pytest
 from unittest.mock import Mock, patch
 from services.book_service import BookService
 from models.book import BookRecommendation
+from services.response_cache import ResponseCache
 
 class TestBookService:
     
     @pytest.fixture
     def book_service(self):
-        return BookService()
+        return BookService(cache=ResponseCache())
     
     @pytest.fixture
     def mock_gemini_response(self):
@@ -145,4 +146,92 @@ class TestBookService:
         
         # Assert
         assert len(result) == 1
-        assert result[0].title == "The Hobbit"
\ No newline at end of file
+        assert result[0].title == "The Hobbit"
+
+    def test_get_books_genre_batch_packs_books_into_chunks(self):
+        # Arrange
+        service = BookService(cache=ResponseCache())
+        service.BATCH_CHUNK_SIZE = 2
+        books = [BookRecommendation(f"Book {i}", "Author") for i in range(3)]
+        service.gemini._generate_content = Mock(side_effect=[
+            '{"results": [{"index": 1, "genre": "fantasy"}, {"index": 2, "genre": "horror"}]}',
+            '```json\n{"results": [{"index": 1, "genre": "poezja"}]}\n```',
+        ])
+
+        # Act
+        result = service.get_books_genre_batch(books)
+
+        # Assert
+        assert [item["genre"] for item in result] == ["fantasy", "horror", "poezja"]
+        assert service.gemini._generate_content.call_count == 2
+        assert service.get_book_genre("Book 1", "Author") == "horror"
+
+    def test_get_books_spice_level_batch_reports_missing_items(self):
+        # Arrange
+        service = BookService(cache=ResponseCache())
+        books = [BookRecommendation("Dune", "Frank Herbert"), BookRecommendation("Fifty Shades", "E.L. James")]
+        service.gemini._generate_content = Mock(
+            return_value='{"results": [{"index": 2, "spice_level": 4, "content_warnings": ["explicit"]}]}'
+        )
+
+        # Act
+        result = service.get_books_spice_level_batch(books)
+
+        # Assert
+        assert "error" in result[0]
+        assert result[1]["spice_level"] == 4
+        assert result[1]["content_warnings"] == ["explicit"]
+
+    def test_get_book_profile_single_call(self):
+        # Arrange
+        service = BookService(cache=ResponseCache())
+        service.gemini._generate_content = Mock(return_value='''{
+            "genre": "science fiction",
+            "spice_level": 1,
+            "content_warnings": ["violence"],
+            "tags": ["desert planet", "chosen one"],
+            "similar_books": ["Foundation by Isaac Asimov"]
+        }''')
+
+        # Act
+        result = service.get_book_profile("Dune", "Frank Herbert", 2)
+
+        # Assert
+        service.gemini._generate_content.assert_called_once()
+        assert result["genre"] == "science fiction"
+        assert result["spice_level"] == 1
+        assert result["similar_books"][0].title == "Foundation"
+        assert service.get_book_tags("Dune", "Frank Herbert", 2) == ["desert planet", "chosen one"]
+
+    def test_get_book_profile_falls_back_for_missing_fields(self):
+        # Arrange
+        service = BookService(cache=ResponseCache())
+        responses = {
+            "provide:": '{"genre": "fantasy", "spice_level": 0, "content_warnings": []}',
+            "tags/tropes": '{"tags": ["found family"]}',
+            "similar in genre": '{"recommendations": ["Eragon by Christopher Paolini"]}',
+        }
+        def generate(prompt):
+            return next(text for marker, text in responses.items() if marker in prompt)
+        service.gemini._generate_content = Mock(side_effect=generate)
+
+        # Act
+        result = service.get_book_profile("The Hobbit", "J.R.R. Tolkien", 1)
+
+        # Assert
+        assert service.gemini._generate_content.call_count == 3
+        assert result["tags"] == ["found family"]
+        assert result["similar_books"][0].author == "Christopher Paolini"
+
+    def test_stream_books_for_trope_yields_books(self, book_service):
+        # Arrange
+        book_service.gemini._generate_content_stream = Mock(return_value=iter([
+            '{"recommendations": ["Pride and Prejudice by Jane',
+            ' Austen", "The Hating Game by Sally Thorne"]}',
+        ]))
+
+        # Act
+        result = list(book_service.stream_books_for_trope("enemies to lovers", count=2))
+
+        # Assert
+        assert [book.author for book in result] == ["Jane Austen", "Sally Thorne"]
@@ -0,0 +1,82 @@
+import json
+from unittest.mock import Mock
+from constants.tropes import BookTropes
+from models.book import BookRecommendation
+from services.book_service import BookService
+from services.cache_warmer import CacheWarmer, Checkpoint, WarmTask, book_tasks, trope_tasks
+from services.gemini_service import GeminiService
+from services.resilience import RetryPolicy
+from services.response_cache import ResponseCache
+from services.scheduler import GeminiScheduler
+from services.single_flight import SingleFlight
+
+TROPE_RESPONSE = json.dumps({"recommendations": [f"Book {i} by Author {i}" for i in range(5)]})
+
+
+def _gemini(call_model):
+    gemini = GeminiService(single_flight=SingleFlight(), client=Mock(), scheduler=GeminiScheduler(),
+                           retry=RetryPolicy(max_attempts=1))
+    gemini._call_model = call_model
+    return gemini
+
+
+def test_trope_tasks_cover_every_genre_and_count():
+    tasks = list(trope_tasks(counts=(3, 5), genres=["fantasy", "romance"]))
+
+    assert WarmTask("trope", ("found family", 3, None)) in tasks
+    assert WarmTask("trope", ("found family", 5, "romance")) in tasks
+    assert len({task.id for task in tasks}) == len(tasks) == len(BookTropes.get_all()) * 2 * 3
+
+
+def test_warmed_trope_answers_are_served_from_the_shared_cache(tmp_path):
+    cache = ResponseCache(db_path=str(tmp_path / "cache.db"))
+    warmer = CacheWarmer.for_cache(cache, gemini=_gemini(Mock(return_value=TROPE_RESPONSE)),
+                                   checkpoint=Checkpoint(str(tmp_path / "checkpoint.jsonl")))
+
+    stats = warmer.run([WarmTask("trope", ("found family", 5, "fantasy"))])
+
+    serving = BookService(cache=ResponseCache(db_path=str(tmp_path / "cache.db")),
+                          gemini=_gemini(Mock(side_effect=AssertionError("Gemini must not be called"))))
+    assert stats["ok"] == 1
+    assert serving.get_books_for_trope("Found-Family", 5, "Fantasy")[0] == BookRecommendation("Book 0", "Author 0")
+
+
+def test_interrupted_run_resumes_from_the_checkpoint(tmp_path):
+    checkpoint = str(tmp_path / "checkpoint.jsonl")
+    call_model = Mock(return_value='{"genre": "fantasy"}')
+    tasks = list(book_tasks([BookRecommendation("Dune", "Frank Herbert"),
+                             BookRecommendation("Hyperion", "Dan Simmons")], ["genre"]))
+
+    CacheWarmer.for_cache(ResponseCache(), gemini=_gemini(call_model),
+                          checkpoint=Checkpoint(checkpoint)).run(tasks[:1])
+    stats = CacheWarmer.for_cache(ResponseCache(), gemini=_gemini(call_model),
+                                  checkpoint=Checkpoint(checkpoint)).run(tasks)
+
+    assert stats == {"ok": 1, "empty": 0, "degraded": 0, "error": 0, "skipped": 1}
+    assert call_model.call_count == 2
+
+
+def test_refresh_asks_again_but_keeps_good_answers(tmp_path):
+    cache = ResponseCache()
+    task = WarmTask("genre", ("Dune", "Frank Herbert"))
+    CacheWarmer.for_cache(cache, gemini=_gemini(Mock(return_value='{"genre": "science fiction"}')),
+                          checkpoint=Checkpoint(None)).run([task])
+
+    failing = Mock(side_effect=Exception("bad request"))
+    stats = CacheWarmer.for_cache(cache, refresh=True, gemini=_gemini(failing),
+                                  checkpoint=Checkpoint(None)).run([task])
+
+    assert failing.call_count == 1
+    assert stats["degraded"] == 1
+    assert BookService(cache=cache).get_book_genre("Dune", "Frank Herbert") == "science fiction"
+
+
+def test_editing_the_trope_prompt_invalidates_warmed_answers(monkeypatch):
+    service = BookService(cache=ResponseCache())
+    key = service._trope_cache_key("Found-Family", 5, "Fantasy")
+    assert key == service._trope_cache_key("found family", 5, "fantasy")
+
+    original = BookService._trope_prompt
+    monkeypatch.setattr(BookService, "_trope_prompt", lambda self, *args: original(self, *args) + " v2")
+
+    assert service._trope_cache_key("found family", 5, "fantasy") != key
@@ -0,0 +1,86 @@
+import pytest
+from unittest.mock import Mock
+from models.book import BookRecommendation
+from services.book_service import BookService
+from services.catalog import BookCatalog
+from services.response_cache import ResponseCache
+
+
+@pytest.fixture
+def catalog():
+    catalog = BookCatalog()
+    catalog.record(BookRecommendation("Dune", "Frank Herbert"), genre="science fiction", spice_level=0,
+                   tropes=["chosen one"])
+    catalog.record(BookRecommendation("Fourth Wing", "Rebecca Yarros"), genre="fantasy", spice_level=3,
+                   tropes=["dragon riders", "enemies to lovers"])
+    catalog.record(BookRecommendation("Harry Potter", "J.K. Rowling"), genre="fantasy", spice_level=0,
+                   tropes=["chosen one", "magic school"])
+    return catalog
+
+
+def test_find_intersects_indexes(catalog):
+    assert catalog.find(trope="chosen one", genre="Fantasy") == [BookRecommendation("Harry Potter", "J.K. Rowling")]
+    assert len(catalog.find(trope="Chosen-One")) == 2
+    assert catalog.find(trope="fae romance") == []
+
+
+def test_find_by_spice_level_with_limit(catalog):
+    assert catalog.find(spice_level=0, limit=1) == [BookRecommendation("Dune", "Frank Herbert")]
+
+
+def test_record_tags_keeps_only_known_tropes(catalog):
+    catalog.record_tags(BookRecommendation("Pride and Prejudice", "Jane Austen"), ["Enemies to Lovers", "regency"])
+
+    assert len(catalog.find(trope="enemies to lovers")) == 2
+    assert catalog.stats()["tropes"] == 4
+
+
+def test_trope_query_served_from_catalog(catalog):
+    service = BookService(cache=ResponseCache(), catalog=catalog)
+    service.gemini._generate_content = Mock()
+
+    result = service.get_books_for_trope("chosen one", count=2)
+
+    assert len(result) == 2
+    service.gemini._generate_content.assert_not_called()
+
+
+def test_trope_query_asks_only_for_missing_books(catalog):
+    # Arrange
+    service = BookService(cache=ResponseCache(), catalog=catalog)
+    service.gemini._generate_content = Mock(return_value='{"recommendations": ["Eragon by Christopher Paolini"]}')
+
+    # Act
+    result = service.get_books_for_trope("dragon riders", count=2)
+
+    # Assert
+    prompt = service.gemini._generate_content.call_args[0][0]
+    assert "exactly 1 fiction books" in prompt
+    assert "'Fourth Wing' by Rebecca Yarros" in prompt
+    assert [book.title for book in result] == ["Fourth Wing", "Eragon"]
+    assert len(catalog.find(trope="dragon riders")) == 2
+
+
+def test_unknown_tropes_are_not_indexed(catalog):
+    catalog.record(BookRecommendation("Eragon", "Christopher Paolini"), tropes=["dragon riders", "a boy and his lizard"])
+
+    assert catalog.find(trope="a boy and his lizard") == []
+    assert len(catalog.find(trope="dragon riders")) == 2
+    assert catalog.stats()["tropes"] == 4
+
+
+def test_least_recently_recorded_books_are_forgotten():
+    catalog = BookCatalog(max_books=2)
+    catalog.record(BookRecommendation("Dune", "Frank Herbert"), genre="science fiction", spice_level=0,
+                   tropes=["chosen one"])
+    catalog.record(BookRecommendation("Fourth Wing", "Rebecca Yarros"), genre="fantasy", spice_level=3,
+                   tropes=["dragon riders"])
+    catalog.record(BookRecommendation("Dune", "Frank Herbert"), spice_level=1)
+
+    catalog.record(BookRecommendation("Harry Potter", "J.K. Rowling"), genre="fantasy", tropes=["chosen one"])
+
+    assert len(catalog) == 2
+    assert catalog.find(trope="dragon riders") == []
+    assert catalog.find(genre="fantasy") == [BookRecommendation("Harry Potter", "J.K. Rowling")]
+    assert catalog.find(spice_level=3) == []
+    assert catalog.stats() == {"books": 2, "tropes": 1, "genres": 2, "spice_levels": 2}
@@ -0,0 +1,150 @@
+import threading
+import time
+from unittest.mock import Mock
+from models.book import BookRecommendation
+from services import deadline
+from services.book_service import BookService
+from services.circuit_breaker import CircuitBreaker
+from services.gemini_service import GeminiService
+from services.resilience import RetryPolicy
+from services.response_cache import ResponseCache
+from services.scheduler import GeminiScheduler
+from services.single_flight import SingleFlight
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Unavailable(Exception):
+    code = 503
+
+
+def _gemini(breaker):
+    return GeminiService(single_flight=SingleFlight(), client=Mock(), scheduler=GeminiScheduler(),
+                         retry=RetryPolicy(max_attempts=1), breaker=breaker)
+
+
+def test_breaker_opens_on_failures_and_probes_half_open():
+    clock = FakeClock()
+    breaker = CircuitBreaker(min_calls=4, open_seconds=10, clock=clock)
+    for success in (True, False, True, False):
+        assert breaker.allow()
+        breaker.record(success, 0.1)
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    clock.now = 10.0
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record(True, 0.1)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_breaker_opens_on_slow_calls_and_failed_probe_reopens():
+    clock = FakeClock()
+    breaker = CircuitBreaker(min_calls=2, slow_ratio=1.0, slow_call_seconds=5, open_seconds=10, clock=clock)
+    breaker.record(True, 6)
+    breaker.record(True, 7)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock.now = 10.0
+    assert breaker.allow()
+    breaker.record(False, 0.1)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.stats()["opened"] == 2
+
+
+def test_open_breaker_rejects_without_calling_upstream():
+    gemini = _gemini(CircuitBreaker(min_calls=1))
+    gemini._call_model = Mock(side_effect=Unavailable("down"))
+    assert gemini._generate_content("first") is None
+
+    tokens = deadline.begin_request(None)
+    try:
+        assert gemini._generate_content("second") is None
+        assert deadline.degraded_reasons() == ["circuit_open"]
+    finally:
+        deadline.end_request(tokens)
+    assert gemini._call_model.call_count == 1
+
+
+def test_expired_answer_is_served_and_refreshed_in_background():
+    cache = ResponseCache(ttls={"get_book_genre": -1})
+    service = BookService(cache=cache, gemini=_gemini(CircuitBreaker()))
+    refreshed = threading.Event()
+
+    def call_model(prompt):
+        refreshed.set()
+        return '{"genre": "fantasy"}'
+
+    service.gemini._call_model = call_model
+    key = cache.make_key("get_book_genre", service.gemini.model, service._genre_prompt("Dune", "Frank Herbert"))
+    cache.set(key, "science fiction", "get_book_genre")
+
+    assert service.get_book_genre("Dune", "Frank Herbert") == "science fiction"
+    assert refreshed.wait(2)
+    service._refresh_pool.shutdown(wait=True)
+    assert cache.get_stale(key) == (True, "fantasy")
+    assert service.cache_stats()["refreshes_succeeded"] == 1
+
+
+def test_uncached_methods_fall_back_to_last_good_response():
+    breaker = CircuitBreaker(min_calls=1)
+    service = BookService(cache=ResponseCache(), gemini=_gemini(breaker))
+    service.gemini._call_model = Mock(return_value='{"recommendations": ["Dune by Frank Herbert"]}')
+    read_books = [BookRecommendation("Hyperion", "Dan Simmons")]
+    assert service.get_recommendations_from_history(read_books)[0].title == "Dune"
+
+    service.gemini._call_model = Mock(side_effect=Unavailable("down"))
+    assert service.get_recommendations_from_history(read_books)[0].title == "Dune"
+    assert breaker.state == CircuitBreaker.OPEN
+    assert service.get_recommendations_from_history(read_books)[0].title == "Dune"
+    assert service.gemini._call_model.call_count == 1
+
+
+def test_streams_closed_early_by_the_consumer_count_as_healthy():
+    breaker = CircuitBreaker(min_calls=4)
+    service = BookService(cache=ResponseCache(), gemini=_gemini(breaker))
+    service.gemini._call_model_stream = Mock(side_effect=lambda prompt: iter(
+        ['{"recommendations": ["Dune by Frank Herbert", ', '"Hyperion by Dan Simmons"]}', "\n"]))
+    read_books = [BookRecommendation("Foundation", "Isaac Asimov")]
+
+    for _ in range(8):
+        assert [book.title for book in service.stream_recommendations_from_history(read_books, 2)] == ["Dune", "Hyperion"]
+
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_callers_running_out_of_their_own_deadline_do_not_open_the_breaker():
+    breaker = CircuitBreaker(min_calls=4)
+    service = _gemini(breaker)
+    service._call_model = Mock(side_effect=lambda prompt: time.sleep(0.05) or '{"genre": "fantasy"}')
+
+    for i in range(6):
+        tokens = deadline.begin_request(0.005)
+        try:
+            assert service._generate_content(f"prompt {i}") is None
+            assert deadline.degraded_reasons() == ["deadline_exceeded"]
+        finally:
+            deadline.end_request(tokens)
+
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert service._generate_content("prompt") == '{"genre": "fantasy"}'
+
+
+def test_half_open_probe_is_freed_when_the_caller_runs_out_of_time():
+    clock = FakeClock()
+    breaker = CircuitBreaker(min_calls=1, open_seconds=10, clock=clock)
+    breaker.record(False, 0.1)
+    clock.now = 10
+
+    assert breaker.allow()
+    breaker.release()
+
+    assert breaker.allow()
@@ -0,0 +1,70 @@
+import threading
+import time
+import pytest
+from unittest.mock import Mock
+from main import create_app
+from services import deadline
+from services.book_service import BookService
+from services.gemini_service import GeminiService
+from services.response_cache import ResponseCache
+from services.scheduler import GeminiScheduler
+from services.single_flight import SingleFlight
+
+GENRE_RESPONSE = '{"genre": "science fiction"}'
+
+
+def _slow_gemini(release):
+    gemini = GeminiService(single_flight=SingleFlight(), client=Mock(), scheduler=GeminiScheduler())
+    gemini._call_model = lambda prompt: release.wait(2) and GENRE_RESPONSE
+    return gemini
+
+
+def test_slow_call_is_abandoned_at_the_deadline():
+    release = threading.Event()
+    gemini = _slow_gemini(release)
+    tokens = deadline.begin_request(0.1)
+    try:
+        started = time.monotonic()
+        assert gemini._generate_content("prompt") is None
+        assert time.monotonic() - started < 1
+        assert deadline.degraded_reasons() == ["deadline_exceeded"]
+    finally:
+        deadline.end_request(tokens)
+        release.set()
+
+
+def test_queued_call_gives_up_at_the_deadline():
+    scheduler = GeminiScheduler(max_concurrency=1)
+    holder = scheduler.acquire(1)
+    with deadline.deadline(0.05):
+        with pytest.raises(deadline.DeadlineExceeded):
+            scheduler.acquire(1)
+    holder.release()
+
+    assert scheduler.stats()["deadline_exceeded"] == 1
+    assert scheduler.stats()["queued"]["interactive"] == 0
+
+
+def test_nested_deadline_keeps_the_tighter_one():
+    with deadline.deadline(0.5):
+        with deadline.deadline(10):
+            assert deadline.remaining() <= 0.5
+    assert deadline.remaining() is None
+
+
+def test_route_answer_is_flagged_when_the_deadline_passes():
+    release = threading.Event()
+    service = BookService(cache=ResponseCache(), gemini=_slow_gemini(release))
+
+    try:
+        with create_app(service).test_client() as client:
+            response = client.get('/api/book/genre/Dune/Frank Herbert',
+                                  headers={'X-Request-Deadline-Ms': '100'})
+    finally:
+        release.set()
+
+    assert response.status_code == 200
+    assert response.json["genre"] == "Unknown"
+    assert response.json["degraded"] is True
+    assert response.json["degraded_reasons"] == ["deadline_exceeded"]
+    assert response.headers["X-Degraded"] == "deadline_exceeded"
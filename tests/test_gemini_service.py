@@ -41,4 +41,12 @@ def test_extract_json_not_found():
     text = "No JSON here"
     
     result = service._extract_json_from_text(text, "genre")
-    assert result is None
\ No newline at end of file
+    assert result is None
+
+def test_client_is_created_lazily():
+    service = GeminiService()
+    assert service._client is None
+
+    client = service.client
+
+    assert client is service.client
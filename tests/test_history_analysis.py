@@ -0,0 +1,57 @@
+import pytest
+from unittest.mock import Mock
+from models.book import BookRecommendation
+from services.book_service import BookService
+from services.history_analysis import AnalysisStore, history_fingerprint, history_keys
+from services.response_cache import ResponseCache
+
+PATTERNS = '{"favorite_genres": ["fantasy"], "frequent_tropes": ["chosen one"], "spice_tolerance": "1"}'
+
+
+def _books(*titles):
+    return [BookRecommendation(title, "Some Author") for title in titles]
+
+
+def test_fingerprint_ignores_order_and_spelling():
+    assert history_fingerprint(history_keys(_books("Wiedźmin", "Dune"))) == \
+        history_fingerprint(history_keys(_books("dune", "Wiedzmin")))
+
+
+def test_best_base_picks_largest_subset():
+    store = AnalysisStore()
+    store.put(history_keys(_books("A")), {"favorite_genres": ["a"]})
+    store.put(history_keys(_books("A", "B")), {"favorite_genres": ["ab"]})
+    store.put(history_keys(_books("C")), {"favorite_genres": ["c"]})
+
+    base_keys, result = store.best_base(history_keys(_books("A", "B", "D")))
+
+    assert result == {"favorite_genres": ["ab"]}
+    assert len(base_keys) == 2
+
+
+def test_identical_history_is_answered_without_gemini():
+    service = BookService(cache=ResponseCache())
+    service.gemini._generate_content = Mock(return_value=PATTERNS)
+
+    first = service.analyze_reading_patterns(_books("Dune", "Hyperion"))
+    second = service.analyze_reading_patterns(_books("Hyperion", "Dune"))
+
+    assert first == second
+    service.gemini._generate_content.assert_called_once()
+
+
+def test_extended_history_sends_only_new_books():
+    # Arrange
+    service = BookService(cache=ResponseCache())
+    service.gemini._generate_content = Mock(return_value=PATTERNS)
+    service.analyze_reading_patterns(_books("Dune", "Hyperion"))
+
+    # Act
+    service.analyze_reading_patterns(_books("Dune", "Hyperion", "Foundation"))
+
+    # Assert
+    prompt = service.gemini._generate_content.call_args[0][0]
+    assert "'Foundation'" in prompt
+    assert "'Dune'" not in prompt
+    assert '"favorite_genres": ["fantasy"]' in prompt
+    assert service.analyses.stats()["delta_hits"] == 1
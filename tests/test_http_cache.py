@@ -0,0 +1,79 @@
+from unittest.mock import Mock
+from main import create_app
+from services import deadline
+
+GENRE_URL = '/api/book/genre/Dune/Frank Herbert'
+
+
+def _service(genre="science fiction"):
+    service = Mock()
+    service.get_book_genre.return_value = genre
+    return service
+
+
+def test_known_etag_is_answered_without_the_service():
+    service = _service()
+    client = create_app(service).test_client()
+
+    first = client.get(GENRE_URL)
+    again = client.get(GENRE_URL, headers={'If-None-Match': first.headers['ETag']})
+
+    assert first.headers['Cache-Control'] == 'public, max-age=86400, stale-while-revalidate=604800'
+    assert again.status_code == 304
+    assert again.headers['ETag'] == first.headers['ETag']
+    assert service.get_book_genre.call_count == 1
+
+
+def test_etag_from_another_worker_is_revalidated():
+    first = create_app(_service()).test_client().get(GENRE_URL)
+    other_worker = create_app(_service()).test_client()
+
+    unchanged = other_worker.get(GENRE_URL, headers={'If-None-Match': first.headers['ETag']})
+    changed = create_app(_service("fantasy")).test_client().get(
+        GENRE_URL, headers={'If-None-Match': first.headers['ETag']})
+
+    assert unchanged.status_code == 304
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != first.headers['ETag']
+
+
+def test_degraded_answers_are_not_cached():
+    service = _service()
+    service.get_book_genre.side_effect = lambda title, author: deadline.mark_degraded("stale") or "fantasy"
+    client = create_app(service).test_client()
+
+    response = client.get(GENRE_URL)
+
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'no-store'
+    assert response.headers['Vary'] == 'Accept'
+    assert 'ETag' not in response.headers
+
+
+def test_post_and_streamed_routes_get_no_cache_headers():
+    service = Mock()
+    service.stream_books_for_trope.return_value = iter([])
+    client = create_app(service).test_client()
+
+    streamed = client.get('/api/books/by-trope/heist?stream=ndjson')
+    posted = client.post('/api/book/genre', json={'title': 'Dune', 'author': 'Frank Herbert'})
+
+    assert 'ETag' not in streamed.headers
+    assert 'ETag' not in posted.headers
+
+
+def test_stream_negotiated_by_accept_is_not_answered_from_the_json_etag():
+    service = Mock()
+    service.get_books_for_trope.return_value = []
+    service.stream_books_for_trope.return_value = iter([])
+    client = create_app(service).test_client()
+    url = '/api/books/by-trope/heist'
+    etag = client.get(url).headers['ETag']
+
+    streamed = client.get(url, headers={'Accept': 'application/x-ndjson', 'If-None-Match': etag})
+
+    assert streamed.status_code == 200
+    assert streamed.mimetype == 'application/x-ndjson'
+    assert streamed.headers['Cache-Control'] == 'no-cache'
+    assert streamed.headers['Vary'] == 'Accept'
+    assert 'ETag' not in streamed.headers
@@ -0,0 +1,57 @@
+import pytest
+from services.json_extractor import extract_json
+
+
+def test_nested_objects_are_not_truncated():
+    text = 'Sure! {"profile": {"genre": "fantasy"}, "tags": ["a", "b"]} Hope it helps.'
+
+    assert extract_json(text, "tags") == {"profile": {"genre": "fantasy"}, "tags": ["a", "b"]}
+
+
+def test_braces_inside_strings_are_ignored():
+    text = '{"genre": "sci-fi {space} opera", "note": "use \\"}\\" carefully"}'
+
+    assert extract_json(text, "genre")["genre"] == "sci-fi {space} opera"
+
+
+def test_code_fence_and_trailing_commas():
+    text = '```json\n{\n  "favorite_genres": ["fantasy", "horror",],\n  "spice_tolerance": "2",\n}\n```'
+
+    assert extract_json(text, "favorite_genres") == {
+        "favorite_genres": ["fantasy", "horror"],
+        "spice_tolerance": "2",
+    }
+
+
+def test_skips_objects_without_key():
+    text = 'Format: {"example": true} Answer: {"genre": "poezja"}'
+
+    assert extract_json(text, "genre") == {"genre": "poezja"}
+
+
+def test_key_in_nested_object():
+    assert extract_json('{"data": {"genre": "horror"}}', "genre") == {"genre": "horror"}
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('{"recommendations": ["Dune by Frank Herbert", "Foundation by Isa',
+     {"recommendations": ["Dune by Frank Herbert"]}),
+    ('{"spice_level": 3, "content_warnings": ["violence"', {"spice_level": 3}),
+    ('{"genre": "fantasy", "ot', {"genre": "fantasy"}),
+])
+def test_truncated_output_is_repaired(text, expected):
+    assert extract_json(text, next(iter(expected))) == expected
+
+
+def test_returns_none_without_json():
+    assert extract_json("No JSON here", "genre") is None
+    assert extract_json('{"genre": ', "genre") is None
+
+
+@pytest.mark.parametrize("text, key, expected", [
+    ('{"genre": "scien', "genre", None),
+    ('{"spice_level": 1', "spice_level", None),
+    ('{"tags": ["slow burn", "hei', "tags", {"tags": ["slow burn"]}),
+])
+def test_value_cut_off_mid_way_is_not_completed(text, key, expected):
+    assert extract_json(text, key) == expected
@@ -0,0 +1,102 @@
+import pytest
+from unittest.mock import Mock
+from models.book import BookRecommendation
+from services.book_service import BookService
+from services.gemini_service import GeminiService
+from services.llm_backend import (Cassette, CassetteMiss, RecordingBackend, ReplayBackend,
+                                  ReplayedError, backend_from_env, prompt_key)
+from services.resilience import RetryPolicy
+from services.response_cache import ResponseCache
+from services.scheduler import GeminiScheduler
+from services.single_flight import SingleFlight
+
+
+class Unavailable(Exception):
+    code = 503
+
+
+def _live(responses):
+    live = Mock()
+    live.generate.side_effect = responses
+    live.generate_stream.return_value = iter(['{"recommendations": ', '["Dune by Frank Herbert"]}'])
+    return live
+
+
+def _gemini(backend):
+    return GeminiService(single_flight=SingleFlight(), client=Mock(), scheduler=GeminiScheduler(),
+                         retry=RetryPolicy(max_attempts=1), backend=backend)
+
+
+def test_prompts_match_regardless_of_whitespace():
+    assert prompt_key("m", "  Genre of\n        'Dune'  ") == prompt_key("m", "Genre of 'Dune'")
+    assert prompt_key("m", "Genre of 'Dune'") != prompt_key("other", "Genre of 'Dune'")
+
+
+def test_recorded_calls_replay_in_order_with_scaled_latency(tmp_path):
+    path = str(tmp_path / "calls.jsonl.gz")
+    recorder = RecordingBackend(_live(['{"genre": "fantasy"}', Unavailable("down")]), Cassette(path),
+                                clock=iter([0.0, 2.0, 10.0, 10.5]).__next__)
+    recorder.generate("m", "genre of Dune")
+    with pytest.raises(Unavailable):
+        recorder.generate("m", "genre of Dune")
+
+    sleeps = []
+    replay = ReplayBackend(Cassette(path), latency_scale=0.5, sleep=sleeps.append)
+
+    assert replay.generate("m", "genre   of Dune") == '{"genre": "fantasy"}'
+    with pytest.raises(ReplayedError) as error:
+        replay.generate("m", "genre of Dune")
+    assert error.value.code == 503
+    assert sleeps == [1.0, 0.25]
+
+
+def test_streams_replay_chunk_by_chunk(tmp_path):
+    path = str(tmp_path / "calls.jsonl")
+    recorder = RecordingBackend(_live([]), Cassette(path))
+    recorded = list(recorder.generate_stream("m", "history"))
+
+    replay = ReplayBackend(Cassette(path), latency_scale=0)
+
+    assert list(replay.generate_stream("m", "history")) == recorded
+    assert replay.generate("m", "history") == "".join(recorded)
+
+
+def test_streams_closed_early_by_book_service_are_recorded(tmp_path):
+    path = str(tmp_path / "calls.jsonl")
+    live = _live([])
+    live.generate_stream.return_value = iter(['{"recommendations": ["Dune by Frank Herbert"]}', "\n", "\n"])
+    read_books = [BookRecommendation("Hyperion", "Dan Simmons")]
+    recording = BookService(cache=ResponseCache(), gemini=_gemini(RecordingBackend(live, Cassette(path))))
+    assert [book.title for book in recording.stream_recommendations_from_history(read_books, 1)] == ["Dune"]
+
+    replaying = BookService(cache=ResponseCache(), gemini=_gemini(ReplayBackend(Cassette(path), latency_scale=0)))
+
+    assert [book.title for book in replaying.stream_recommendations_from_history(read_books, 1)] == ["Dune"]
+
+
+def test_misses_are_reported(tmp_path):
+    replay = ReplayBackend(Cassette(str(tmp_path / "empty.jsonl")), latency_scale=0)
+
+    with pytest.raises(CassetteMiss):
+        replay.generate("m", "unknown prompt")
+
+    stats = replay.stats()
+    assert stats["misses"] == 1
+    assert stats["missed_prompts"][0]["prompt"] == "unknown prompt"
+
+
+def test_book_service_runs_offline_from_a_cassette(tmp_path, monkeypatch):
+    path = str(tmp_path / "calls.jsonl")
+    recording = BookService(cache=ResponseCache(), gemini=_gemini(
+        RecordingBackend(_live(['{"genre": "science fiction"}']), Cassette(path))))
+    assert recording.get_book_genre("Dune", "Frank Herbert") == "science fiction"
+
+    monkeypatch.setenv("GEMINI_CASSETTE", path)
+    monkeypatch.setenv("GEMINI_REPLAY_LATENCY_SCALE", "0")
+    backend = backend_from_env(live=None)
+    replaying = BookService(cache=ResponseCache(), gemini=_gemini(backend))
+
+    assert replaying.get_book_genre("Dune", "Frank Herbert") == "science fiction"
+    assert replaying.get_book_genre("Hyperion", "Dan Simmons") == "Unknown"
+    assert backend.stats()["hits"] == 1
+    assert backend.stats()["misses"] == 1
@@ -0,0 +1,86 @@
+import json
+import subprocess
+import sys
+from unittest.mock import Mock
+from main import create_app
+from models.book import BookRecommendation
+from services.book_service import BookService
+from services.metrics import LLM_CALLS, PARSE_FAILURES, Counter, Gauge, Histogram, Registry
+from services.response_cache import ResponseCache
+
+
+def _value(metric, *labels):
+    return dict((tuple(key), value) for key, value in metric.snapshot()["samples"]).get(labels, 0)
+
+
+def test_render_counter_and_histogram():
+    registry = Registry()
+    requests = Counter("requests_total", "Requests", ("route",), registry=registry)
+    latency = Histogram("latency_seconds", "Latency", buckets=(0.1, 1.0), registry=registry)
+    requests.inc(route='/a"b')
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(5)
+
+    text = registry.render()
+
+    assert '# TYPE requests_total counter' in text
+    assert 'requests_total{route="/a\\"b"} 1' in text
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{le="1"} 2' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in text
+    assert 'latency_seconds_count 3' in text
+
+
+def test_snapshots_of_other_workers_are_merged(tmp_path):
+    registry = Registry()
+    requests = Counter("requests_total", "Requests", registry=registry)
+    in_flight = Gauge("in_flight", "In flight", registry=registry)
+    requests.inc(2)
+    in_flight.inc()
+
+    exited = subprocess.Popen([sys.executable, "-c", "pass"])
+    exited.wait()
+    (tmp_path / f"metrics-{exited.pid}.json").write_text(json.dumps(registry.snapshot()))
+    registry.enable_multiprocess(str(tmp_path), flush_interval=3600)
+
+    text = registry.render()
+
+    # Counters of exited workers are kept, their gauges are not
+    assert "requests_total 4" in text
+    assert "in_flight 1" in text
+
+
+def test_http_and_gemini_calls_are_counted():
+    service = BookService(cache=ResponseCache())
+    service.gemini._generate_content = Mock(return_value="no json here")
+    calls_before = _value(PARSE_FAILURES, "get_book_genre")
+
+    with create_app(service).test_client() as client:
+        client.get('/api/book/genre/Dune/Frank Herbert')
+        response = client.get('/api/metrics')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert 'http_requests_total{method="GET",route="/api/book/genre/<title>/<author>",status="200"}' in response.text
+    assert _value(PARSE_FAILURES, "get_book_genre") == calls_before + 1
+
+
+def test_gemini_outcomes_are_labelled_by_book_service_method():
+    service = BookService(cache=ResponseCache())
+    service.gemini._call_model = Mock(return_value='{"tags": ["politics"]}')
+    before = _value(LLM_CALLS, "get_book_tags", "ok")
+
+    service.get_book_tags("Dune", "Frank Herbert")
+
+    assert _value(LLM_CALLS, "get_book_tags", "ok") == before + 1
+
+
+def test_streams_closed_early_are_counted_as_ok():
+    service = BookService(cache=ResponseCache())
+    service.gemini._call_model_stream = Mock(return_value=iter(['{"recommendations": ["Dune by Frank Herbert"]}', "\n"]))
+    before = _value(LLM_CALLS, "stream_recommendations_from_history", "ok")
+
+    list(service.stream_recommendations_from_history([BookRecommendation("Hyperion", "Dan Simmons")], 1))
+
+    assert _value(LLM_CALLS, "stream_recommendations_from_history", "ok") == before + 1
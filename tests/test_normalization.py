@@ -0,0 +1,134 @@
+import pytest
+from unittest.mock import Mock
+from models.book import BookRecommendation
+from services.book_service import BookService
+from services.normalization import TrigramIndex, book_key, normalize_author, normalize_text
+from services.response_cache import ResponseCache
+
+
+@pytest.mark.parametrize("variant", ["Wiedźmin", "Wiedzmin", "wiedźmin ", "WIEDŹMIN!", "Ｗｉｅｄźｍｉｎ"])
+def test_title_variants_normalize_the_same(variant):
+    assert normalize_text(variant) == "wiedzmin"
+
+
+def test_polish_letters_are_folded():
+    assert normalize_text("Łódź  –  Żółć") == "lodz zolc"
+
+
+@pytest.mark.parametrize("variant", ["Andrzej Sapkowski", "A. Sapkowski", "a sapkowski", "Andrzej  SAPKOWSKI"])
+def test_author_initials(variant):
+    assert normalize_author(variant) == "a sapkowski"
+
+
+def test_exact_variant_resolves_to_first_seen_book():
+    index = TrigramIndex()
+    index.add(BookRecommendation("Wiedźmin", "Andrzej Sapkowski"))
+
+    assert index.resolve("wiedzmin", "A. Sapkowski") == BookRecommendation("Wiedźmin", "Andrzej Sapkowski")
+
+
+def test_fuzzy_title_match():
+    index = TrigramIndex()
+    index.add(BookRecommendation("Harry Potter and the Philosopher's Stone", "J.K. Rowling"))
+    index.add(BookRecommendation("Harry Potter and the Chamber of Secrets", "J.K. Rowling"))
+
+    match = index.resolve("Harry Poter and the Philosophers Stone", "J. K. Rowling")
+
+    assert match.title == "Harry Potter and the Philosopher's Stone"
+    assert index.resolve("Harry Potter and the Chamber of Secrets", "Someone Else") is None
+
+
+@pytest.mark.parametrize("title", ["Harry Potter 2", "Harry Potter II", "Harry Potter"])
+def test_fuzzy_match_keeps_volumes_apart(title):
+    index = TrigramIndex()
+    index.add(BookRecommendation("Harry Potter 1", "J.K. Rowling"))
+
+    assert index.resolve(title, "J.K. Rowling") is None
+
+
+def test_unnumbered_title_does_not_match_a_later_volume():
+    index = TrigramIndex()
+    index.add(BookRecommendation("Red Rising", "Pierce Brown"))
+
+    assert index.resolve("Red Rising 2", "Pierce Brown") is None
+    assert index.resolve("Red Risin", "Pierce Brown").title == "Red Rising"
+
+
+def test_roman_and_arabic_volume_numbers_match():
+    index = TrigramIndex()
+    index.add(BookRecommendation("The Stormlight Archive Book II: Words of Radiance", "Brandon Sanderson"))
+
+    match = index.resolve("The Stormlight Archive Book 2 Words of Radiance", "Brandon Sanderson")
+
+    assert match.title == "The Stormlight Archive Book II: Words of Radiance"
+
+
+def test_least_recently_used_books_are_forgotten():
+    index = TrigramIndex(max_books=2)
+    index.add(BookRecommendation("Dune", "Frank Herbert"))
+    index.add(BookRecommendation("Hyperion", "Dan Simmons"))
+    index.resolve("Dune", "Frank Herbert")
+
+    index.add(BookRecommendation("Foundation", "Isaac Asimov"))
+
+    assert len(index) == 2
+    assert index.resolve("Hyperion", "Dan Simmons") is None
+    assert index.resolve("Dune", "Frank Herbert") is not None
+
+
+def test_variants_share_one_gemini_call():
+    # Arrange
+    service = BookService(cache=ResponseCache())
+    service.gemini._generate_content = Mock(return_value='{"genre": "fantasy"}')
+
+    # Act
+    results = [
+        service.get_book_genre("Wiedźmin", "Andrzej Sapkowski"),
+        service.get_book_genre("Wiedzmin", "A. Sapkowski"),
+        service.get_book_genre("wiedźmin ", "andrzej sapkowski"),
+    ]
+
+    # Assert
+    assert results == ["fantasy"] * 3
+    service.gemini._generate_content.assert_called_once()
+    assert book_key("Wiedzmin", "A. Sapkowski") == ("wiedzmin", "a sapkowski")
+
+
+def test_unknown_queries_are_not_registered_as_canonical():
+    index = TrigramIndex()
+
+    assert index.canonical(" Wiedzmim ", "Andrzej Sapkowski") == BookRecommendation("Wiedzmim", "Andrzej Sapkowski")
+    assert len(index) == 0
+
+
+def test_unanswered_typo_does_not_become_the_canonical_title():
+    # Arrange
+    service = BookService(cache=ResponseCache())
+    service.gemini._generate_content = Mock(side_effect=[
+        "not json",
+        '{"genre": "fantasy"}',
+        '{"genre": "fantasy"}',
+    ])
+
+    # Act
+    service.get_book_genre("Wiedzmim", "Andrzej Sapkowski")
+    service.get_book_genre("Wiedźmin", "Andrzej Sapkowski")
+    service.get_book_genre("Wiedzmin", "A. Sapkowski")
+
+    # Assert
+    assert service.title_index.known() == [BookRecommendation("Wiedźmin", "Andrzej Sapkowski")]
+    assert service.gemini._generate_content.call_count == 2
+
+
+def test_recommended_spelling_wins_over_an_earlier_query():
+    # Arrange
+    service = BookService(cache=ResponseCache())
+    service.gemini._generate_content = Mock(return_value='{"recommendations": ["The Way of Kings by Brandon Sanderson"]}')
+
+    # Act
+    service.get_similar_books("Way of Kigns", "Brandon Sanderson", count=1)
+    service.get_similar_books("Mistborn", "Brandon Sanderson", count=1)
+
+    # Assert
+    assert service.title_index.known() == [BookRecommendation("The Way of Kings", "Brandon Sanderson")]
+    assert service._canonical("the way of kings", "B. Sanderson") == ("The Way of Kings", "Brandon Sanderson")
@@ -0,0 +1,54 @@
+import pytest
+from unittest.mock import Mock
+from models.book import BookRecommendation
+from services.book_service import BookService
+from services.prompt_builder import estimate_tokens, history_summary, select_history
+from services.response_cache import ResponseCache
+
+
+def _history(count, authors=10):
+    return [BookRecommendation(f"Book {i}", f"Author {i % authors}") for i in range(count)]
+
+
+def test_small_history_is_kept_whole():
+    books = _history(5)
+
+    assert select_history(books, budget_tokens=1000) == books
+
+
+def test_large_history_fits_budget():
+    books = _history(3000)
+
+    summary = history_summary(books, budget_tokens=500)
+
+    assert estimate_tokens(summary) <= 520
+    assert "of the 3000 books" in summary
+
+
+def test_selection_prefers_recent_and_covers_authors():
+    books = _history(2000, authors=50)
+
+    selected = select_history(books, budget_tokens=400)
+
+    assert selected[-1] == books[-1]
+    assert len({book.author for book in selected}) == 50
+    assert selected == sorted(selected, key=books.index)
+
+
+def test_selection_covers_known_genres():
+    books = _history(1000)
+    genres = {"Book 3": "poezja", "Book 7": "horror"}
+
+    selected = select_history(books, budget_tokens=200, genre_of=lambda book: genres.get(book.title))
+
+    assert {"Book 3", "Book 7"} <= {book.title for book in selected}
+
+
+def test_history_prompt_size_is_bounded():
+    service = BookService(cache=ResponseCache())
+    service.gemini._generate_content = Mock(return_value='{"recommendations": []}')
+
+    service.get_recommendations_from_history(_history(5000), count=3)
+
+    prompt = service.gemini._generate_content.call_args[0][0]
+    assert estimate_tokens(prompt) < service.HISTORY_TOKEN_BUDGET + 500
@@ -0,0 +1,91 @@
+import pytest
+from unittest.mock import Mock
+from models.book import BookRecommendation
+from services.book_service import BookService
+from services.reading_profile import BookFeatures, aggregate, recency_weights
+from services.response_cache import ResponseCache
+
+
+def test_aggregate_weights_recent_books_higher():
+    features = [
+        BookFeatures("Fantasy", ["Chosen One"], 1),
+        BookFeatures("Romans", ["enemies-to-lovers"], 4),
+        BookFeatures("romans", ["Enemies to Lovers"], 4),
+    ]
+
+    profile = aggregate(features, top_k=2)
+
+    assert profile["favorite_genres"] == ["romans", "fantasy"]
+    assert profile["frequent_tropes"][0] == "enemies to lovers"
+    assert profile["spice_tolerance"].startswith("4:")
+    assert sum(profile["spice_distribution"].values()) == pytest.approx(1.0)
+
+
+def test_aggregate_handles_unknown_features():
+    profile = aggregate([BookFeatures("Unknown", ["not a trope"], None)])
+
+    assert profile["favorite_genres"] == []
+    assert profile["frequent_tropes"] == []
+    assert profile["spice_tolerance"] == "unknown"
+
+
+def test_tags_naming_a_trope_count_as_that_trope():
+    features = BookFeatures("Fantasy", ["slow-burn romance", "Found Family", "burning cities"], 2)
+
+    assert aggregate([features])["frequent_tropes"] == ["found family", "slow burn"]
+
+
+def test_tags_prompts_list_the_trope_vocabulary():
+    service = BookService(cache=ResponseCache())
+    books = [BookRecommendation("Dune", "Frank Herbert")]
+
+    for prompt in (service._tags_prompt("Dune", "Frank Herbert", 5), service._batch_tags_prompt(books, 5)):
+        assert "enemies to lovers, friends to lovers" in prompt
+
+
+def test_recency_weights():
+    weights = recency_weights(3)
+    assert weights[0] == pytest.approx(0.5)
+    assert weights[-1] == pytest.approx(1.0)
+
+
+def test_local_analysis_reuses_book_features():
+    service = BookService(cache=ResponseCache())
+    service.get_books_genre_batch = Mock(side_effect=lambda books: [{"genre": "Fantasy"} for _ in books])
+    service.get_books_tags_batch = Mock(side_effect=lambda books: [{"tags": ["Chosen One"]} for _ in books])
+    service.get_books_spice_level_batch = Mock(side_effect=lambda books: [{"spice_level": 1} for _ in books])
+    books = [BookRecommendation("Dune", "Frank Herbert"), BookRecommendation("Hyperion", "Dan Simmons")]
+
+    first = service.analyze_reading_patterns(books, mode="local")
+    second = service.analyze_reading_patterns(books + [BookRecommendation("dune", "F. Herbert")], mode="local")
+
+    assert first["favorite_genres"] == ["fantasy"]
+    assert second["frequent_tropes"] == ["chosen one"]
+    service.get_books_genre_batch.assert_called_once()
+
+
+def test_local_analysis_does_not_memoize_failed_lookups():
+    service = BookService(cache=ResponseCache())
+    service.get_books_genre_batch = Mock(side_effect=lambda books: [{"error": "Failed"} for _ in books])
+    service.get_books_tags_batch = Mock(side_effect=lambda books: [{"tags": []} for _ in books])
+    service.get_books_spice_level_batch = Mock(side_effect=lambda books: [{"spice_level": 2} for _ in books])
+    books = [BookRecommendation("Dune", "Frank Herbert")]
+
+    service.analyze_reading_patterns(books, mode="local")
+    service.analyze_reading_patterns(books, mode="local")
+
+    assert service.get_books_genre_batch.call_count == 2
+
+
+def test_local_analysis_keeps_a_bounded_number_of_books():
+    service = BookService(cache=ResponseCache())
+    service.MAX_BOOK_FEATURES = 2
+    service.get_books_genre_batch = Mock(side_effect=lambda books: [{"genre": "Fantasy"} for _ in books])
+    service.get_books_tags_batch = Mock(side_effect=lambda books: [{"tags": []} for _ in books])
+    service.get_books_spice_level_batch = Mock(side_effect=lambda books: [{"spice_level": 1} for _ in books])
+    books = [BookRecommendation(f"Book {i}", "Some Author") for i in range(3)]
+
+    profile = service.analyze_reading_patterns(books, mode="local")
+
+    assert profile["analyzed_books_with_features"] == 3
+    assert len(service._book_features) == 2
@@ -0,0 +1,86 @@
+import threading
+from unittest.mock import Mock
+from services.gemini_service import GeminiService
+from services.resilience import HedgePolicy, LatencyWindow, RetryPolicy, is_retryable
+from services.scheduler import GeminiScheduler
+from services.single_flight import SingleFlight
+
+
+class Unavailable(Exception):
+    code = 503
+
+
+class BadRequest(Exception):
+    code = 400
+
+
+def _service(**kwargs):
+    service = GeminiService(single_flight=SingleFlight(), client=Mock(), scheduler=GeminiScheduler(), **kwargs)
+    service._sleep = Mock()
+    return service
+
+
+def test_retryable_errors():
+    assert is_retryable(Unavailable())
+    assert is_retryable(TimeoutError())
+    assert not is_retryable(BadRequest())
+    assert not is_retryable(ValueError())
+
+
+def test_backoff_is_jittered_and_capped():
+    policy = RetryPolicy(base_delay=1.0, max_delay=4.0, rng=lambda: 1.0)
+    assert [policy.delay(attempt) for attempt in range(4)] == [1.0, 2.0, 4.0, 4.0]
+    assert RetryPolicy(rng=lambda: 0.0).delay(3) == 0.0
+
+
+def test_transient_error_is_retried():
+    service = _service(retry=RetryPolicy(max_attempts=3))
+    service._call_model = Mock(side_effect=[Unavailable("busy"), "answer"])
+
+    assert service._generate_content("prompt") == "answer"
+    assert service._sleep.call_count == 1
+    stats = service.stats()
+    assert stats["retries"] == 1
+    assert stats["attempts"] == 2
+    assert stats["failures"] == 0
+
+
+def test_non_retryable_error_fails_immediately():
+    service = _service(retry=RetryPolicy(max_attempts=3))
+    service._call_model = Mock(side_effect=BadRequest("bad prompt"))
+
+    assert service._generate_content("prompt") is None
+    assert service._call_model.call_count == 1
+    assert service.stats()["failures"] == 1
+
+
+def test_slow_call_is_hedged_and_first_answer_wins():
+    service = _service(hedging=HedgePolicy(min_samples=0, max_ratio=1.0, min_delay=0.01))
+    service.metrics.upstream.add(0.01)
+    release = threading.Event()
+    calls = []
+
+    def call_model(prompt):
+        calls.append(prompt)
+        if len(calls) == 1:
+            release.wait(2)
+            return "slow"
+        return "fast"
+
+    service._call_model = call_model
+
+    assert service._generate_content("prompt") == "fast"
+    release.set()
+    stats = service.stats()
+    assert stats["hedges"] == 1
+    assert stats["hedge_wins"] == 1
+    assert stats["hedge_rate"] == 1.0
+
+
+def test_latency_window_percentiles():
+    window = LatencyWindow()
+    for value in range(1, 101):
+        window.add(value / 1000)
+
+    assert window.summary()["p50_ms"] == 51.0
+    assert window.summary()["p99_ms"] == 100.0
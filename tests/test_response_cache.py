@@ -0,0 +1,95 @@
+import time
+import pytest
+from unittest.mock import Mock
+from services.book_service import BookService
+from services.response_cache import ResponseCache
+
+
+def test_key_depends_on_model_and_prompt():
+    key = ResponseCache.make_key("get_book_genre", "gemini-2.5-flash", "prompt")
+
+    assert key != ResponseCache.make_key("get_book_genre", "gemini-2.5-pro", "prompt")
+    assert key != ResponseCache.make_key("get_book_genre", "gemini-2.5-flash", "prompt v2")
+
+
+def test_memory_lru_eviction():
+    cache = ResponseCache(max_entries=2)
+    cache.set("a", "fantasy", "get_book_genre")
+    cache.set("b", "horror", "get_book_genre")
+    cache.get("a")
+    cache.set("c", "poezja", "get_book_genre")
+
+    assert cache.get("a") == (True, "fantasy")
+    assert cache.get("b") == (False, None)
+    assert cache.stats()["memory_evictions"] == 1
+
+
+def test_negative_results_use_short_ttl():
+    cache = ResponseCache(negative_ttl=0)
+    cache.set("empty", [], "get_book_tags")
+    cache.set("tags", ["slow burn"], "get_book_tags")
+
+    assert cache.get("empty") == (False, None)
+    assert cache.get("tags") == (True, ["slow burn"])
+    assert cache.stats()["negative_sets"] == 1
+
+
+def test_disk_tier_survives_new_instance(tmp_path):
+    db_path = str(tmp_path / "cache.sqlite3")
+    ResponseCache(db_path=db_path).set("k", {"spice_level": 2}, "get_book_spice_level")
+
+    cache = ResponseCache(db_path=db_path)
+
+    assert cache.get("k") == (True, {"spice_level": 2})
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_disk_tier_is_size_bounded(tmp_path):
+    cache = ResponseCache(max_entries=1, db_path=str(tmp_path / "cache.sqlite3"), max_disk_entries=2)
+    for key in ("a", "b", "c"):
+        cache.set(key, key, "get_book_genre")
+        time.sleep(0.001)
+
+    assert cache.stats()["disk_entries"] == 2
+    assert cache.get("a") == (False, None)
+
+
+def test_fallbacks_do_not_evict_cached_answers(tmp_path):
+    cache = ResponseCache(max_entries=2, max_fallbacks=2, db_path=str(tmp_path / "cache.sqlite3"),
+                          max_disk_fallbacks=2)
+    cache.set("genre", "fantasy", "get_book_genre")
+    for i in range(5):
+        cache.set_fallback(f"mood:{i}", f"response {i}")
+
+    assert cache.get("genre") == (True, "fantasy")
+    assert cache.stats()["memory_entries"] == 1
+    assert cache.get_fallback("mood:4") == (True, "response 4")
+    assert ResponseCache(db_path=str(tmp_path / "cache.sqlite3")).get_fallback("mood:0") == (False, None)
+    assert ResponseCache(db_path=str(tmp_path / "cache.sqlite3")).get_fallback("mood:3") == (True, "response 3")
+
+
+def test_book_service_calls_gemini_once_per_prompt():
+    # Arrange
+    service = BookService(cache=ResponseCache())
+    service.gemini = Mock(model="gemini-2.5-flash")
+    service.gemini._generate_content.return_value = '{"genre": "fantasy"}'
+    service.gemini._extract_json_from_text.return_value = {"genre": "fantasy"}
+
+    # Act
+    first = service.get_book_genre("Wiedźmin", "Andrzej Sapkowski")
+    second = service.get_book_genre("Wiedźmin", "Andrzej Sapkowski")
+
+    # Assert
+    assert first == second == "fantasy"
+    service.gemini._generate_content.assert_called_once()
+    assert service.cache_stats()["memory_hits"] == 1
+
+
+def test_book_service_does_not_cache_failed_calls():
+    service = BookService(cache=ResponseCache())
+    service.gemini = Mock(model="gemini-2.5-flash")
+    service.gemini._generate_content.return_value = None
+
+    assert service.get_book_tags("Dune", "Frank Herbert") == []
+    assert service.get_book_tags("Dune", "Frank Herbert") == []
+    assert service.gemini._generate_content.call_count == 2
@@ -0,0 +1,100 @@
+import threading
+import time
+import pytest
+from unittest.mock import Mock
+from services.gemini_service import GeminiService
+from services.resilience import RetryPolicy
+from services.scheduler import GeminiScheduler, Priority, TokenBucket, bulk, current_priority
+from services.single_flight import SingleFlight
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_token_bucket_refills_over_time():
+    bucket = TokenBucket(60, now=0.0)
+    bucket.take(60)
+
+    assert bucket.wait_time(1, now=0.0) == pytest.approx(1.0)
+    assert bucket.wait_time(1, now=1.0) == 0.0
+
+
+def test_interactive_calls_are_admitted_before_bulk():
+    scheduler = GeminiScheduler(max_concurrency=1)
+    holder = scheduler.acquire(10)
+    order = []
+
+    def call(level):
+        with scheduler.slot(10, level):
+            order.append(level)
+
+    bulk_thread = threading.Thread(target=call, args=(Priority.BULK,))
+    bulk_thread.start()
+    _wait_until(lambda: scheduler.stats()["queued"]["bulk"] == 1)
+    interactive_thread = threading.Thread(target=call, args=(Priority.INTERACTIVE,))
+    interactive_thread.start()
+    _wait_until(lambda: scheduler.stats()["queued"]["interactive"] == 1)
+
+    holder.release()
+    bulk_thread.join(2)
+    interactive_thread.join(2)
+
+    assert order == [Priority.INTERACTIVE, Priority.BULK]
+    assert scheduler.stats()["active"] == 0
+
+
+def test_requests_per_minute_limit_delays_admission():
+    scheduler = GeminiScheduler(requests_per_minute=120)
+    for _ in range(120):
+        scheduler.acquire(1).release()
+
+    started = time.monotonic()
+    scheduler.acquire(1).release()
+
+    # The bucket refills at 2 requests per second
+    assert time.monotonic() - started >= 0.4
+    assert scheduler.stats()["throttled"] == 1
+
+
+def test_settle_returns_unused_tokens():
+    scheduler = GeminiScheduler(tokens_per_minute=1000, clock=FakeClock())
+    ticket = scheduler.acquire(600)
+    ticket.release()
+    ticket.settle(100)
+
+    assert scheduler.stats()["tokens_available"] == 900
+
+
+def test_bulk_decorator_sets_priority():
+    @bulk
+    def heavy():
+        return current_priority()
+
+    assert heavy() == Priority.BULK
+    assert current_priority() == Priority.INTERACTIVE
+
+
+def test_upstream_429_pauses_admission():
+    class RateLimited(Exception):
+        code = 429
+
+    scheduler = GeminiScheduler()
+    service = GeminiService(single_flight=SingleFlight(), client=Mock(), scheduler=scheduler,
+                            retry=RetryPolicy(max_attempts=1))
+    service._call_model = Mock(side_effect=RateLimited("quota"))
+
+    assert service._generate_content("prompt") is None
+    assert scheduler.stats()["upstream_rate_limited"] == 1
+    assert scheduler.stats()["active"] == 0
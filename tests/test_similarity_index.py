@@ -0,0 +1,127 @@
+import pytest
+from unittest.mock import Mock
+from models.book import BookRecommendation
+from services.book_service import BookService
+from services.response_cache import ResponseCache
+from services.similarity_index import SimilarityIndex
+
+DUNE = BookRecommendation("Dune", "Frank Herbert")
+HYPERION = BookRecommendation("Hyperion", "Dan Simmons")
+FOUNDATION = BookRecommendation("Foundation", "Isaac Asimov")
+ACOTAR = BookRecommendation("A Court of Thorns and Roses", "Sarah J. Maas")
+
+
+def _index(**kwargs):
+    index = SimilarityIndex(**kwargs)
+    index.record(DUNE, genre="science fiction", spice_level=0, tags=["politics", "desert", "chosen one"])
+    index.record(HYPERION, genre="science fiction", spice_level=1, tags=["politics", "pilgrimage", "time travel"])
+    index.record(FOUNDATION, genre="science fiction", spice_level=0, tags=["politics", "empire"])
+    index.record(ACOTAR, genre="fantasy", spice_level=4, tags=["enemies to lovers", "fae"])
+    return index
+
+
+def test_most_similar_ranks_by_shared_features():
+    results = _index().most_similar("Dune", "Frank Herbert", k=3)
+
+    titles = [book.title for book, _ in results]
+    assert titles[:2] == ["Foundation", "Hyperion"]
+    assert "Dune" not in titles
+    assert [score for _, score in results] == sorted((score for _, score in results), reverse=True)
+
+
+def test_batch_query_and_unknown_books():
+    results = _index().most_similar_batch([ACOTAR, BookRecommendation("Unknown Book", "Nobody")], k=2)
+
+    assert len(results[0]) <= 2
+    assert results[1] == []
+
+
+def test_features_merge_across_lookups():
+    index = SimilarityIndex()
+    index.record(DUNE, genre="science fiction")
+    assert not index.contains("Dune", "Frank Herbert")
+
+    index.record(BookRecommendation("dune", "F. Herbert"), tags=["politics", "desert"])
+    assert index.contains("Dune", "Frank Herbert")
+    assert len(index) == 1
+
+
+def test_approximate_index_matches_exact_neighbour():
+    index = _index(lsh_threshold=2)
+
+    assert index.stats()["approximate"]
+    assert index.most_similar("Dune", "Frank Herbert", k=1)[0][0].title == "Foundation"
+
+
+def test_get_similar_books_serves_indexed_books_locally():
+    service = BookService(cache=ResponseCache(), similarity=_index())
+    service.gemini._generate_content = Mock()
+
+    result = service.get_similar_books("Dune", "Frank Herbert", 2)
+
+    assert [book.title for book in result] == ["Foundation", "Hyperion"]
+    service.gemini._generate_content.assert_not_called()
+
+
+def test_get_similar_books_falls_back_to_gemini_for_unindexed_books():
+    service = BookService(cache=ResponseCache(), similarity=_index())
+    service.gemini._generate_content = Mock(
+        return_value='{"recommendations": ["Foundation by Isaac Asimov"]}'
+    )
+
+    result = service.get_similar_books("Neuromancer", "William Gibson", 1)
+
+    assert result[0].title == "Foundation"
+    assert "exactly 1 other fiction books" in service.gemini._generate_content.call_args[0][0]
+
+
+def test_spice_level_alone_does_not_make_a_book_queryable():
+    service = BookService(cache=ResponseCache(), similarity=SimilarityIndex())
+    service.gemini._generate_content = Mock(return_value='{"spice_level": 1}')
+    for title, author in [("Dune", "Frank Herbert"), ("Pride and Prejudice", "Jane Austen"),
+                          ("The Shining", "Stephen King"), ("Gone Girl", "Gillian Flynn")]:
+        service.get_book_spice_level(title, author)
+    service.gemini._generate_content = Mock(
+        return_value='{"recommendations": ["Hyperion by Dan Simmons"]}'
+    )
+
+    result = service.get_similar_books("Dune", "Frank Herbert", 3)
+
+    assert not service.similarity.contains("Dune", "Frank Herbert")
+    assert [book.title for book in result] == ["Hyperion"]
+    service.gemini._generate_content.assert_called_once()
+
+
+def test_books_known_only_by_spice_are_not_neighbours():
+    index = _index()
+    index.record(BookRecommendation("Gone Girl", "Gillian Flynn"), spice_level=0)
+
+    titles = [book.title for book, _ in index.most_similar("Dune", "Frank Herbert", k=3)]
+
+    assert "Gone Girl" not in titles
+
+
+@pytest.mark.parametrize("lsh_threshold", [100_000, 2])
+def test_least_recently_used_books_are_forgotten(lsh_threshold):
+    index = _index(lsh_threshold=lsh_threshold, max_books=4)
+    index.most_similar("Dune", "Frank Herbert")
+
+    index.record(BookRecommendation("Red Rising", "Pierce Brown"), genre="science fiction", tags=["politics", "empire"])
+
+    assert len(index) == 4
+    assert not index.contains("Hyperion", "Dan Simmons")
+    assert index.most_similar_batch([HYPERION])[0] == []
+    titles = [book.title for book, _ in index.most_similar("Dune", "Frank Herbert", k=3)]
+    assert "Hyperion" not in titles
+    assert set(titles[:2]) == {"Foundation", "Red Rising"}
+    assert index.most_similar("Red Rising", "Pierce Brown", k=1)[0][0].title == "Foundation"
+
+
+def test_free_text_tropes_are_not_indexed_as_features():
+    service = BookService(cache=ResponseCache(), similarity=SimilarityIndex())
+    service.gemini._generate_content = Mock(return_value='{"recommendations": ["Eragon by Christopher Paolini"]}')
+
+    service.get_books_for_trope("a boy and his lizard", count=1)
+    service.get_books_for_trope("dragon riders", count=1)
+
+    assert service.similarity._terms == [{"tag:dragon riders": 1.0}]
@@ -0,0 +1,111 @@
+import threading
+import time
+import pytest
+from unittest.mock import Mock, patch
+from services import deadline
+from services.gemini_service import GeminiService
+from services.single_flight import SingleFlight
+
+
+def _run_concurrently(count, target):
+    results = [None] * count
+    def worker(i):
+        results[i] = target()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_callers_share_one_execution():
+    # Arrange
+    flight = SingleFlight()
+    calls = []
+    def slow():
+        calls.append(1)
+        time.sleep(0.1)
+        return "fantasy"
+
+    # Act
+    results = _run_concurrently(10, lambda: flight.do("genre:Dune", slow))
+
+    # Assert
+    assert results == ["fantasy"] * 10
+    assert len(calls) == 1
+    assert flight.stats()["coalesced"] == 9
+    assert flight.in_flight() == 0
+
+
+def test_error_is_propagated_to_all_waiters():
+    flight = SingleFlight()
+    def failing():
+        time.sleep(0.1)
+        raise RuntimeError("quota exceeded")
+    def call():
+        try:
+            flight.do("k", failing)
+        except RuntimeError as e:
+            return str(e)
+
+    results = _run_concurrently(5, call)
+
+    assert results == ["quota exceeded"] * 5
+    assert flight.stats()["errors"] == 1
+
+
+def test_sequential_calls_are_not_coalesced():
+    flight = SingleFlight()
+
+    flight.do("k", lambda: 1)
+    flight.do("k", lambda: 2)
+
+    assert flight.stats()["executed"] == 2
+    assert flight.stats()["coalesced"] == 0
+
+
+def test_generate_content_coalesces_identical_prompts():
+    # Arrange
+    service = GeminiService(single_flight=SingleFlight())
+    mock_response = Mock()
+    mock_response.text = '{"genre": "fantasy"}'
+    def slow_generate(**kwargs):
+        time.sleep(0.1)
+        return mock_response
+
+    # Act
+    with patch.object(service.client.models, 'generate_content', side_effect=slow_generate) as generate:
+        results = _run_concurrently(8, lambda: service._generate_content("same prompt"))
+
+    # Assert
+    assert results == ['{"genre": "fantasy"}'] * 8
+    assert generate.call_count == 1
+
+
+def test_waiter_gives_up_at_its_own_deadline():
+    # Arrange
+    service = GeminiService(single_flight=SingleFlight())
+    service._call_model = Mock(side_effect=lambda prompt: time.sleep(0.5) or '{"genre": "fantasy"}')
+    def request(budget):
+        tokens = deadline.begin_request(budget)
+        try:
+            started = time.monotonic()
+            text = service._generate_content("same prompt")
+            return text, time.monotonic() - started, deadline.degraded_reasons()
+        finally:
+            deadline.end_request(tokens)
+    leader = threading.Thread(target=request, args=(10.0,))
+
+    # Act
+    leader.start()
+    time.sleep(0.05)
+    text, elapsed, reasons = request(0.1)
+    leader.join()
+
+    # Assert
+    assert text is None
+    assert elapsed < 0.3
+    assert reasons == ["deadline_exceeded"]
+    assert service.single_flight.stats()["abandoned"] == 1
+    service._call_model.assert_called_once()
@@ -0,0 +1,37 @@
+import pytest
+from services.stream_parser import JsonArrayStreamParser
+
+
+def _feed_in_chunks(parser, text, size):
+    items = []
+    for i in range(0, len(text), size):
+        items.extend(parser.feed(text[i:i + size]))
+    return items
+
+
+def test_items_are_yielded_as_soon_as_complete():
+    parser = JsonArrayStreamParser("recommendations")
+
+    first = list(parser.feed('{"recommendations": ["Dune by Frank Herbert", "Found'))
+    second = list(parser.feed('ation by Isaac Asimov"]}'))
+
+    assert first == ["Dune by Frank Herbert"]
+    assert second == ["Foundation by Isaac Asimov"]
+    assert parser.done
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 1000])
+def test_handles_any_chunking(size):
+    text = '```json\n{\n  "recommendations": [\n    "Say \\"Hi\\" by Anon",\n    "Wiedźmin by Andrzej Sapkowski"\n  ]\n}\n```'
+
+    items = _feed_in_chunks(JsonArrayStreamParser("recommendations"), text, size)
+
+    assert items == ['Say "Hi" by Anon', "Wiedźmin by Andrzej Sapkowski"]
+
+
+def test_ignores_text_before_key():
+    parser = JsonArrayStreamParser("recommendations")
+
+    items = list(parser.feed('Here you go ["not this"] {"recommendations": ["Dune by Frank Herbert"]}'))
+
+    assert items == ["Dune by Frank Herbert"]
@@ -0,0 +1,74 @@
+import json
+import logging
+from unittest.mock import Mock
+from main import create_app
+from services import timing
+from services.book_service import BookService
+from services.response_cache import ResponseCache
+
+HISTORY = {'read_books': [{'title': 'Hyperion', 'author': 'Dan Simmons'}], 'count': 1}
+
+
+def _service():
+    service = BookService(cache=ResponseCache())
+    service.gemini._call_model = Mock(return_value='{"recommendations": ["Dune by Frank Herbert"]}')
+    return service
+
+
+def _phases(header):
+    return {entry.split(';')[0].strip() for entry in header.split(',')}
+
+
+def test_spans_are_summed_per_phase():
+    recorder, token = timing.begin_request()
+    try:
+        for _ in range(2):
+            with timing.span('parse'):
+                pass
+    finally:
+        timing.end_request(token)
+
+    with timing.span('parse'):
+        pass
+
+    assert [(name, count) for name, _, count in recorder.spans()] == [('parse', 2)]
+    assert timing.server_timing(recorder).startswith('parse;dur=')
+    assert 'desc="2x"' in timing.server_timing(recorder)
+
+
+def test_history_route_reports_phases_in_server_timing():
+    with create_app(_service()).test_client() as client:
+        response = client.post('/api/recommendations/history', json=HISTORY)
+
+    assert response.status_code == 200
+    assert {'request_parse', 'prompt', 'queue', 'gemini', 'parse', 'serialize', 'total'} <= \
+        _phases(response.headers['Server-Timing'])
+
+
+def test_timing_is_logged_as_json(monkeypatch, caplog):
+    monkeypatch.setenv('TIMING_LOG', '1')
+    app = create_app(_service())
+    monkeypatch.setattr(logging.getLogger('book_api.timing'), 'propagate', True)
+
+    with caplog.at_level(logging.INFO, logger='book_api.timing'):
+        app.test_client().post('/api/recommendations/history', json=HISTORY)
+
+    record = json.loads(caplog.records[-1].getMessage())
+    assert record['route'] == '/api/recommendations/history'
+    assert record['spans']['gemini']['count'] == 1
+
+
+def test_profile_is_returned_only_with_the_right_token(monkeypatch):
+    monkeypatch.setenv('PROFILE_TOKEN', 'secret')
+    client = create_app(_service()).test_client()
+
+    plain = client.post('/api/recommendations/history', json=HISTORY,
+                        headers={'X-Profile-Token': 'wrong'})
+    profiled = client.post('/api/recommendations/history', json=HISTORY,
+                           headers={'X-Profile-Token': 'secret', 'X-Profile-Sort': 'tottime'})
+
+    assert plain.json['recommendations'][0]['title'] == 'Dune'
+    assert profiled.status_code == 200
+    assert profiled.mimetype == 'text/plain'
+    assert 'function calls' in profiled.text
+    assert 'get_recommendations_from_history' in profiled.text
@@ -0,0 +1,82 @@
+"""Precompute cached answers for trope × genre queries and popular books.
+
+Enumerates every BookTropes trope alone and with every BookGenres genre for
+the given counts, plus the per-book lookups of the titles in --titles, and
+stores the answers in the shared response cache (BOOK_CACHE_PATH), which
+the API workers read. Runs at BULK priority under the Gemini rate limits
+with bounded parallelism; progress goes to a checkpoint file, so an
+interrupted run resumes where it stopped.
+
+    BOOK_CACHE_PATH=cache.db python warm_cache.py --counts 3 5 10 --titles popular.txt
+    BOOK_CACHE_PATH=cache.db python warm_cache.py --no-tropes --titles popular.json --rpm 200
+
+Periodic refresh, e.g. from cron: tasks finished less than --max-age hours
+ago are skipped, and --refresh asks Gemini again even for answers that are
+still cached, so they get a fresh TTL.
+
+    0 4 * * *  BOOK_CACHE_PATH=/var/lib/books/cache.db python warm_cache.py --refresh --max-age 20
+"""
+import argparse
+import os
+import sys
+import time
+from services.cache_warmer import BOOK_METHODS, CacheWarmer, Checkpoint, book_tasks, read_titles, trope_tasks
+from services.gemini_service import GeminiService
+from services.response_cache import ResponseCache
+from services.scheduler import GeminiScheduler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--counts", type=int, nargs="+", default=[5], help="book counts of trope queries")
+    parser.add_argument("--genres", nargs="+", help="limit trope queries to these genres (default all)")
+    parser.add_argument("--no-tropes", action="store_true", help="skip trope × genre queries")
+    parser.add_argument("--titles", help="popular books: JSON [{title, author}] or 'Title by Author' lines")
+    parser.add_argument("--methods", nargs="+", choices=BOOK_METHODS, default=list(BOOK_METHODS),
+                        help="per-book lookups to warm for --titles")
+    parser.add_argument("--parallelism", type=int, default=4, help="tasks in flight")
+    parser.add_argument("--rpm", type=float, help="Gemini requests per minute for this job (default GEMINI_RPM)")
+    parser.add_argument("--checkpoint", default="warm_cache.checkpoint.jsonl", help="progress file for resuming")
+    parser.add_argument("--max-age", type=float, default=24.0, help="hours after which a finished task is redone")
+    parser.add_argument("--refresh", action="store_true", help="ask Gemini even when an answer is cached")
+    args = parser.parse_args()
+
+    if not os.environ.get("BOOK_CACHE_PATH"):
+        sys.exit("BOOK_CACHE_PATH is not set: warmed answers would be lost when the job exits")
+
+    gemini = None
+    if args.rpm:
+        # A share of the quota, so the API workers sharing the key are not starved
+        gemini = GeminiService(scheduler=GeminiScheduler(
+            requests_per_minute=args.rpm,
+            tokens_per_minute=float(os.environ.get("GEMINI_TPM", 1_000_000)),
+            max_concurrency=args.parallelism,
+        ))
+
+    warmer = CacheWarmer.for_cache(
+        ResponseCache.default(),
+        refresh=args.refresh,
+        gemini=gemini,
+        checkpoint=Checkpoint(args.checkpoint),
+        parallelism=args.parallelism,
+        max_age=args.max_age * 60 * 60,
+    )
+
+    tasks = []
+    if not args.no_tropes:
+        tasks.extend(trope_tasks(args.counts, args.genres))
+    if args.titles:
+        tasks.extend(book_tasks(read_titles(args.titles), args.methods))
+
+    started = time.monotonic()
+    print(f"🔥 Warming {len(tasks)} cached answers ({args.parallelism} in parallel)")
+    stats = warmer.run(tasks, progress=lambda stats: print(
+        f"  {sum(stats.values())}/{len(tasks)} " + ", ".join(f"{k}={v}" for k, v in stats.items()), end="\r"))
+    print()
+    print(f"✅ Done in {time.monotonic() - started:.0f}s: " + ", ".join(f"{k}={v}" for k, v in stats.items()))
+    if stats["error"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()